@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+import json_codec
+from convert_json_to_xlsx import convert_to_xlsx
+from crawl_manifest import CrawlManifest
+from hunan_score_spider import URL_TEMPLATE, HunanScoreSpider
+from replay_server import LIST_CATEGORY_PARAM, ReplayServer
+from score_store import ScoreStore
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计内存峰值
+    resource = None
+
+REPO_DIR = Path(__file__).resolve().parent
+DEFAULT_RESULTS_DIR = Path('benchmarks')
+LIVE_SCORE_HOST = 'https://static-data.gaokao.cn'
+
+
+class LatencyRecorder:
+    """在压测期间记录每个 requests 请求的耗时（包括 spyder.py 里直接调用的 requests.get）"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self._lock = threading.Lock()
+        self._original = None
+
+    def __enter__(self) -> 'LatencyRecorder':
+        self._original = original = requests.Session.send
+        recorder = self
+
+        def send(session, request, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(session, request, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with recorder._lock:
+                    recorder.samples.append(elapsed)
+
+        requests.Session.send = send
+        return self
+
+    def __exit__(self, *exc_info):
+        requests.Session.send = self._original
+
+    def take(self) -> List[float]:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的内存峰值（MB）；Linux 下 ru_maxrss 单位为 KB，macOS 为字节"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_stage(name: str, func: Callable, recorder: LatencyRecorder, server: ReplayServer,
+              verbose: bool) -> Dict:
+    """执行一个阶段并统计耗时、请求数、延迟分位数和内存峰值"""
+    print(f"阶段 {name} ...", flush=True)
+    before = dict(server.stats)
+    recorder.take()
+    start = time.perf_counter()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        func()
+    wall = time.perf_counter() - start
+
+    latencies = sorted(recorder.take())
+    responses = {status: count - before.get(status, 0) for status, count in server.stats.items()
+                 if count != before.get(status, 0)}
+    p50, p99 = percentile(latencies, 0.50), percentile(latencies, 0.99)
+    return {
+        'stage': name,
+        'wall_s': wall,
+        'requests': len(latencies),
+        'requests_per_s': len(latencies) / wall if wall and latencies else 0.0,
+        'p50_ms': p50 * 1000 if p50 is not None else None,
+        'p99_ms': p99 * 1000 if p99 is not None else None,
+        'responses': responses,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def load_list_crawler():
+    """按路径导入 spyder/spyder.py（spyder 目录不是包）"""
+    spec = importlib.util.spec_from_file_location('spyder_list_crawler', REPO_DIR / 'spyder' / 'spyder.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_benchmark(args) -> Dict:
+    data_dir = args.data_dir.resolve()
+    with open(data_dir / 'school_mapping.json', 'r', encoding='utf-8') as f:
+        mapping = json_codec.load(f)
+    if args.schools:
+        mapping = dict(list(mapping.items())[:args.schools])
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='gaokao-bench-')).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    with open(workdir / 'school_mapping.json', 'w', encoding='utf-8') as f:
+        json_codec.dump(mapping, f, indent=2)
+
+    server = ReplayServer(data_dir / 'temp', data_dir, data_dir / 'school_mapping.json', port=args.port,
+                          latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                          default_category=args.category, seed=args.seed).start()
+    list_pages = len(list(data_dir.glob(f'{args.category}-*.json')))
+    stages = []
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    manifest = CrawlManifest(workdir / 'cache' / 'crawl_manifest.sqlite3')
+    store = ScoreStore(workdir / 'store' / 'scores.sqlite3')
+    try:
+        spider = HunanScoreSpider(years=args.years, concurrency=args.concurrency, rps=args.rps,
+                                  manifest=manifest, store=store,
+                                  url_template=URL_TEMPLATE.replace(LIVE_SCORE_HOST, server.base_url))
+        list_module = load_list_crawler()
+        list_crawler = list_module.ListCrawler(workdir, args.concurrency, rps=args.rps, adaptive=args.rps > 0)
+        category = list_module.Category(
+            args.category, f"{server.base_url}/web/api/?page=1&size=20&{LIST_CATEGORY_PARAM}={args.category}"
+        )
+
+        with LatencyRecorder() as recorder:
+            stages.append(run_stage('crawl', spider.crawl_all_schools, recorder, server, args.verbose))
+            stages.append(run_stage('list_crawl', lambda: list_crawler.crawl([category]), recorder, server,
+                                    args.verbose))
+            stages.append(run_stage('merge', spider.rebuild_store, recorder, server, args.verbose))
+            stages.append(run_stage(
+                'export',
+                lambda: (store.export_excel(workdir / 'score_export'), convert_to_xlsx(str(workdir))),
+                recorder, server, args.verbose,
+            ))
+    finally:
+        os.chdir(cwd)
+        manifest.close()
+        store.close()
+        server.stop()
+
+    return {
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'json_codec': json_codec.codec.name,
+        'params': {
+            'schools': len(mapping), 'years': args.years, 'concurrency': args.concurrency, 'rps': args.rps,
+            'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+            'throttle_rate': args.throttle_rate, 'category': args.category, 'list_pages': list_pages,
+        },
+        'workdir': str(workdir),
+        'stages': stages,
+    }
+
+
+def print_results(result: Dict, baseline: Optional[Dict] = None):
+    previous = {stage['stage']: stage for stage in baseline['stages']} if baseline else {}
+    print(f"\n版本 {result['version']}  参数 {result['params']}")
+    print(f"{'阶段':<12}{'耗时(s)':>10}{'请求数':>8}{'请求/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'内存峰值(MB)':>14}  响应")
+
+    def fmt(value: Optional[float], width: int) -> str:
+        return f"{value:>{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+    for stage in result['stages']:
+        line = (f"{stage['stage']:<14}{stage['wall_s']:>10.2f}{stage['requests']:>10}"
+                f"{stage['requests_per_s']:>10.1f}{fmt(stage['p50_ms'], 10)}{fmt(stage['p99_ms'], 10)}"
+                f"{fmt(stage['peak_rss_mb'], 14)}  {stage['responses']}")
+        old = previous.get(stage['stage'])
+        if old and old['wall_s']:
+            line += f"  耗时较基线 {(stage['wall_s'] / old['wall_s'] - 1) * 100:+.1f}%"
+        print(line)
+    if baseline:
+        print(f"基线: 版本 {baseline['version']}，{baseline['timestamp']}")
+
+
+def latest_result(results_dir: Path) -> Optional[Path]:
+    files = sorted(results_dir.glob('crawl-*.json'))
+    return files[-1] if files else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线爬取/合并/导出压测（本地回放服务代替线上接口）')
+    parser.add_argument('--data-dir', type=Path, default=REPO_DIR,
+                        help='回放数据所在目录（含 temp/、分类列表 JSON 和 school_mapping.json），默认: 仓库目录')
+    parser.add_argument('--workdir', type=Path, help='压测输出目录，默认: 新建临时目录')
+    parser.add_argument('--schools', type=int, default=0, help='只压测前 N 所学校，默认: 全部')
+    parser.add_argument('--years', nargs='+', type=int, default=[2024, 2023, 2022, 2021, 2020],
+                        help='年份列表，默认: 2020-2024')
+    parser.add_argument('--concurrency', type=int, default=8, help='爬虫并发数，默认: 8')
+    parser.add_argument('--rps', type=float, default=0, help='爬虫限速，0 表示不限速，默认: 0')
+    parser.add_argument('--category', default='985', help='列表爬虫回放的分类，默认: 985')
+    parser.add_argument('--port', type=int, default=0, help='回放服务端口，默认: 随机空闲端口')
+    parser.add_argument('--latency', type=float, default=0.02, help='回放服务固定延迟（秒），默认: 0.02')
+    parser.add_argument('--jitter', type=float, default=0.02, help='回放服务随机延迟上限（秒），默认: 0.02')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='注入 503 的比例，默认: 0')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='注入 429 的比例，默认: 0')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 的 Retry-After 秒数，默认: 1')
+    parser.add_argument('--seed', type=int, default=42, help='故障注入随机种子，默认: 42')
+    parser.add_argument('--results-dir', type=Path, default=DEFAULT_RESULTS_DIR,
+                        help=f'结果保存目录，默认: {DEFAULT_RESULTS_DIR}')
+    parser.add_argument('--baseline', type=Path, help='对比的基线结果文件，默认: 结果目录中最新的一份')
+    parser.add_argument('--verbose', action='store_true', help='显示爬虫和导出的原始输出')
+
+    args = parser.parse_args()
+    baseline_path = args.baseline or latest_result(args.results_dir)
+    result = run_benchmark(args)
+
+    baseline = json_codec.load_path(baseline_path) if baseline_path and baseline_path.exists() else None
+    print_results(result, baseline)
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    output = args.results_dir / f"crawl-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json_codec.dump(result, f, indent=2)
+    print(f"\n结果已保存到: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import glob
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import json_codec
+
+
+def load_corpus(temp_dir: str, category_dir: str) -> Dict[str, List[bytes]]:
+    """读取基准语料：temp/ 下的分数线响应和根目录的分类列表 JSON"""
+    score_files = sorted(glob.glob(str(Path(temp_dir) / '*.json')))
+    category_files = sorted(
+        f for f in glob.glob(str(Path(category_dir) / '*.json'))
+        if Path(f).name != 'school_mapping.json'
+    )
+    corpus = {}
+    for name, files in (('score', score_files), ('category', category_files)):
+        corpus[name] = [Path(f).read_bytes() for f in files]
+    return corpus
+
+
+def measure(func: Callable, items: List, repeat: int) -> float:
+    """重复执行若干轮，返回最快一轮的耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(corpus: Dict[str, List[bytes]], repeat: int) -> List[Dict]:
+    """对每种可用编解码器测量解析和序列化吞吐"""
+    results = []
+    for codec_name, codec in json_codec.available_codecs().items():
+        for corpus_name, bodies in corpus.items():
+            if not bodies:
+                continue
+            total_mb = sum(len(body) for body in bodies) / 1024 / 1024
+            parsed = [codec.loads(body) for body in bodies]
+
+            timings = {
+                'parse': measure(codec.loads, bodies, repeat),
+                'dump_compact': measure(lambda obj: codec.dumps_bytes(obj), parsed, repeat),
+                'dump_indent2': measure(lambda obj: codec.dumps_bytes(obj, indent=2), parsed, repeat),
+            }
+            for operation, seconds in timings.items():
+                results.append({
+                    'codec': codec_name,
+                    'corpus': corpus_name,
+                    'operation': operation,
+                    'files': len(bodies),
+                    'seconds': seconds,
+                    'mb_per_s': total_mb / seconds if seconds else 0.0,
+                })
+
+    # 类型化解码：msgspec 直接解码为结构体，否则为 字典 -> NamedTuple
+    if corpus.get('score'):
+        seconds = measure(json_codec.decode_score_items, corpus['score'], repeat)
+        total_mb = sum(len(body) for body in corpus['score']) / 1024 / 1024
+        results.append({
+            'codec': 'msgspec' if json_codec.msgspec is not None else json_codec.codec.name,
+            'corpus': 'score',
+            'operation': 'decode_score_items',
+            'files': len(corpus['score']),
+            'seconds': seconds,
+            'mb_per_s': total_mb / seconds if seconds else 0.0,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 编解码器基准测试')
+    parser.add_argument('--temp-dir', default='temp', help='分数线响应目录，默认: temp')
+    parser.add_argument('--category-dir', default='.', help='分类列表 JSON 所在目录，默认: 当前目录')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复轮数，取最快一轮，默认: 5')
+    parser.add_argument('--output', type=Path, help='把结果保存为 JSON 文件')
+
+    args = parser.parse_args()
+    corpus = load_corpus(args.temp_dir, args.category_dir)
+    for name, bodies in corpus.items():
+        print(f"语料 {name}: {len(bodies)} 个文件, {sum(len(b) for b in bodies) / 1024 / 1024:.2f} MB")
+
+    results = run_benchmark(corpus, args.repeat)
+
+    print(f"\n{'编解码器':<10}{'语料':<10}{'操作':<20}{'耗时(ms)':>10}{'MB/s':>10}")
+    for result in results:
+        print(f"{result['codec']:<12}{result['corpus']:<12}{result['operation']:<22}"
+              f"{result['seconds'] * 1000:>10.1f}{result['mb_per_s']:>10.1f}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json_codec.dump(results, f, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import json_codec
+
+# 一条分数线记录的稳定标识：同一学校、年份、科类、批次、专业组、招生类型只有一条记录
+IDENTITY_FIELDS = ['school_id', 'year', 'type', 'batch', 'special_group', 'zslx']
+
+OP_INSERT = 'insert'
+OP_UPDATE = 'update'
+OP_DELETE = 'delete'
+OPS = [OP_INSERT, OP_UPDATE, OP_DELETE]
+
+# (记录标识, 内容哈希)
+KeyedHash = Tuple[str, str]
+
+
+class Change(NamedTuple):
+    """变更流中的一行：某次运行中某条记录的新增/更新/删除"""
+    seq: int
+    run_id: Optional[str]
+    province_id: str
+    school_code: str
+    school_name: str
+    record_key: str
+    op: str
+    record_hash: Optional[str]
+    changed_at: float
+
+
+def row_keys(rows: Iterable[Sequence], fields: List[str]) -> List[str]:
+    """按 IDENTITY_FIELDS 生成每行的记录标识；rows 的字段顺序为 fields
+
+    同一学校中标识重复时（接口数据异常），后出现的行加上 #2、#3 等序号，保证标识唯一。
+    """
+    positions = [fields.index(field) for field in IDENTITY_FIELDS]
+    seen: Counter = Counter()
+    keys = []
+    for row in rows:
+        key = '|'.join('' if row[i] is None else str(row[i]) for i in positions)
+        seen[key] += 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+def row_hash(row: Sequence) -> str:
+    """一行存储值（分数线字段 + 额外字段）的内容哈希"""
+    return hashlib.md5(json_codec.dumps(list(row)).encode('utf-8')).hexdigest()
+
+
+def keyed_hashes(rows: List[Sequence], fields: List[str]) -> List[KeyedHash]:
+    return list(zip(row_keys(rows, fields), (row_hash(row) for row in rows)))
+
+
+def diff(old: List[KeyedHash], new: List[KeyedHash]) -> List[Tuple[str, str, Optional[str]]]:
+    """比较上一次和这一次的(标识, 哈希)列表，返回(操作, 标识, 新哈希)；删除的新哈希为 None"""
+    old_hashes = dict(old)
+    new_hashes = dict(new)
+    changes = []
+    for key, digest in new:
+        previous = old_hashes.get(key)
+        if previous is None:
+            changes.append((OP_INSERT, key, digest))
+        elif previous != digest:
+            changes.append((OP_UPDATE, key, digest))
+    changes.extend((OP_DELETE, key, None) for key, _ in old if key not in new_hashes)
+    return changes
+
+
+def summarize(changes: Iterable[Change]) -> Dict[str, int]:
+    """各操作的变更条数"""
+    counts = Counter(change.op for change in changes)
+    return {op: counts.get(op, 0) for op in OPS}
+
+
+def touched_keys(changes: Iterable[Change]) -> Dict[Tuple[str, str], set]:
+    """按学校汇总有变化的记录标识；同一记录多次变化只需按最终状态处理一次"""
+    schools: Dict[Tuple[str, str], set] = {}
+    for change in changes:
+        schools.setdefault((change.province_id, change.school_code), set()).add(change.record_key)
+    return schools
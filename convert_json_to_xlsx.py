@@ -1,15 +1,72 @@
-import json
 import os
+import io
+import csv
+import time
+import argparse
+import contextlib
 from datetime import datetime
 from collections import defaultdict
-import xlsxwriter
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import json_codec
+from score_schema import CATALOG_SCHEMA, normalize_records
+
+# 支持的导出格式
+EXPORT_FORMATS = ['xlsx', 'csv', 'parquet']
+PARQUET_BATCH_SIZE = 1000  # Parquet 每批写入的行数
 
 def load_json_file(file_path):
     """加载JSON文件并返回数据"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = json_codec.load_path(file_path)
     return data['data']['item']
 
+def unique_items(items: List[Dict], seen: set) -> List[Dict]:
+    """按 school_id 去掉 seen 中已有的学校并记入 seen，先读到的为准；没有 school_id 的记录保留"""
+    result = []
+    for item in items:
+        school_id = item.get('school_id')
+        if school_id is not None:
+            if str(school_id) in seen:
+                continue
+            seen.add(str(school_id))
+        result.append(item)
+    return result
+
+def iter_series_items(directory, files) -> Iterator[Dict]:
+    """逐个文件读取系列数据并逐条产出，任意时刻只持有一个文件的数据
+
+    同一系列可能同时有合并文件 {系列名}.json 和分页文件 {系列名}-N.json，按 school_id 去重，先读到的为准。
+    """
+    seen = set()
+    for file in files:
+        file_path = os.path.join(directory, file)
+        try:
+            items = load_json_file(file_path)
+        except (KeyError, TypeError):
+            print(f"  跳过非列表文件: {file}")
+            continue
+        print(f"  读取文件: {file}")
+        # 排名、访问量等数值转成整数，导出的 Excel 中为数字而不是文本
+        yield from normalize_records(unique_items(items, seen), CATALOG_SCHEMA)
+
+def discover_headers(directory, files) -> List[str]:
+    """扫描一遍系列文件，只收集字段名，不转换字段类型也不保留数据（转换不改变字段名）"""
+    all_keys, seen = set(), set()
+    for file in files:
+        try:
+            items = load_json_file(os.path.join(directory, file))
+        except (KeyError, TypeError):
+            continue
+        for item in unique_items(items, seen):
+            all_keys.update(item)
+    return sorted(all_keys)
+
+def page_number(file):
+    """从 系列-页码.json 中取出页码，无页码的文件排在最前"""
+    stem = file.replace('.json', '')
+    page = stem.rsplit('-', 1)[1] if '-' in stem else ''
+    return int(page) if page.isdigit() else 0
+
 def group_json_files(directory):
     """根据文件名规则对JSON文件进行分组"""
     json_files = [f for f in os.listdir(directory) if f.endswith('.json')]
@@ -25,10 +82,125 @@ def group_json_files(directory):
             series_name = file.replace('.json', '')
             groups[series_name].append(file)
     
+    # 按页码排序，保证导出行顺序确定
+    for files in groups.values():
+        files.sort(key=page_number)
+    
     return groups
 
-def convert_to_xlsx(directory):
-    """将JSON文件转换为Excel文件"""
+class XlsxSink:
+    """xlsxwriter constant_memory 模式逐行写入，内存占用与行数无关"""
+    
+    def __init__(self, path, headers):
+        import xlsxwriter
+        
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.worksheet = self.workbook.add_worksheet()
+        self.worksheet.write_row(0, 0, headers)
+        self.row_num = 0
+    
+    def write(self, values):
+        self.row_num += 1
+        self.worksheet.write_row(self.row_num, 0, values)
+    
+    def close(self):
+        self.workbook.close()
+
+class CsvSink:
+    """逐行写入CSV（带BOM，便于Excel直接打开）"""
+    
+    def __init__(self, path, headers):
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+    
+    def write(self, values):
+        self.writer.writerow(values)
+    
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """按批写入Parquet，需要安装 pyarrow"""
+    
+    def __init__(self, path, headers):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        self.pa = pa
+        # 字段类型混杂（字符串/数字），统一按字符串存储
+        self.schema = pa.schema([(header, pa.string()) for header in headers])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch = []
+    
+    def write(self, values):
+        self.batch.append(['' if value is None else str(value) for value in values])
+        if len(self.batch) >= PARQUET_BATCH_SIZE:
+            self.flush()
+    
+    def flush(self):
+        if not self.batch:
+            return
+        columns = list(zip(*self.batch))
+        arrays = [self.pa.array(column, type=self.pa.string()) for column in columns]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.batch = []
+    
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+SINKS = {'xlsx': XlsxSink, 'csv': CsvSink, 'parquet': ParquetSink}
+
+def export_series(directory, files, output_base, formats) -> int:
+    """流式导出一个系列：先扫描字段名，再逐行写入所有目标格式，返回记录数"""
+    headers = discover_headers(directory, files)
+    if not headers:
+        return 0
+    
+    sinks = [SINKS[fmt](f"{output_base}.{fmt}", headers) for fmt in formats]
+    row_count = 0
+    try:
+        for item in iter_series_items(directory, files):
+            values = [item.get(header, '') for header in headers]
+            for sink in sinks:
+                sink.write(values)
+            row_count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return row_count
+
+class SeriesResult(NamedTuple):
+    series_name: str
+    row_count: int
+    seconds: float
+    log: str
+
+def export_series_job(job: Tuple[str, str, List[str], str, Tuple[str, ...]]) -> SeriesResult:
+    """进程池任务：导出一个系列并计时；输出先缓存下来，由主进程按系列顺序打印，避免多进程输出交错"""
+    series_name, directory, files, output_base, formats = job
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        row_count = export_series(directory, files, output_base, formats)
+    return SeriesResult(series_name, row_count, time.perf_counter() - start, log.getvalue())
+
+def series_size(directory, files) -> int:
+    return sum(os.path.getsize(os.path.join(directory, file)) for file in files)
+
+def print_timing_report(results: List[SeriesResult], wall: float, workers: int):
+    """各系列的记录数和耗时，以及各系列耗时合计与总耗时之比（平均并行度）"""
+    print(f"\n{'系列':<16}{'记录数':>8}{'耗时(s)':>10}")
+    for result in sorted(results, key=lambda result: result.seconds, reverse=True):
+        print(f"{result.series_name:<18}{result.row_count:>8}{result.seconds:>10.2f}")
+    busy = sum(result.seconds for result in results)
+    parallelism = busy / wall if wall else 0.0
+    print(f"共 {len(results)} 个系列，{workers} 个进程，总耗时 {wall:.2f} 秒，"
+          f"各系列耗时合计 {busy:.2f} 秒，平均并行度 {parallelism:.1f}")
+
+def convert_to_xlsx(directory, formats=('xlsx',), workers=1):
+    """将JSON文件转换为Excel文件（可同时输出CSV/Parquet）；workers > 1 时各系列在进程池中并行导出"""
     # 创建输出目录
     output_dir = os.path.join(directory, 'output')
     if not os.path.exists(output_dir):
@@ -40,51 +212,53 @@ def convert_to_xlsx(directory):
     # 对JSON文件进行分组
     file_groups = group_json_files(directory)
     
-    for series_name, files in file_groups.items():
-        print(f"处理系列: {series_name}")
-        all_data = []
+    # 输出文件名只取决于系列名和日期，与执行顺序无关
+    jobs = [
+        (series_name, directory, files, os.path.join(output_dir, f"{series_name}_{current_date}"), tuple(formats))
+        for series_name, files in sorted(file_groups.items())
+    ]
+    workers = max(1, min(workers, len(jobs)))
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(export_series_job, jobs)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
         
-        # 加载该系列的所有JSON文件数据
-        for file in files:
-            file_path = os.path.join(directory, file)
-            print(f"  加载文件: {file}")
-            data = load_json_file(file_path)
-            all_data.extend(data)
+        # 大系列先提交，减少最后只剩一个进程在跑的时间；结果仍按系列名顺序输出
+        pending = sorted(jobs, key=lambda job: series_size(directory, job[2]), reverse=True)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {job[0]: executor.submit(export_series_job, job) for job in pending}
+            results = [futures[job[0]].result() for job in jobs]
+    
+    finished = []
+    for result in results:
+        series_name = result.series_name
+        print(f"处理系列: {series_name}")
+        print(result.log, end='')
+        finished.append(result)
         
-        if not all_data:
+        if not result.row_count:
             print(f"  警告: {series_name} 系列没有数据")
             continue
         
-        # 获取所有字段名（表头）
-        all_keys = set()
-        for item in all_data:
-            all_keys.update(item.keys())
-        headers = sorted(list(all_keys))
-        
-        # 生成Excel文件名
-        excel_filename = f"{series_name}_{current_date}.xlsx"
-        excel_path = os.path.join(output_dir, excel_filename)
-        
-        # 创建Excel文件
-        workbook = xlsxwriter.Workbook(excel_path)
-        worksheet = workbook.add_worksheet()
-        
-        # 写入表头
-        for col_num, header in enumerate(headers):
-            worksheet.write(0, col_num, header)
-        
-        # 写入数据
-        for row_num, item in enumerate(all_data, 1):
-            for col_num, header in enumerate(headers):
-                value = item.get(header, '')
-                worksheet.write(row_num, col_num, value)
-        
-        workbook.close()
-        print(f"  已保存: {excel_filename} (共 {len(all_data)} 条记录)")
+        saved = ', '.join(f"{series_name}_{current_date}.{fmt}" for fmt in formats)
+        print(f"  已保存: {saved} (共 {result.row_count} 条记录，{result.seconds:.2f} 秒)")
     
+    print_timing_report(finished, time.perf_counter() - start, workers)
     print(f"\n转换完成！所有文件已保存到: {output_dir}")
+    return finished
+
+def main():
+    parser = argparse.ArgumentParser(description='将分类列表JSON按系列导出为Excel/CSV/Parquet')
+    parser.add_argument('directory', nargs='?', default='.',
+                        help='JSON文件所在目录，默认: 当前目录')
+    parser.add_argument('--formats', nargs='+', choices=EXPORT_FORMATS, default=['xlsx'],
+                        help='导出格式，默认: xlsx')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='并行导出的进程数，1 表示在当前进程中逐个导出，默认: CPU 核数')
+    
+    args = parser.parse_args()
+    convert_to_xlsx(args.directory, formats=args.formats, workers=args.workers)
 
 if __name__ == "__main__":
-    # 设置工作目录
-    directory = r"e:\github_code_lib\gaokao_school"
-    convert_to_xlsx(directory)
\ No newline at end of file
+    main()
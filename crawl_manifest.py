@@ -0,0 +1,144 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+DEFAULT_MANIFEST_PATH = Path("cache") / "crawl_manifest.sqlite3"
+
+# 抓取状态
+STATUS_OK = 'ok'
+STATUS_EMPTY = 'empty'
+STATUS_FAILED = 'failed'
+
+
+class FetchRecord(NamedTuple):
+    province_id: str
+    school_code: str
+    year: int
+    status: str
+    http_status: Optional[int]
+    record_count: int
+    body_hash: Optional[str]
+    error: Optional[str]
+    updated_at: float
+
+
+class CrawlManifest:
+    """记录每个(省份, 学校, 年份)抓取结果和每所学校导出输入的断点清单（SQLite 存储）"""
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # 其他进程持有写锁时最多等待 30 秒
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS fetches (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                http_status INTEGER,
+                record_count INTEGER NOT NULL DEFAULT 0,
+                body_hash TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (province_id, school_code, year)
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS exports (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                record_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (province_id, school_code)
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def hash_body(body: bytes) -> str:
+        """计算响应正文的哈希"""
+        return hashlib.sha1(body).hexdigest()
+
+    def record_fetch(self, province_id: str, school_code: str, year: int, status: str,
+                     http_status: Optional[int] = None, record_count: int = 0,
+                     body_hash: Optional[str] = None, error: Optional[str] = None):
+        """记录一次抓取结果"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetches "
+                "(province_id, school_code, year, status, http_status, record_count, body_hash, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (province_id, school_code, year, status, http_status, record_count, body_hash, error, time.time()),
+            )
+            self._conn.commit()
+
+    def get_fetch(self, province_id: str, school_code: str, year: int) -> Optional[FetchRecord]:
+        """读取抓取记录，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT province_id, school_code, year, status, http_status, record_count, body_hash, "
+                "error, updated_at FROM fetches WHERE province_id = ? AND school_code = ? AND year = ?",
+                (province_id, school_code, year),
+            ).fetchone()
+        return FetchRecord(*row) if row else None
+
+    def is_complete(self, province_id: str, school_code: str, year: int) -> bool:
+        """该(省份, 学校, 年份)是否已成功抓取到数据；失败和空响应需要重试"""
+        record = self.get_fetch(province_id, school_code, year)
+        return record is not None and record.status == STATUS_OK
+
+    def completed_keys(self) -> Set[Tuple[str, str, int]]:
+        """一次性读出所有已成功抓取的(省份, 学校代码, 年份)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT province_id, school_code, year FROM fetches WHERE status = ?", (STATUS_OK,)
+            ).fetchall()
+        return {tuple(row) for row in rows}
+
+    def record_counts(self) -> Dict[Tuple[str, str, int], int]:
+        """一次性读出所有成功抓取的(省份, 学校代码, 年份)及其记录数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT province_id, school_code, year, record_count FROM fetches WHERE status = ?", (STATUS_OK,)
+            ).fetchall()
+        return {(province_id, school_code, year): count for province_id, school_code, year, count in rows}
+
+    def input_hash(self, province_id: str, school_code: str, years: Iterable[int]) -> str:
+        """由各年份正文哈希组合出该学校导出输入的哈希"""
+        digest = hashlib.sha1()
+        for year in years:
+            record = self.get_fetch(province_id, school_code, year)
+            if record is not None and record.status == STATUS_OK:
+                digest.update(f"{year}:{record.body_hash};".encode())
+        return digest.hexdigest()
+
+    def export_hash(self, province_id: str, school_code: str) -> Optional[str]:
+        """上次导出时的输入哈希"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash FROM exports WHERE province_id = ? AND school_code = ?",
+                (province_id, school_code),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_export(self, province_id: str, school_code: str, input_hash: str, record_count: int):
+        """记录一次成功的合并导出"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exports (province_id, school_code, input_hash, record_count, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (province_id, school_code, input_hash, record_count, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
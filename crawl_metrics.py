@@ -0,0 +1,261 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+
+import json_codec
+
+METRIC_PREFIX = 'gaokao_'
+# 延迟直方图的桶上界（秒），最后一个桶为 +Inf
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_INTERVAL = 10.0
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def label_set(labels: Dict[str, object]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(labels: LabelSet, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+class Histogram:
+    """固定分桶的直方图（与 Prometheus histogram 语义一致，桶计数在导出时累加）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶估计分位数：返回包含该分位的桶上界（落在 +Inf 桶时返回最大桶上界）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {str(bound): count for bound, count in zip(self.buckets + (float('inf'),), self.counts)},
+        }
+
+
+class Metrics:
+    """线程安全的计数器、仪表和延迟直方图，可导出为 JSON 快照或 Prometheus 文本格式"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._gauges: Dict[str, Dict[LabelSet, float]] = {}
+        self._histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器加 value"""
+        key = label_set(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """仪表设为当前值（如当前限速）"""
+        key = label_set(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """记录一次耗时到直方图"""
+        key = label_set(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """计时上下文：退出时（包括异常退出）把耗时记入直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(label_set(labels), 0)
+
+    def snapshot(self) -> Dict:
+        """当前所有指标的 JSON 可序列化快照"""
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'uptime_s': time.time() - self.started_at,
+                'counters': {
+                    name: [{'labels': dict(labels), 'value': value} for labels, value in sorted(series.items())]
+                    for name, series in sorted(self._counters.items())
+                },
+                'gauges': {
+                    name: [{'labels': dict(labels), 'value': value} for labels, value in sorted(series.items())]
+                    for name, series in sorted(self._gauges.items())
+                },
+                'histograms': {
+                    name: [{'labels': dict(labels), **histogram.to_dict()}
+                           for labels, histogram in sorted(series.items())]
+                    for name, series in sorted(self._histograms.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('gauge', self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    metric = METRIC_PREFIX + name
+                    lines.append(f"# TYPE {metric} {kind}")
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{metric}{format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                        lines.append(f"{metric}_bucket{format_labels(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Path):
+        """写入文件：.prom 后缀为 Prometheus 文本，其他为 JSON 快照；先写临时文件再替换，读者不会读到半个文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == '.prom':
+            content = self.to_prometheus()
+        else:
+            content = json_codec.dumps(self.snapshot(), indent=2)
+        temp_path = path.with_name(path.name + '.tmp')
+        temp_path.write_text(content, encoding='utf-8')
+        temp_path.replace(path)
+
+    def summary_table(self) -> str:
+        """运行结束时的汇总表：各阶段耗时分布和计数器"""
+        lines = []
+        with self._lock:
+            histograms = sorted(
+                (name, labels, histogram) for name, series in self._histograms.items()
+                for labels, histogram in series.items()
+            )
+            counters = sorted(
+                (name, labels, value) for metrics in (self._counters, self._gauges)
+                for name, series in metrics.items() for labels, value in series.items()
+            )
+        if histograms:
+            lines.append(f"{'耗时指标':<36}{'次数':>8}{'总耗时(s)':>12}{'平均(ms)':>10}{'p50≤(ms)':>10}{'p99≤(ms)':>10}")
+            for name, labels, histogram in histograms:
+                mean = histogram.sum / histogram.count * 1000 if histogram.count else 0.0
+                p50, p99 = histogram.quantile(0.5), histogram.quantile(0.99)
+                lines.append(
+                    f"{name + format_labels(labels):<40}{histogram.count:>8}{histogram.sum:>12.2f}{mean:>10.1f}"
+                    f"{(p50 or 0) * 1000:>10.0f}{(p99 or 0) * 1000:>10.0f}"
+                )
+        if counters:
+            lines.append(f"\n{'计数器/仪表':<38}{'值':>12}")
+            for name, labels, value in counters:
+                lines.append(f"{name + format_labels(labels):<43}{value:>12g}")
+        return '\n'.join(lines)
+
+
+class MetricsReporter:
+    """后台线程：每隔 interval 秒把指标写入文件，停止时再写一次最终快照"""
+
+    def __init__(self, metrics: Metrics, path: Path, interval: float = DEFAULT_INTERVAL):
+        self.metrics = metrics
+        self.path = Path(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> 'MetricsReporter':
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.write(self.path)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.metrics.write(self.path)
+
+
+def serve_metrics(metrics: Metrics, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """在后台线程提供 /metrics（Prometheus 文本）和 /metrics.json（JSON 快照）"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = json_codec.dumps_bytes(metrics.snapshot()), 'application/json'
+            else:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def error_type(exc: BaseException) -> str:
+    """把异常归类为便于统计的错误类型"""
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return f"http_{exc.response.status_code}"
+    if isinstance(exc, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return 'connection'
+    if isinstance(exc, json_codec.DECODE_ERRORS):
+        return 'decode'
+    return type(exc).__name__
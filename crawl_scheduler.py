@@ -0,0 +1,70 @@
+from typing import Callable, Dict, List, NamedTuple
+
+# 省份代码（与 gaokao.cn 接口中的 province_id 一致）
+PROVINCES = {
+    '11': '北京', '12': '天津', '13': '河北', '14': '山西', '15': '内蒙古',
+    '21': '辽宁', '22': '吉林', '23': '黑龙江',
+    '31': '上海', '32': '江苏', '33': '浙江', '34': '安徽', '35': '福建', '36': '江西', '37': '山东',
+    '41': '河南', '42': '湖北', '43': '湖南', '44': '广东', '45': '广西', '46': '海南',
+    '50': '重庆', '51': '四川', '52': '贵州', '53': '云南', '54': '西藏',
+    '61': '陕西', '62': '甘肃', '63': '青海', '64': '宁夏', '65': '新疆',
+}
+DEFAULT_PROVINCE = '43'
+# 抓取计划顺序：year 为所有学校按年份从新到旧，school 为逐个学校抓完所有年份
+ORDER_YEAR = 'year'
+ORDER_SCHOOL = 'school'
+PLAN_ORDERS = [ORDER_YEAR, ORDER_SCHOOL]
+
+
+class CrawlTask(NamedTuple):
+    province_id: str
+    school_name: str
+    school_code: str
+    year: int
+
+
+def parse_provinces(values: List[str]) -> List[str]:
+    """解析命令行省份参数，支持代码、名称和 all"""
+    if not values:
+        return [DEFAULT_PROVINCE]
+    if 'all' in values:
+        return list(PROVINCES)
+
+    name_to_id = {name: province_id for province_id, name in PROVINCES.items()}
+    provinces = []
+    for value in values:
+        province_id = name_to_id.get(value, value)
+        if province_id not in PROVINCES:
+            raise ValueError(f"未知省份: {value}")
+        if province_id not in provinces:
+            provinces.append(province_id)
+    return provinces
+
+
+def build_crawl_plan(school_mapping: Dict[str, str], years: List[int], provinces: List[str],
+                     is_missing: Callable[[CrawlTask], bool], order: str = ORDER_YEAR) -> List[CrawlTask]:
+    """生成 学校 × 年份 × 省份 的抓取计划
+
+    缺失的单元格排在最前。order 为 year 时其次按年份从新到旧，同一年份内保持省份和学校的原始顺序；
+    为 school 时同一学校的各年份排在一起（按 years 的顺序），学校逐个完成，合并导出可以与抓取同时进行，
+    学校之间按各自最新的缺失年份从新到旧排列，中途中断时已抓取的仍是较新的年份。
+    """
+    if order not in PLAN_ORDERS:
+        raise ValueError(f"未知的计划顺序: {order}")
+    tasks = []
+    for province_id in provinces:
+        for school_name, school_code in school_mapping.items():
+            for year in years:
+                tasks.append(CrawlTask(province_id, school_name, school_code, year))
+
+    # sorted 是稳定排序，相同优先级保持生成顺序
+    missing = {task for task in tasks if is_missing(task)}
+    if order == ORDER_SCHOOL:
+        # 每所学校（按省份区分）最新的缺失年份
+        newest_missing = {}
+        for task in missing:
+            unit = (task.province_id, task.school_code)
+            newest_missing[unit] = max(newest_missing.get(unit, task.year), task.year)
+        return sorted(tasks, key=lambda task: (task not in missing,
+                                               -newest_missing.get((task.province_id, task.school_code), 0)))
+    return sorted(tasks, key=lambda task: (task not in missing, -task.year))
@@ -5,16 +5,15 @@ from datetime import datetime
 
 def csv_to_xlsx(csv_file_path, xlsx_file_path):
     """将CSV文件转换为Excel文件"""
-    # 创建Excel工作簿
-    workbook = xlsxwriter.Workbook(xlsx_file_path)
+    # 创建Excel工作簿（constant_memory 模式逐行落盘，内存占用与行数无关）
+    workbook = xlsxwriter.Workbook(xlsx_file_path, {'constant_memory': True})
     worksheet = workbook.add_worksheet()
     
-    # 读取CSV文件并写入Excel
+    # 逐行读取CSV文件并写入Excel
     with open(csv_file_path, 'r', encoding='utf-8-sig') as csvfile:
         reader = csv.reader(csvfile)
         for row_num, row in enumerate(reader):
-            for col_num, cell_data in enumerate(row):
-                worksheet.write(row_num, col_num, cell_data)
+            worksheet.write_row(row_num, 0, row)
     
     workbook.close()
     print(f"已转换: {os.path.basename(csv_file_path)} -> {os.path.basename(xlsx_file_path)}")
@@ -0,0 +1,322 @@
+import argparse
+import csv
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from score_schema import coerce_float
+from score_store import DEFAULT_STORE_PATH, ScoreStore, quote
+
+# 一条预测序列：同一学校、科类、批次、招生类型下的同一专业组代码（special_group 每年都会变，sg_name 不变）
+SERIES_FIELDS = ['province_id', 'school_name', 'local_type_name', 'local_batch_name', 'zslx_name', 'sg_name']
+# 序列键的前两项确定所属学校，学校重新写入时只需重算它自己的序列
+SCHOOL_WIDTH = 2
+# 预测的指标：最低位次、最低分、线差（最低分 - 省控线）
+METRICS = ['min_section', 'min', 'diff']
+# 位次的波动大致与位次本身成正比，在对数空间拟合，区间为相对宽度
+LOG_METRICS = {'min_section'}
+# 每条序列每个指标的最小二乘充分统计量，新增一年只需把该年的值累加进去
+SUM_FIELDS = ['n', 'sx', 'sy', 'sxx', 'sxy', 'syy']
+# 年份减去基准年后再参与计算，避免平方项过大损失精度
+BASE_YEAR = 2000
+# 90% 预测区间
+DEFAULT_Z = 1.645
+
+SeriesKey = Tuple[str, ...]
+
+
+def series_key(record: Dict) -> SeriesKey:
+    return tuple(str(record.get(field) or '') for field in SERIES_FIELDS)
+
+
+def build_matrix(records: Iterable[Dict]) -> Tuple[List[SeriesKey], np.ndarray, np.ndarray]:
+    """把记录铺成稠密的 指标 × 序列 × 年份 矩阵，缺失为 NaN
+
+    返回(序列键列表, 年份数组, 形状为 (len(METRICS), 序列数, 年份数) 的矩阵)
+    """
+    keys: Dict[SeriesKey, int] = {}
+    records = list(records)
+    rows = [keys.setdefault(series_key(record), len(keys)) for record in records]
+    years = [int(record['year']) for record in records]
+    # 每个指标整列转换，'-' 或空值为 NaN
+    values = [coerce_float([record.get(metric) for record in records]) for metric in METRICS]
+
+    year_values = np.unique(np.asarray(years, dtype=np.int64))
+    matrix = np.full((len(METRICS), len(keys), len(year_values)), np.nan)
+    if rows:
+        columns = np.searchsorted(year_values, np.asarray(years, dtype=np.int64))
+        # 同一序列同一年出现多条时保留最后一条
+        matrix[:, np.asarray(rows), columns] = np.asarray(values)
+    for metric in LOG_METRICS:
+        row = matrix[METRICS.index(metric)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix[METRICS.index(metric)] = np.where(row > 0, np.log(row), np.nan)
+    return list(keys), year_values, matrix
+
+
+def accumulate(years: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """按年份轴求和得到充分统计量，形状为 (len(SUM_FIELDS), 指标数, 序列数)"""
+    mask = ~np.isnan(matrix)
+    t = (years - BASE_YEAR).astype(np.float64)
+    y = np.where(mask, matrix, 0.0)
+    tm = mask * t
+    return np.stack([
+        mask.sum(axis=-1, dtype=np.float64),
+        tm.sum(axis=-1),
+        y.sum(axis=-1),
+        (tm * t).sum(axis=-1),
+        (y * t).sum(axis=-1),
+        (y * y).sum(axis=-1),
+    ])
+
+
+def fit(sums: np.ndarray, target_year: int, z: float = DEFAULT_Z) -> Dict[str, np.ndarray]:
+    """对所有序列同时做线性趋势拟合并外推到目标年份（LOG_METRICS 中的指标在对数空间拟合）
+
+    只有一年数据时取该年值；残差自由度不足（不超过两年）的序列使用同一指标全部序列残差标准差的中位数。
+    返回 prediction / lower / upper / n，形状均为 (指标数, 序列数)。
+    """
+    n, sx, sy, sxx, sxy, syy = sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_t = sx / n
+        mean_y = sy / n
+        ss_t = sxx - sx * mean_t
+        ss_ty = sxy - sx * mean_y
+        ss_y = syy - sy * mean_y
+        has_trend = ss_t > 1e-9
+        slope = np.where(has_trend, ss_ty / ss_t, 0.0)
+        t0 = float(target_year - BASE_YEAR)
+        prediction = mean_y + slope * (t0 - mean_t)
+
+        sse = np.clip(ss_y - slope * ss_ty, 0.0, None)
+        sigma = np.where(n > 2, np.sqrt(sse / (n - 2)), np.nan)
+        for metric in range(sigma.shape[0]):
+            row = sigma[metric]
+            pooled = np.nanmedian(row) if np.isfinite(row).any() else 0.0
+            row[np.isnan(row)] = pooled
+        leverage = np.where(has_trend, (t0 - mean_t) ** 2 / ss_t, 0.0)
+        spread = z * sigma * np.sqrt(1.0 + 1.0 / n + leverage)
+
+    prediction = np.where(n > 0, prediction, np.nan)
+    lower = prediction - spread
+    upper = prediction + spread
+    for metric in LOG_METRICS:
+        index = METRICS.index(metric)
+        for array in (prediction, lower, upper):
+            array[index] = np.exp(array[index])
+    return {'prediction': prediction, 'lower': lower, 'upper': upper, 'n': n}
+
+
+class ForecastState:
+    """保存在分数线存储中的预测状态：每条序列的充分统计量，以及累加时各学校的分数线写入时间"""
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        key_columns = ', '.join(f"{quote(field)} TEXT NOT NULL" for field in SERIES_FIELDS)
+        sum_columns = ', '.join(f"{quote(f'{metric}_{field}')} REAL NOT NULL"
+                                for metric in METRICS for field in SUM_FIELDS)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS forecast_sums ({key_columns}, {sum_columns}, "
+            f"PRIMARY KEY ({', '.join(quote(field) for field in SERIES_FIELDS)}))"
+        )
+        # 旧版按(省份, 年份)记录进度，同一年份后写入或重新抓取的学校不会被累加；换成按学校记录后首次刷新整体重算
+        self._conn.execute("DROP TABLE IF EXISTS forecast_years")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS forecast_schools (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                school_name TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (province_id, school_code)
+            )"""
+        )
+        self._conn.commit()
+
+    def schools(self) -> Dict[Tuple[str, str], Tuple[str, float]]:
+        """已累加进统计量的学校 (省份, 学校代码) → (学校名, 分数线写入时间)"""
+        return {
+            (province_id, school_code): (school_name, updated_at)
+            for province_id, school_code, school_name, updated_at
+            in self._conn.execute("SELECT * FROM forecast_schools")
+        }
+
+    def load(self) -> Tuple[List[SeriesKey], np.ndarray]:
+        rows = self._conn.execute("SELECT * FROM forecast_sums").fetchall()
+        width = len(SERIES_FIELDS)
+        keys = [tuple(row[:width]) for row in rows]
+        sums = np.asarray([row[width:] for row in rows], dtype=np.float64).reshape(
+            len(rows), len(METRICS), len(SUM_FIELDS)
+        ).transpose(2, 1, 0)
+        return keys, sums
+
+    def save(self, keys: List[SeriesKey], sums: np.ndarray, schools: Dict[Tuple[str, str], Tuple[str, float]]):
+        """整体替换统计量和学校版本（一个事务）"""
+        flat = sums.transpose(2, 1, 0).reshape(len(keys), -1).tolist()
+        placeholders = ', '.join('?' for _ in range(len(SERIES_FIELDS) + len(METRICS) * len(SUM_FIELDS)))
+        with self._conn:
+            self._conn.execute("DELETE FROM forecast_sums")
+            self._conn.execute("DELETE FROM forecast_schools")
+            self._conn.executemany(
+                f"INSERT INTO forecast_sums VALUES ({placeholders})",
+                (list(key) + values for key, values in zip(keys, flat)),
+            )
+            self._conn.executemany(
+                "INSERT INTO forecast_schools VALUES (?, ?, ?, ?)",
+                ((*key, school_name, updated_at) for key, (school_name, updated_at) in schools.items()),
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def merge_sums(keys: List[SeriesKey], sums: np.ndarray,
+               new_keys: List[SeriesKey], new_sums: np.ndarray) -> Tuple[List[SeriesKey], np.ndarray]:
+    """把新一批统计量按序列键累加到已有统计量上"""
+    positions = {key: i for i, key in enumerate(keys)}
+    merged_keys = list(keys)
+    for key in new_keys:
+        if key not in positions:
+            positions[key] = len(merged_keys)
+            merged_keys.append(key)
+    merged = np.zeros((len(SUM_FIELDS), len(METRICS), len(merged_keys)))
+    merged[:, :, :len(keys)] = sums
+    np.add.at(merged, (slice(None), slice(None), [positions[key] for key in new_keys]), new_sums)
+    return merged_keys, merged
+
+
+def drop_schools(keys: List[SeriesKey], sums: np.ndarray,
+                 schools: set) -> Tuple[List[SeriesKey], np.ndarray]:
+    """去掉属于 schools（(省份, 学校名) 集合）的序列"""
+    keep = [i for i, key in enumerate(keys) if key[:SCHOOL_WIDTH] not in schools]
+    return [keys[i] for i in keep], sums[:, :, keep]
+
+
+def refresh(store: ScoreStore, state: ForecastState, full: bool = False) -> Tuple[int, int]:
+    """增量更新预测状态：分数线新写入或重新写入过的学校去掉旧序列、按当前记录重算，已不在存储中的学校去掉
+
+    没有已保存的状态或指定 full 时，逐省份从头重算。返回(重算的学校数, 序列数)。
+    """
+    # 先记下版本再读记录：读取期间被重新写入的学校版本对不上，下次刷新会再算一次
+    versions = {(province_id, school_code): (school_name, updated_at)
+                for province_id, school_code, school_name, updated_at in store.school_versions()}
+    done = {} if full else state.schools()
+    if not done:
+        full = True
+
+    if full:
+        keys, sums = [], np.zeros((len(SUM_FIELDS), len(METRICS), 0))
+        for province_id in sorted({province_id for province_id, _ in versions}):
+            new_keys, year_values, matrix = build_matrix(store.load(province_id=province_id))
+            keys, sums = merge_sums(keys, sums, new_keys, accumulate(year_values, matrix))
+        changed = list(versions)
+    else:
+        keys, sums = state.load()
+        stale = {(province_id, school_name) for (province_id, school_code), (school_name, updated_at) in done.items()
+                 if versions.get((province_id, school_code)) != (school_name, updated_at)}
+        keys, sums = drop_schools(keys, sums, stale)
+        changed = [key for key, version in versions.items() if done.get(key) != version]
+        for province_id, school_code in changed:
+            records = store.load(province_id=province_id, school_name=versions[(province_id, school_code)][0])
+            new_keys, year_values, matrix = build_matrix(records)
+            keys, sums = merge_sums(keys, sums, new_keys, accumulate(year_values, matrix))
+
+    if changed or full or len(done) != len(versions):
+        state.save(keys, sums, versions)
+    return len(changed), len(keys)
+
+
+def forecast_rows(keys: List[SeriesKey], sums: np.ndarray, target_year: int, z: float = DEFAULT_Z,
+                  proscore: Optional[float] = None) -> List[Dict]:
+    """生成每条序列的预测结果；给出目标年份省控线时，预测分数按 省控线 + 预测线差 计算"""
+    result = fit(sums, target_year, z)
+    prediction, lower, upper = result['prediction'], result['lower'], result['upper']
+    section, score, diff = (METRICS.index(metric) for metric in ('min_section', 'min', 'diff'))
+    if proscore is not None:
+        prediction[score] = proscore + prediction[diff]
+        lower[score] = proscore + lower[diff]
+        upper[score] = proscore + upper[diff]
+
+    rows = []
+    for i, key in enumerate(keys):
+        if not np.isfinite(prediction[section, i]) and not np.isfinite(prediction[score, i]):
+            continue
+        row = dict(zip(SERIES_FIELDS, key))
+        row.update({
+            'year': target_year,
+            'years_used': int(result['n'][section, i]),
+            'rank': round_or_none(prediction[section, i]),
+            'rank_low': round_or_none(lower[section, i]),
+            'rank_high': round_or_none(upper[section, i]),
+            'score': round_or_none(prediction[score, i]),
+            'score_low': round_or_none(lower[score, i]),
+            'score_high': round_or_none(upper[score, i]),
+            'diff': round_or_none(prediction[diff, i]),
+        })
+        rows.append(row)
+    return rows
+
+
+def round_or_none(value: float) -> Optional[int]:
+    return int(round(value)) if np.isfinite(value) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按专业组预测下一年的最低位次和最低分')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'集中存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    refresh_parser = subparsers.add_parser('refresh', help='增量更新预测状态（只重算新写入或重新写入过的学校）')
+    refresh_parser.add_argument('--full', action='store_true', help='忽略已有状态从头重算')
+
+    predict_parser = subparsers.add_parser('predict', help='输出预测结果')
+    predict_parser.add_argument('--year', type=int, help='预测的年份，默认: 存储中最新年份的下一年')
+    predict_parser.add_argument('--province', help='只输出指定省份代码')
+    predict_parser.add_argument('--school', help='只输出指定学校')
+    predict_parser.add_argument('--type', dest='type_name', help='只输出指定科类')
+    predict_parser.add_argument('--proscore', type=float, help='目标年份的省控线，给出时按线差推算分数')
+    predict_parser.add_argument('--z', type=float, default=DEFAULT_Z, help=f'区间宽度（标准差倍数），默认: {DEFAULT_Z}')
+    predict_parser.add_argument('--output', type=Path, help='保存为 CSV 文件，不指定则打印')
+
+    args = parser.parse_args()
+    store = ScoreStore(args.store)
+    state = ForecastState(args.store)
+    try:
+        start = time.perf_counter()
+        changed, series = refresh(store, state, full=getattr(args, 'full', False))
+        print(f"预测状态: 重算 {changed} 所学校，共 {series} 条序列，耗时 {time.perf_counter() - start:.3f} 秒")
+        if args.command == 'refresh':
+            return
+
+        keys, sums = state.load()
+        target_year = args.year or max(year for _, year in store.years()) + 1
+        start = time.perf_counter()
+        rows = forecast_rows(keys, sums, target_year, args.z, args.proscore)
+        print(f"已预测 {len(rows)} 条序列，耗时 {time.perf_counter() - start:.3f} 秒")
+
+        filters = (('province_id', args.province), ('school_name', args.school), ('local_type_name', args.type_name))
+        rows = [row for row in rows if all(value is None or row[field] == value for field, value in filters)]
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            with open(args.output, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else SERIES_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+            print(f"已保存 {len(rows)} 条预测到: {args.output}")
+        else:
+            for row in rows:
+                print(f"{row['school_name']} {row['local_type_name']} {row['local_batch_name']} {row['sg_name']}: "
+                      f"位次 {row['rank']} [{row['rank_low']}, {row['rank_high']}]，"
+                      f"分数 {row['score']} [{row['score_low']}, {row['score_high']}]"
+                      f"（{row['years_used']} 年数据）")
+    finally:
+        state.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,35 @@
 import requests
-import json
 import os
-import pandas as pd
 from pathlib import Path
-import time
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import argparse
+import time
+
+import json_codec
+from rate_limiter import TokenBucket
+from revalidation_cache import DEFAULT_CACHE_PATH, RevalidationCache
+from crawl_manifest import DEFAULT_MANIFEST_PATH, STATUS_EMPTY, STATUS_FAILED, STATUS_OK, CrawlManifest
+from score_store import DEFAULT_STORE_PATH, ScoreStore
+from change_feed import OP_DELETE, OP_INSERT, OP_UPDATE, summarize
+from score_schema import normalize_records, to_dataframe
+from raw_archive import DEFAULT_ARCHIVE_PATH, FileArchive, open_archive
+from crawl_scheduler import (DEFAULT_PROVINCE, ORDER_SCHOOL, PLAN_ORDERS, PROVINCES, CrawlTask, build_crawl_plan,
+                             parse_provinces)
+from crawl_metrics import DEFAULT_INTERVAL, Metrics, MetricsReporter, error_type, serve_metrics
+from request_policy import DEFAULT_MAX_RETRIES, AIMDController, RequestPolicy
+from school_mapping import load_school_mapping
+from stream_pipeline import SinkWorker, bounded_map
+from job_queue import (DEFAULT_LEASE_SECONDS, DEFAULT_POLL_INTERVAL, DEFAULT_QUEUE_PATH, JOB_DONE, JOB_FAILED,
+                       JOB_LEASED, JOB_PENDING, Heartbeat, JobQueue, default_worker_id)
 
 # 配置
 DEFAULT_YEARS = [2024, 2023, 2022, 2021, 2020]
-URL_TEMPLATE = 'https://static-data.gaokao.cn/www/2.0/schoolprovincescore/{school_code}/{year}/43.json?a=www.gaokao.cn'
+DEFAULT_CONCURRENCY = 4  # 同时在途的请求数
+DEFAULT_RPS = 2.0  # 全局每秒请求数上限
+DEFAULT_MAX_RPS = 20.0  # 自适应限速时的速率上限
+URL_TEMPLATE = 'https://static-data.gaokao.cn/www/2.0/schoolprovincescore/{school_code}/{year}/{province_id}.json?a=www.gaokao.cn'
 
 # 请求头
 HEADERS = {
@@ -29,192 +49,660 @@ HEADERS = {
 }
 
 class HunanScoreSpider:
-    def __init__(self, years: List[int] = None):
+    def __init__(self, years: List[int] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 rps: float = DEFAULT_RPS, cache: RevalidationCache = None,
+                 manifest: CrawlManifest = None, resume: bool = False, provinces: List[str] = None,
+                 store: ScoreStore = None, excel: bool = False, archive=None,
+                 url_template: str = URL_TEMPLATE, metrics: Metrics = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES, adaptive: bool = False, max_rps: float = DEFAULT_MAX_RPS,
+                 plan_order: str = ORDER_SCHOOL, keep_raw: bool = True):
         self.years = years or DEFAULT_YEARS
+        self.provinces = provinces or [DEFAULT_PROVINCE]
         self.temp_dir = Path("temp")
         self.score_dir = Path("score")
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = TokenBucket(rps)
+        self.cache = cache
+        self.manifest = manifest
+        self.resume = resume and manifest is not None
+        self.store = store
+        self.excel = excel
+        # 接口地址模板，压测时指向本地回放服务
+        self.url_template = url_template
+        # 计数器和各阶段耗时直方图
+        self.metrics = metrics or Metrics()
+        # 重试和限速策略；adaptive 时由 AIMD 在 [0.5, max_rps] 内自动调整速率
+        controller = AIMDController(self.rate_limiter, max_rate=max_rps, metrics=self.metrics) if adaptive else None
+        self.policy = RequestPolicy(self.rate_limiter, max_retries=max_retries, controller=controller,
+                                    metrics=self.metrics)
+        # 原始响应存储：抓取流上的旁路，默认按文件写入 temp/，也可使用压缩归档；keep_raw 为 False 时不保存
+        self.archive = (archive or FileArchive(self.temp_dir)) if keep_raw else None
+        self.plan_order = plan_order
+        # 汇总阶段的后台线程：学校合并完成后经有界队列交给它导出 Excel、写入集中存储
+        self.sink = None
+        # 本次运行的编号，集中存储的变更流按它记录新增/更新/删除的记录
+        self.run_id = time.strftime('%Y%m%d-%H%M%S')
+        
+        # 连接池大小与并发数一致，保证每个在途请求都能复用连接
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # 创建必要的目录
-        self.temp_dir.mkdir(exist_ok=True)
         self.score_dir.mkdir(exist_ok=True)
+        for province_id in self.provinces:
+            self.province_score_dir(province_id).mkdir(exist_ok=True)
         
-        print(f"初始化爬虫，目标年份: {self.years}")
+        province_names = [PROVINCES[province_id] for province_id in self.provinces]
+        print(f"初始化爬虫，目标省份: {province_names}，目标年份: {self.years}，"
+              f"并发数: {self.concurrency}，限速: {self.rate_limiter.rate:g} 次/秒"
+              + (f"（自适应，上限 {max_rps:g}）" if adaptive else ""))
+    
+    def province_score_dir(self, province_id: str) -> Path:
+        """某省份的Excel目录；湖南沿用原有的 score/ 根目录"""
+        if province_id == DEFAULT_PROVINCE:
+            return self.score_dir
+        return self.score_dir / province_id
     
     def load_school_mapping(self) -> Dict[str, str]:
-        """加载学校映射数据"""
-        mapping_file = Path('school_mapping.json')
-        if not mapping_file.exists():
-            raise FileNotFoundError("school_mapping.json 文件不存在，请先运行 read_school_mapping_excel.py")
-        
-        with open(mapping_file, 'r', encoding='utf-8') as f:
-            mapping = json.load(f)
+        """加载学校映射数据（source/school_mapping.xlsx 变化时自动重新生成 school_mapping.json）"""
+        mapping = load_school_mapping()
         
         print(f"加载了 {len(mapping)} 所学校的映射数据")
         return mapping
     
-    def fetch_score_data(self, school_code: str, year: int) -> Dict:
-        """获取指定学校和年份的录取分数线数据"""
-        url = URL_TEMPLATE.format(school_code=school_code, year=year)
-        
-        try:
-            response = self.session.get(url, headers=HEADERS, timeout=15)
-            response.raise_for_status()
-            
-            # 检查响应是否设置了新的cookies
-            if response.cookies:
-                self.session.cookies.update(response.cookies)
-                print(f"    更新了cookies: {dict(response.cookies)}")
+    def fetch_score_data(self, school_code: str, year: int, province_id: str = DEFAULT_PROVINCE) -> Dict:
+        """获取指定学校和年份在某省份的录取分数线数据"""
+        with self.metrics.timer('stage_seconds', stage='fetch'):
+            url = self.url_template.format(school_code=school_code, year=year, province_id=province_id)
+            http_status = None
             
-            data = response.json()
-            
-            # 检查数据有效性
-            if 'data' in data and isinstance(data['data'], dict):
-                total_records = 0
-                for key, value in data['data'].items():
-                    if isinstance(value, dict) and 'item' in value:
-                        total_records += len(value['item'])
-                print(f"    成功获取 {total_records} 条记录")
-                return data
-            elif 'data' in data and isinstance(data['data'], list):
-                print(f"    成功获取 {len(data['data'])} 条记录")
-                return data
-            else:
-                print(f"    响应格式异常或无数据")
+            try:
+                http_status, body, data = self.request_body(url, school_code, year)
+                body_hash = CrawlManifest.hash_body(body)
+                
+                # 检查数据有效性
+                if 'data' in data and isinstance(data['data'], dict):
+                    total_records = 0
+                    for key, value in data['data'].items():
+                        if isinstance(value, dict) and 'item' in value:
+                            total_records += len(value['item'])
+                    print(f"    [{school_code}/{year}] 成功获取 {total_records} 条记录")
+                elif 'data' in data and isinstance(data['data'], list):
+                    total_records = len(data['data'])
+                    print(f"    [{school_code}/{year}] 成功获取 {total_records} 条记录")
+                else:
+                    total_records = 0
+                    print(f"    [{school_code}/{year}] 响应格式异常或无数据")
+                
+                status = STATUS_OK if total_records else STATUS_EMPTY
+                self.metrics.inc('fetches_total', status=status)
+                self.metrics.inc('records_fetched_total', total_records)
+                self.record_fetch(province_id, school_code, year, status, http_status, total_records, body_hash)
                 return data
+                
+            except requests.exceptions.RequestException as e:
+                if e.response is not None:
+                    http_status = e.response.status_code
+                error = str(e)
+                self.metrics.inc('errors_total', stage='fetch', type=error_type(e))
+                print(f"    [{school_code}/{year}] 请求失败: {e}")
+            except json_codec.DECODE_ERRORS as e:
+                error = str(e)
+                self.metrics.inc('errors_total', stage='fetch', type=error_type(e))
+                print(f"    [{school_code}/{year}] JSON解析失败: {e}")
+            except Exception as e:
+                error = str(e)
+                self.metrics.inc('errors_total', stage='fetch', type=error_type(e))
+                print(f"    [{school_code}/{year}] 未知错误: {e}")
             
-        except requests.exceptions.RequestException as e:
-            print(f"    请求失败: {e}")
-            return {}
-        except json.JSONDecodeError as e:
-            print(f"    JSON解析失败: {e}")
-            return {}
-        except Exception as e:
-            print(f"    未知错误: {e}")
+            self.metrics.inc('fetches_total', status=STATUS_FAILED)
+            self.record_fetch(province_id, school_code, year, STATUS_FAILED, http_status, error=error)
             return {}
     
-    def save_temp_data(self, school_name: str, year: int, data: Dict):
-        """保存临时数据到temp文件夹"""
-        filename = f"{school_name}_{year}.json"
-        filepath = self.temp_dir / filename
+    def record_fetch(self, province_id: str, school_code: str, year: int, status: str,
+                     http_status: Optional[int], record_count: int = 0, body_hash: str = None,
+                     error: str = None):
+        """将抓取结果写入断点清单"""
+        if self.manifest:
+            self.manifest.record_fetch(province_id, school_code, year, status, http_status=http_status,
+                                       record_count=record_count, body_hash=body_hash, error=error)
+    
+    def request_body(self, url: str, school_code: str, year: int) -> Tuple[int, bytes, Dict]:
+        """请求并返回(状态码, 正文, 解析后的数据)；启用缓存时发送条件请求，304 视为缓存命中
+        
+        正文解析成功后才写入缓存，截断或 HTML 的 200 响应不会连同验证器一起缓存；
+        缓存中已有的正文无法解析时删除该条目，下次完整下载。
+        """
+        entry = self.cache.get(url) if self.cache else None
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 已封榜年份有缓存时直接复用，不发请求
+        if entry is not None and self.cache.is_closed(year):
+            self.metrics.inc('cache_hits_total', reason='closed_year')
+            print(f"    [{school_code}/{year}] 封榜年份，使用缓存")
+            return 304, entry.body, self.decode_cached(url, entry.body)
         
-        print(f"    已保存临时文件: {filepath}")
+        headers = HEADERS
+        if entry is not None:
+            headers = {**HEADERS, **self.cache.conditional_headers(entry)}
+        
+        response = self.policy.get(self.session, url, headers=headers, timeout=15)
+        
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(url)
+            self.metrics.inc('cache_hits_total', reason='not_modified')
+            print(f"    [{school_code}/{year}] 未修改(304)，使用缓存")
+            return 304, entry.body, self.decode_cached(url, entry.body)
+        
+        response.raise_for_status()
+        self.metrics.inc('response_bytes_total', len(response.content))
+        
+        # 检查响应是否设置了新的cookies
+        if response.cookies:
+            self.session.cookies.update(response.cookies)
+            print(f"    [{school_code}/{year}] 更新了cookies: {dict(response.cookies)}")
+        
+        data = json_codec.loads(response.content)
+        if self.cache:
+            self.cache.store(url, response.content,
+                             etag=response.headers.get('ETag'),
+                             last_modified=response.headers.get('Last-Modified'))
+        return response.status_code, response.content, data
     
-    def merge_school_data(self, school_name: str) -> List[Dict]:
-        """合并同一学校的所有年份数据"""
+    def decode_cached(self, url: str, body: bytes) -> Dict:
+        """解析缓存中的正文；无法解析时删除该条目再抛出异常"""
+        try:
+            return json_codec.loads(body)
+        except json_codec.DECODE_ERRORS:
+            self.cache.delete(url)
+            raise
+    
+    def save_temp_data(self, school_name: str, year: int, data: Dict, province_id: str = DEFAULT_PROVINCE):
+        """保存原始响应到临时存储"""
+        with self.metrics.timer('stage_seconds', stage='save_temp'):
+            location = self.archive.put(province_id, school_name, year, data)
+        self.metrics.inc('temp_saved_total')
+        print(f"    已保存临时文件: {location}")
+    
+    def flatten_response(self, data: Dict, year: int) -> List[Dict]:
+        """把一份响应展开为记录列表，并补充年份和类型字段"""
+        year_records = []
+        if 'data' not in data:
+            return year_records
+        
+        if isinstance(data['data'], dict):
+            # 新格式：data是字典，包含不同类型的数据
+            for type_key, type_data in data['data'].items():
+                if isinstance(type_data, dict) and 'item' in type_data:
+                    for record in type_data['item']:
+                        record['year'] = year
+                        record['type_key'] = type_key
+                        year_records.append(record)
+        elif isinstance(data['data'], list):
+            # 旧格式：data是列表
+            for record in data['data']:
+                record['year'] = year
+                year_records.append(record)
+        return year_records
+    
+    def merge_school_data(self, school_name: str, province_id: str = DEFAULT_PROVINCE,
+                          responses: Dict[int, Dict] = None) -> List[Dict]:
+        """合并同一学校的所有年份数据；responses 为内存中的 {年份: 响应}，其中没有的年份从原始响应存储读取"""
+        start = time.perf_counter()
         all_data = []
         
         for year in self.years:
-            filename = f"{school_name}_{year}.json"
-            filepath = self.temp_dir / filename
-            
-            if filepath.exists():
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        
-                    if 'data' in data:
-                        year_records = []
-                        if isinstance(data['data'], dict):
-                            # 新格式：data是字典，包含不同类型的数据
-                            for type_key, type_data in data['data'].items():
-                                if isinstance(type_data, dict) and 'item' in type_data:
-                                    for record in type_data['item']:
-                                        record['year'] = year
-                                        record['type_key'] = type_key
-                                        year_records.append(record)
-                        elif isinstance(data['data'], list):
-                            # 旧格式：data是列表
-                            for record in data['data']:
-                                record['year'] = year
-                                year_records.append(record)
-                        
-                        all_data.extend(year_records)
-                        print(f"    合并 {year} 年数据: {len(year_records)} 条")
-                except Exception as e:
-                    print(f"    读取 {year} 年数据失败: {e}")
+            try:
+                if responses is not None and year in responses:
+                    data = responses[year]
+                elif self.archive is not None:
+                    data = self.archive.get(province_id, school_name, year)
+                else:
+                    data = None
+                if data is None:
+                    continue
+                
+                year_records = self.flatten_response(data, year)
+                if 'data' in data:
+                    all_data.extend(year_records)
+                    print(f"    合并 {year} 年数据: {len(year_records)} 条")
+            except Exception as e:
+                self.metrics.inc('errors_total', stage='merge', type=error_type(e))
+                print(f"    读取 {year} 年数据失败: {e}")
         
+        # 按列统一字段类型：数值转成整数（'-' 为空值），重复的分类字符串共用
+        normalize_records(all_data)
+        self.metrics.observe('stage_seconds', time.perf_counter() - start, stage='merge')
+        self.metrics.inc('records_merged_total', len(all_data))
         return all_data
     
-    def save_excel_data(self, school_name: str, data: List[Dict]):
+    def save_excel_data(self, school_name: str, data: List[Dict], province_id: str = DEFAULT_PROVINCE) -> bool:
         """将数据保存为Excel文件"""
         if not data:
             print(f"    警告: {school_name} 没有数据可保存")
-            return
+            return False
         
         try:
-            df = pd.DataFrame(data)
-            filename = f"{school_name}.xlsx"
-            filepath = self.score_dir / filename
-            
-            df.to_excel(filepath, index=False, engine='openpyxl')
+            with self.metrics.timer('stage_seconds', stage='excel'):
+                # 数值列为整数类型，Excel 中存为数字而不是文本
+                df = to_dataframe(data)
+                filename = f"{school_name}.xlsx"
+                filepath = self.province_score_dir(province_id) / filename
+                
+                df.to_excel(filepath, index=False, engine='openpyxl')
+            self.metrics.inc('excel_files_total')
             print(f"    已保存Excel: {filepath} ({len(data)} 条记录)")
+            return True
         except Exception as e:
+            self.metrics.inc('errors_total', stage='excel', type=error_type(e))
             print(f"    保存Excel失败: {e}")
+            return False
+    
+    def is_exported(self, school_name: str, school_code: str, province_id: str, input_hash: str) -> bool:
+        """断点续爬时判断该学校的输入是否与上次导出相同，且导出结果仍在"""
+        if not self.resume or self.manifest.export_hash(province_id, school_code) != input_hash:
+            return False
+        if self.excel and not (self.province_score_dir(province_id) / f"{school_name}.xlsx").exists():
+            return False
+        return self.store is None or self.store.has_school(province_id, school_code)
+    
+    def finish_school(self, school_name: str, school_code: str, province_id: str = DEFAULT_PROVINCE,
+                      responses: Dict[int, Dict] = None, failed_years: Iterable[int] = ()) -> bool:
+        """合并一所学校的数据并交给汇总阶段；断点续爬时输入未变化则跳过
+        
+        failed_years 为本次抓取失败的年份：原始响应存储中也没有这些年份时不合并写入，
+        否则集中存储会用缺少这些年份的记录替换该学校，删除已有的记录。
+        """
+        lost_years = [year for year in failed_years
+                      if self.archive is None or not self.archive.exists(province_id, school_name, year)]
+        if lost_years:
+            self.metrics.inc('schools_skipped_total', reason='fetch_failed')
+            print(f"  {school_name} 的 {lost_years} 年数据抓取失败且没有保存的原始响应，跳过合并写入以保留已有记录")
+            return False
+        
+        input_hash = None
+        if self.manifest:
+            input_hash = self.manifest.input_hash(province_id, school_code, self.years)
+        if self.is_exported(school_name, school_code, province_id, input_hash):
+            print(f"  {school_name} 的输入未变化，跳过合并导出")
+            return True
+        
+        print(f"  合并 {school_name} 的数据...")
+        merged_data = self.merge_school_data(school_name, province_id, responses)
+        if not merged_data:
+            return False
+        
+        item = (province_id, school_code, school_name, merged_data, input_hash)
+        if self.sink is not None:
+            self.sink.put(item)
+        else:
+            self.export_schools([item])
+        return True
+    
+    def export_schools(self, batch: List[Tuple[str, str, str, List[Dict], Optional[str]]]):
+        """汇总阶段：导出 Excel（可选），把一批学校写入集中存储（一个事务）并记录导出哈希"""
+        if self.excel:
+            # 内容与上次写入相同的学校沿用已有的 Excel
+            batch = [item for item in batch
+                     if self.is_excel_current(*item[:4]) or self.save_excel_data(item[2], item[3], item[0])]
+        if not batch:
+            return
+        
+        if self.store:
+            with self.metrics.timer('stage_seconds', stage='store'):
+                total = self.store.write_schools(
+                    ((province_id, school_code, school_name, records)
+                     for province_id, school_code, school_name, records, _ in batch),
+                    run_id=self.run_id,
+                )
+            self.metrics.inc('store_records_total', total)
+            print(f"    已写入集中存储: {self.store.path} ({len(batch)} 所学校, {total} 条记录)")
+        
+        if self.manifest:
+            for province_id, school_code, _, records, input_hash in batch:
+                if input_hash is not None:
+                    self.manifest.record_export(province_id, school_code, input_hash, len(records))
+    
+    def is_excel_current(self, province_id: str, school_code: str, school_name: str, records: List[Dict]) -> bool:
+        """记录与集中存储中的完全相同且 Excel 已存在时不必重新导出"""
+        if self.store is None or not (self.province_score_dir(province_id) / f"{school_name}.xlsx").exists():
+            return False
+        return self.store.unchanged(province_id, school_code, records)
+    
+    def print_changes(self):
+        """打印本次运行写入集中存储的记录级变更"""
+        if self.store is None:
+            return
+        changes = self.store.changes(run_id=self.run_id)
+        counts = summarize(changes)
+        print(f"\n本次运行 {self.run_id} 的记录变更: 新增 {counts[OP_INSERT]}，更新 {counts[OP_UPDATE]}，"
+              f"删除 {counts[OP_DELETE]}，涉及 {len({(c.province_id, c.school_code) for c in changes})} 所学校"
+              f"（可用 score_store.py changes --run {self.run_id} --output 导出增量）")
+    
+    def start_sink(self, handler=None):
+        self.sink = SinkWorker(handler or self.export_schools, metrics=self.metrics, name='export')
+    
+    def close_sink(self):
+        """等待汇总阶段处理完队列中的所有学校"""
+        sink, self.sink = self.sink, None
+        if sink is not None:
+            sink.close()
+    
+    def rebuild_store(self):
+        """不发请求，只从已有临时存储重新合并并写入集中存储（每个省份一次顺序读取）"""
+        if self.archive is None:
+            raise ValueError("没有保存原始响应，无法重新合并")
+        school_mapping = self.load_school_mapping()
+        self.start_sink()
+        try:
+            for province_id in self.provinces:
+                responses = {}
+                for school_name, year, data in self.archive.iter_all(province_id):
+                    responses.setdefault(school_name, {})[year] = data
+                
+                for school_name, school_code in school_mapping.items():
+                    if school_name not in responses:
+                        continue
+                    merged_data = self.merge_school_data(school_name, province_id, responses.pop(school_name))
+                    if merged_data:
+                        self.sink.put((province_id, school_code, school_name, merged_data, None))
+        finally:
+            self.close_sink()
+        self.print_changes()
     
     def crawl_all_schools(self):
-        """爬取所有学校的数据"""
+        """按 学校 × 年份 × 省份 的抓取计划爬取所有数据"""
         # 加载学校映射
         school_mapping = self.load_school_mapping()
         
-        print(f"\n开始爬取 {len(school_mapping)} 所学校的录取分数线数据...")
+        print(f"\n开始爬取 {len(school_mapping)} 所学校在 {len(self.provinces)} 个省份的录取分数线数据...")
         print(f"目标年份: {self.years}")
         
+        # 已成功且临时文件仍在的单元格视为完成，其余为缺失；不保存原始响应时所有单元格都要抓取
+        completed = self.manifest.completed_keys() if self.manifest and self.archive is not None else set()
+        
+        def is_done(task: CrawlTask) -> bool:
+            return ((task.province_id, task.school_code, task.year) in completed
+                    and self.archive.exists(task.province_id, task.school_name, task.year))
+        
+        plan = build_crawl_plan(school_mapping, self.years, self.provinces,
+                                is_missing=lambda task: not is_done(task), order=self.plan_order)
+        
         success_count = 0
-        total_schools = len(school_mapping)
+        finished_count = 0
+        units = [(province_id, school_name) for province_id in self.provinces for school_name in school_mapping]
+        total_schools = len(units)
+        pending_years = {unit: len(self.years) for unit in units}
+        school_has_data = {unit: False for unit in units}
+        # 本次抓取失败的年份，学校完成时据此判断合并结果是否完整
+        failed_years: Dict[Tuple[str, str], List[int]] = {}
+        # 已抓取、所在学校还没抓完的响应；学校所有年份完成后交给合并，不再经过临时文件读回
+        responses: Dict[Tuple[str, str], Dict[int, Dict]] = {}
         
-        # 遍历所有学校
-        for i, (school_name, school_code) in enumerate(school_mapping.items(), 1):
-            print(f"\n[{i}/{total_schools}] 正在处理: {school_name} (代码: {school_code})")
+        def on_year_done(province_id: str, school_name: str):
+            """某年份处理完毕；学校所有年份都完成后合并并交给汇总阶段"""
+            nonlocal success_count, finished_count
+            unit = (province_id, school_name)
+            pending_years[unit] -= 1
+            if pending_years[unit] > 0:
+                return
             
-            school_has_data = False
+            finished_count += 1
+            school_code = school_mapping[school_name]
+            school_responses = responses.pop(unit, {})
+            print(f"\n[{finished_count}/{total_schools}] 完成: {PROVINCES[province_id]} {school_name} (代码: {school_code})")
+            if school_has_data[unit] and self.finish_school(school_name, school_code, province_id, school_responses,
+                                                            failed_years.pop(unit, [])):
+                success_count += 1
             
-            # 获取每年的数据
-            for year in self.years:
-                print(f"  获取 {year} 年数据...")
-                data = self.fetch_score_data(school_code, year)
-                
-                if data and 'data' in data:
-                    self.save_temp_data(school_name, year, data)
-                    school_has_data = True
+            # 每处理10所学校显示进度
+            if finished_count % 10 == 0:
+                print(f"\n进度: {finished_count}/{total_schools} ({finished_count/total_schools*100:.1f}%), 成功: {success_count}")
+        
+        def fetch(task: CrawlTask) -> Dict:
+            return self.fetch_score_data(task.school_code, task.year, task.province_id)
+        
+        # 抓取 → 解析 → 展开 → 汇总 的流水线：在途请求数有上限，汇总队列满时主线程阻塞，抓取随之放慢；
+        # 速率由全局令牌桶控制；中途退出也会等汇总阶段写完已合并的学校
+        self.start_sink()
+        try:
+            fetch_plan = []
+            skipped_count = 0
+            for task in plan:
+                if self.resume and is_done(task):
+                    # 断点续爬：已完成的单元格不再请求，合并时从原始响应存储读取
+                    skipped_count += 1
+                    school_has_data[(task.province_id, task.school_name)] = True
+                    on_year_done(task.province_id, task.school_name)
                 else:
-                    print(f"    {year} 年数据获取失败或无数据")
-                
-                # 添加延时避免请求过快
-                time.sleep(1)
-            
-            # 合并该学校的所有年份数据
-            if school_has_data:
-                print(f"  合并 {school_name} 的数据...")
-                merged_data = self.merge_school_data(school_name)
-                if merged_data:
-                    self.save_excel_data(school_name, merged_data)
-                    success_count += 1
+                    fetch_plan.append(task)
+            if self.resume:
+                print(f"\n断点续爬: 跳过 {skipped_count} 个已完成的单元格，待抓取 {len(fetch_plan)} 个")
             
-            # 学校间添加更长延时
-            time.sleep(2)
-            
-            # 每处理10所学校显示进度
-            if i % 10 == 0:
-                print(f"\n进度: {i}/{total_schools} ({i/total_schools*100:.1f}%), 成功: {success_count}")
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for task, future in bounded_map(executor, fetch, fetch_plan, self.concurrency * 2):
+                    data = future.result()
+                    unit = (task.province_id, task.school_name)
+                    
+                    if data and 'data' in data:
+                        # 原始响应旁路存档（在展开前写入，展开会修改记录）
+                        if self.archive is not None:
+                            self.save_temp_data(task.school_name, task.year, data, task.province_id)
+                        responses.setdefault(unit, {})[task.year] = data
+                        school_has_data[unit] = True
+                    else:
+                        if not data:
+                            failed_years.setdefault(unit, []).append(task.year)
+                        print(f"    {PROVINCES[task.province_id]} {task.school_name} {task.year} 年数据获取失败或无数据")
+                    
+                    on_year_done(task.province_id, task.school_name)
+        finally:
+            self.close_sink()
         
         print(f"\n所有数据爬取完成！")
         print(f"总计处理: {total_schools} 所学校")
         print(f"成功获取数据: {success_count} 所学校")
         print(f"成功率: {success_count/total_schools*100:.1f}%")
+        failed = self.metrics.counter_value('fetches_total', status=STATUS_FAILED)
+        if failed:
+            print(f"有 {failed:g} 个单元格重试后仍抓取失败，可使用 --resume 只重新抓取这些单元格")
+        self.print_changes()
+        print(f"\n运行指标汇总:\n{self.metrics.summary_table()}")
+    
+    def crawl_queue(self, queue: JobQueue, worker: str, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        """作为共享任务队列的一个 worker 抓取，可在多个进程或共享磁盘的多台机器上同时运行
+        
+        启动时把抓取计划加入队列（已在队列中的任务不重复加入），之后循环领取任务抓取。某学校最后一个年份
+        由哪个 worker 完成，就由它从原始响应存储读取其他年份合并导出，因此各 worker 须共享原始响应存储。
+        """
+        if self.archive is None:
+            raise ValueError("共享任务队列时需要保存原始响应，供完成学校的 worker 合并其他 worker 抓取的年份")
+        school_mapping = self.load_school_mapping()
+        plan = build_crawl_plan(school_mapping, self.years, self.provinces,
+                                is_missing=lambda task: True, order=self.plan_order)
+        added = queue.enqueue(plan)
+        counts = queue.counts()
+        print(f"\nworker {worker} 加入任务队列 {queue.path}: 新加入 {added} 个任务，等待 {counts[JOB_PENDING]}，"
+              f"领取中 {counts[JOB_LEASED]}，已完成 {counts[JOB_DONE]}，失败 {counts[JOB_FAILED]}")
+        
+        fetched_count = 0
+        finished_count = 0
+        success_count = 0
+        
+        def fetch(task: CrawlTask) -> Dict:
+            return self.fetch_score_data(task.school_code, task.year, task.province_id)
+        
+        def leased_tasks():
+            """每次领取一批任务；队列中没有可领取的任务时结束"""
+            while True:
+                tasks = queue.lease(worker, self.concurrency)
+                if not tasks:
+                    return
+                self.metrics.inc('jobs_leased_total', len(tasks))
+                yield from tasks
+        
+        def export_and_record(batch: List[Tuple[str, str, str, List[Dict], Optional[str]]]):
+            self.export_schools(batch)
+            for province_id, school_code, *_ in batch:
+                queue.record_merge(province_id, school_code)
+        
+        def merge(province_id: str, school_name: str, school_code: str, responses: Dict[int, Dict]):
+            nonlocal finished_count, success_count
+            finished_count += 1
+            print(f"\n[{finished_count}] 完成: {PROVINCES[province_id]} {school_name} (代码: {school_code})")
+            if self.finish_school(school_name, school_code, province_id, responses):
+                success_count += 1
+            else:
+                # 没有数据可合并，也算处理过
+                queue.record_merge(province_id, school_code)
+        
+        # 领取的任务（包括已领取、还没轮到抓取的）由后台线程定期续约；进程崩溃后租约过期，任务回到队列
+        heartbeat = Heartbeat(queue, worker).start()
+        self.start_sink(export_and_record)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                while True:
+                    for task, future in bounded_map(executor, fetch, leased_tasks(), self.concurrency * 2):
+                        data = future.result()
+                        fetched_count += 1
+                        responses = {}
+                        if data and 'data' in data:
+                            # 先写入共享的原始响应存储再报告完成，负责合并的 worker 一定能读到
+                            self.save_temp_data(task.school_name, task.year, data, task.province_id)
+                            responses[task.year] = data
+                        else:
+                            print(f"    {PROVINCES[task.province_id]} {task.school_name} {task.year} 年数据获取失败或无数据")
+                        
+                        # 抓取失败的任务放回队列，由本 worker 或其他 worker 稍后重试
+                        if queue.complete(worker, task, ok=bool(data)):
+                            merge(task.province_id, task.school_name, task.school_code, responses)
+                    
+                    # 没有可领取的任务了；其他 worker 仍持有租约时等待，它们崩溃后过期的任务由这里接手
+                    if not queue.remaining():
+                        break
+                    time.sleep(poll_interval)
+            
+            # 先等本 worker 的汇总阶段写完，再补上负责合并的 worker 在写入前崩溃的学校
+            # （与其他仍在写入的 worker 重复时，第二次写入内容不变会被跳过）
+            self.close_sink()
+            self.start_sink(export_and_record)
+            for province_id, school_name, school_code in queue.unmerged():
+                merge(province_id, school_name, school_code, {})
+        finally:
+            heartbeat.stop()
+            released = queue.release(worker)
+            if released:
+                print(f"\n已交还 {released} 个未完成的任务")
+            self.close_sink()
+        
+        counts = queue.counts()
+        print("\n任务队列已全部结束！")
+        print(f"本 worker 抓取: {fetched_count} 个单元格，合并学校: {finished_count} 所，成功: {success_count} 所")
+        print(f"队列: 完成 {counts[JOB_DONE]} 个任务，失败 {counts[JOB_FAILED]} 个"
+              + (f"（可用 job_queue.py --queue {queue.path} requeue 放回队列重试）" if counts[JOB_FAILED] else ""))
+        self.print_changes()
+        print(f"\n运行指标汇总:\n{self.metrics.summary_table()}")
 
 def main():
-    parser = argparse.ArgumentParser(description='湖南省高考录取分数线爬虫')
+    parser = argparse.ArgumentParser(description='高考录取分数线爬虫（默认湖南省）')
     parser.add_argument('--years', nargs='+', type=int, default=DEFAULT_YEARS,
                        help=f'要爬取的年份列表，默认: {DEFAULT_YEARS}')
+    parser.add_argument('--provinces', nargs='+', default=[DEFAULT_PROVINCE],
+                       help=f'要爬取的省份代码或名称列表，all 表示全部省份，默认: {DEFAULT_PROVINCE}(湖南)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help=f'同时在途的请求数，默认: {DEFAULT_CONCURRENCY}')
+    parser.add_argument('--rps', type=float, default=DEFAULT_RPS,
+                       help=f'全局每秒请求数上限，0 表示不限速，默认: {DEFAULT_RPS}')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='自适应限速：从 --rps 开始，服务器健康时逐步提速，遇到 429/5xx 立即减半')
+    parser.add_argument('--max-rps', type=float, default=DEFAULT_MAX_RPS,
+                       help=f'自适应限速的速率上限，默认: {DEFAULT_MAX_RPS}')
+    parser.add_argument('--retries', type=int, default=DEFAULT_MAX_RETRIES,
+                       help=f'429/5xx/超时的最大重试次数（指数退避加抖动，遵守 Retry-After），默认: {DEFAULT_MAX_RETRIES}')
+    parser.add_argument('--cache', type=Path, default=DEFAULT_CACHE_PATH,
+                       help=f'条件请求缓存文件路径，默认: {DEFAULT_CACHE_PATH}')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='禁用条件请求缓存，每次都完整下载')
+    parser.add_argument('--closed-years', nargs='*', type=int, default=[],
+                       help='已封榜年份列表，这些年份有缓存时不再请求')
+    parser.add_argument('--manifest', type=Path, default=DEFAULT_MANIFEST_PATH,
+                       help=f'断点清单文件路径，默认: {DEFAULT_MANIFEST_PATH}')
+    parser.add_argument('--resume', action='store_true',
+                       help='断点续爬：跳过已完成的抓取，只重试失败和空响应，输入未变化的学校不重新导出')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                       help=f'集中存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    parser.add_argument('--excel', action='store_true',
+                       help='同时为每所学校导出 Excel 到 score/（也可之后用 score_store.py export-excel 按需导出）')
+    parser.add_argument('--merge-only', action='store_true',
+                       help='不发请求，只把已有临时文件合并写入集中存储')
+    parser.add_argument('--no-archive', action='store_true',
+                       help='不保存原始响应，直接合并写入集中存储（之后无法 --merge-only，断点续爬时已完成的单元格也要重新抓取）')
+    parser.add_argument('--plan-order', choices=PLAN_ORDERS, default=ORDER_SCHOOL,
+                       help='抓取顺序：school 为逐个学校抓完所有年份，合并导出与抓取同时进行，缺失年份较新的学校在前；'
+                            f'year 为所有学校按年份从新到旧，默认: {ORDER_SCHOOL}')
+    parser.add_argument('--archive', choices=['files', 'sqlite'], default='files',
+                       help='原始响应存储方式：files 为 temp/ 下每份一个文件，sqlite 为压缩去重归档，默认: files')
+    parser.add_argument('--archive-path', type=Path, default=DEFAULT_ARCHIVE_PATH,
+                       help=f'sqlite 归档文件路径，默认: {DEFAULT_ARCHIVE_PATH}')
+    parser.add_argument('--queue', type=Path, nargs='?', const=DEFAULT_QUEUE_PATH,
+                       help='作为共享任务队列的 worker 运行，可同时启动多个进程共同完成一次抓取；'
+                            f'--rps 为每个 worker 的限速。不指定路径时为 {DEFAULT_QUEUE_PATH}')
+    parser.add_argument('--worker-id', default=None,
+                       help='worker 名称，默认为 主机名-进程号')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                       help=f'任务租约时长（秒），worker 崩溃后其任务在此之后回到队列，默认: {DEFAULT_LEASE_SECONDS:g}')
+    parser.add_argument('--metrics-file', type=Path,
+                       help='定期把运行指标写入文件：.prom 后缀为 Prometheus 文本格式，其他为 JSON 快照')
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_INTERVAL,
+                       help=f'指标文件写入间隔（秒），默认: {DEFAULT_INTERVAL}')
+    parser.add_argument('--metrics-port', type=int,
+                       help='在本地端口提供 /metrics（Prometheus）和 /metrics.json')
     
     args = parser.parse_args()
     
-    spider = HunanScoreSpider(years=args.years)
-    spider.crawl_all_schools()
+    try:
+        provinces = parse_provinces(args.provinces)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.merge_only and args.no_archive:
+        parser.error('--merge-only 需要已保存的原始响应，不能与 --no-archive 同时使用')
+    if args.queue and (args.merge_only or args.no_archive or args.resume):
+        parser.error('--queue 不能与 --merge-only、--no-archive 同时使用；进度由队列记录，不需要 --resume')
+    
+    cache = None if args.no_cache else RevalidationCache(args.cache, closed_years=args.closed_years)
+    manifest = CrawlManifest(args.manifest)
+    store = ScoreStore(args.store)
+    archive = None if args.no_archive else open_archive(args.archive, archive_path=args.archive_path)
+    metrics = Metrics()
+    reporter = MetricsReporter(metrics, args.metrics_file, args.metrics_interval).start() if args.metrics_file else None
+    metrics_server = serve_metrics(metrics, args.metrics_port) if args.metrics_port else None
+    queue = JobQueue(args.queue, lease_seconds=args.lease_seconds) if args.queue else None
+    spider = HunanScoreSpider(years=args.years, concurrency=args.concurrency, rps=args.rps,
+                              cache=cache, manifest=manifest, resume=args.resume, provinces=provinces,
+                              store=store, excel=args.excel, archive=archive, metrics=metrics,
+                              max_retries=args.retries, adaptive=args.adaptive, max_rps=args.max_rps,
+                              plan_order=args.plan_order, keep_raw=not args.no_archive)
+    try:
+        if args.merge_only:
+            spider.rebuild_store()
+        elif queue:
+            spider.crawl_queue(queue, args.worker_id or default_worker_id())
+        else:
+            spider.crawl_all_schools()
+    finally:
+        if reporter:
+            reporter.stop()
+        if metrics_server:
+            metrics_server.shutdown()
+        if cache:
+            cache.close()
+        if queue:
+            queue.close()
+        manifest.close()
+        store.close()
+        if archive:
+            archive.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,310 @@
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from crawl_scheduler import CrawlTask
+
+DEFAULT_QUEUE_PATH = Path("cache") / "job_queue.sqlite3"
+# 租约时长：持有者在此期间没有续约（进程崩溃、机器断开）时任务自动回到队列
+DEFAULT_LEASE_SECONDS = 120.0
+# 同一任务最多被领取的次数，超过后标记为失败，避免一个总是失败的任务无限循环
+DEFAULT_MAX_ATTEMPTS = 5
+# 没有可领取的任务、但其他 worker 仍持有租约时，每隔多少秒查看一次
+DEFAULT_POLL_INTERVAL = 5.0
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_LEASED = 'leased'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_STATES = [JOB_PENDING, JOB_LEASED, JOB_DONE, JOB_FAILED]
+
+
+class Lease(NamedTuple):
+    """某个 worker 持有的租约"""
+    worker: str
+    tasks: int
+    expires_at: float
+
+
+def default_worker_id() -> str:
+    """主机名 + 进程号，多台机器共享同一个队列文件时也不会重复"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """多个爬虫进程共享的(省份, 学校, 年份)任务队列（SQLite 存储，可放在共享磁盘上）
+
+    worker 领取任务时取得有期限的租约，处理期间由 Heartbeat 定期续约；租约过期的任务可被其他 worker 重新领取，
+    因此崩溃进程的任务会自动回到队列。完成是“至少一次”的：租约过期后原持有者和新持有者可能都抓取了同一任务，
+    但任务只会被标记完成一次，学校所有年份结束时也只有一个 worker 负责合并。
+    """
+
+    def __init__(self, path: Path = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        # 其他进程持有写锁时最多等待 30 秒
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                school_name TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (province_id, school_code, year)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, position)")
+        # 已合并写入的学校；负责合并的 worker 在写入前崩溃时，学校留在这里之外，由其他 worker 收尾时补上
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS merges (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                merged_at REAL NOT NULL,
+                PRIMARY KEY (province_id, school_code)
+            )"""
+        )
+        self._conn.commit()
+
+    def enqueue(self, tasks: Iterable[CrawlTask]) -> int:
+        """按顺序加入任务，已在队列中的任务（无论状态）保持不变；多个 worker 启动时各自调用也只加入一次
+
+        返回新加入的任务数。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            start = self._conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM jobs").fetchone()[0]
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (province_id, school_code, year, school_name, position, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(task.province_id, task.school_code, task.year, task.school_name, start + i, JOB_PENDING, now)
+                 for i, task in enumerate(tasks)],
+            )
+            return self._conn.total_changes - before
+
+    def lease(self, worker: str, limit: int) -> List[CrawlTask]:
+        """领取最多 limit 个任务（等待中的，或租约已过期的），按加入顺序返回
+
+        单条 UPDATE ... RETURNING 完成选取和占用，多个进程同时领取也不会拿到同一任务。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            # 多次领取后仍未完成的任务不再重试
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (JOB_FAILED, now, JOB_LEASED, now, self.max_attempts),
+            )
+            rows = self._conn.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE rowid IN (SELECT rowid FROM jobs WHERE state = ? OR (state = ? AND lease_until < ?) "
+                "ORDER BY position LIMIT ?) "
+                "RETURNING position, province_id, school_name, school_code, year",
+                (JOB_LEASED, worker, now + self.lease_seconds, now, JOB_PENDING, JOB_LEASED, now, max(1, limit)),
+            ).fetchall()
+        return [CrawlTask(*row[1:]) for row in sorted(rows)]
+
+    def heartbeat(self, worker: str) -> int:
+        """为 worker 持有的全部任务续约，返回续约的任务数"""
+        now = time.time()
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE state = ? AND worker = ?",
+                (now + self.lease_seconds, now, JOB_LEASED, worker),
+            ).rowcount
+
+    def complete(self, worker: str, task: CrawlTask, ok: bool = True) -> bool:
+        """报告任务结果，返回该学校的所有年份是否因此全部结束（由返回 True 的 worker 负责合并）
+
+        成功时无论租约是否仍归自己、是否已因领取次数过多标记失败，都标记完成（至少一次）；重复完成不会再返回 True。
+        失败时只处理自己仍持有的租约：未达到领取次数上限则放回队列，否则标记失败。
+        """
+        now = time.time()
+        key = (task.province_id, task.school_code, task.year)
+        with self._lock, self._conn:
+            if ok:
+                changed = self._conn.execute(
+                    "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE province_id = ? AND school_code = ? AND year = ? AND state != ?",
+                    (JOB_DONE, now, *key, JOB_DONE),
+                ).rowcount
+            else:
+                changed = self._conn.execute(
+                    "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                    "worker = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE province_id = ? AND school_code = ? AND year = ? AND state = ? AND worker = ?",
+                    (self.max_attempts, JOB_FAILED, JOB_PENDING, now, *key, JOB_LEASED, worker),
+                ).rowcount
+            if not changed:
+                return False
+            # 与上面的更新在同一个写事务中，其他 worker 同时完成同一学校的其他年份时只有一方看到全部结束
+            unfinished = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE province_id = ? AND school_code = ? AND state IN (?, ?)",
+                (task.province_id, task.school_code, JOB_PENDING, JOB_LEASED),
+            ).fetchone()[0]
+        return unfinished == 0
+
+    def record_merge(self, province_id: str, school_code: str):
+        """记录某学校已合并写入"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO merges VALUES (?, ?, ?)", (province_id, school_code, time.time()))
+
+    def unmerged(self) -> List[Tuple[str, str, str]]:
+        """所有年份都已结束但还没有合并写入的学校(省份, 学校名, 学校代码)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT j.province_id, j.school_name, j.school_code FROM jobs j "
+                "LEFT JOIN merges m ON m.province_id = j.province_id AND m.school_code = j.school_code "
+                "WHERE m.province_id IS NULL GROUP BY j.province_id, j.school_code "
+                "HAVING SUM(j.state IN (?, ?)) = 0 ORDER BY MIN(j.position)",
+                (JOB_PENDING, JOB_LEASED),
+            ).fetchall()
+
+    def release(self, worker: str) -> int:
+        """worker 正常退出（如 Ctrl-C）时交还未完成的任务，不计入领取次数；返回交还的任务数"""
+        now = time.time()
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, attempts = MAX(attempts - 1, 0), "
+                "updated_at = ? WHERE state = ? AND worker = ?",
+                (JOB_PENDING, now, JOB_LEASED, worker),
+            ).rowcount
+
+    def requeue(self, states: Iterable[str] = (JOB_FAILED,)) -> int:
+        """把指定状态的任务放回队列并清零领取次数，返回放回的任务数；所在学校结束后重新合并"""
+        states = list(states)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"DELETE FROM merges WHERE (province_id, school_code) IN "
+                f"(SELECT province_id, school_code FROM jobs WHERE state IN ({', '.join('?' for _ in states)}))",
+                states,
+            )
+            return self._conn.execute(
+                f"UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, attempts = 0, updated_at = ? "
+                f"WHERE state IN ({', '.join('?' for _ in states)})",
+                (JOB_PENDING, time.time(), *states),
+            ).rowcount
+
+    def clear(self) -> int:
+        """清空队列，返回删除的任务数"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM merges")
+            return self._conn.execute("DELETE FROM jobs").rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数；租约已过期的任务仍计为 leased，下次领取时回到队列"""
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: rows.get(state, 0) for state in JOB_STATES}
+
+    def remaining(self) -> int:
+        """尚未结束（等待中或被领取）的任务数"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", (JOB_PENDING, JOB_LEASED)
+            ).fetchone()[0]
+
+    def leases(self) -> List[Lease]:
+        """各 worker 当前持有的任务数和最早到期时间"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT worker, COUNT(*), MIN(lease_until) FROM jobs WHERE state = ? GROUP BY worker ORDER BY worker",
+                (JOB_LEASED,),
+            ).fetchall()
+        return [Lease(*row) for row in rows]
+
+    def failed(self) -> List[Tuple[str, str, str, int, int]]:
+        """失败的任务(省份, 学校代码, 学校名, 年份, 领取次数)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT province_id, school_code, school_name, year, attempts FROM jobs WHERE state = ? "
+                "ORDER BY position",
+                (JOB_FAILED,),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Heartbeat:
+    """后台线程：每隔租约时长的三分之一为 worker 持有的任务续约"""
+
+    def __init__(self, queue: JobQueue, worker: str, interval: Optional[float] = None):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval if interval is not None else queue.lease_seconds / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='heartbeat', daemon=True)
+
+    def start(self) -> 'Heartbeat':
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.worker)
+            except sqlite3.OperationalError as e:
+                # 队列文件暂时被锁住时跳过这一次，租约时长内还有两次机会
+                print(f"    续约失败: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看和管理多个爬虫进程共享的任务队列')
+    parser.add_argument('--queue', type=Path, default=DEFAULT_QUEUE_PATH,
+                        help=f'任务队列文件路径，默认: {DEFAULT_QUEUE_PATH}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='各状态的任务数和各 worker 持有的租约')
+    requeue_parser = subparsers.add_parser('requeue', help='把失败的任务放回队列')
+    requeue_parser.add_argument('--all', action='store_true', help='已完成的任务也放回队列（重新抓取一轮）')
+    subparsers.add_parser('clear', help='清空队列')
+
+    args = parser.parse_args()
+    queue = JobQueue(args.queue)
+    try:
+        if args.command == 'status':
+            counts = queue.counts()
+            print(f"任务: 共 {sum(counts.values())}，等待 {counts[JOB_PENDING]}，领取中 {counts[JOB_LEASED]}，"
+                  f"完成 {counts[JOB_DONE]}，失败 {counts[JOB_FAILED]}")
+            now = time.time()
+            for lease in queue.leases():
+                remaining = lease.expires_at - now
+                print(f"  {lease.worker:<32}{lease.tasks} 个任务，"
+                      + (f"{remaining:.0f} 秒后到期" if remaining > 0 else "租约已过期，等待其他 worker 接手"))
+            for province_id, school_code, school_name, year, attempts in queue.failed():
+                print(f"  失败: {province_id} {school_name}({school_code}) {year} 年，领取 {attempts} 次")
+        elif args.command == 'requeue':
+            states = [JOB_FAILED, JOB_DONE] if args.all else [JOB_FAILED]
+            print(f"已放回 {queue.requeue(states)} 个任务")
+        elif args.command == 'clear':
+            print(f"已删除 {queue.clear()} 个任务")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import json
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+# 可通过环境变量强制指定编解码器：orjson / msgspec / json
+CODEC_ENV = 'GAOKAO_JSON_CODEC'
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# 各实现解析失败时抛出的异常（orjson 的异常是 json.JSONDecodeError 的子类）
+DECODE_ERRORS = (ValueError,) if msgspec is None else (ValueError, msgspec.DecodeError)
+
+# 分数线记录字段（接口原始类型：除 zslx_rank/diff 外均为字符串）
+SCORE_ITEM_FIELDS = [
+    'school_id', 'province_id', 'type', 'batch', 'zslx', 'xclevel', 'max', 'min_section', 'min',
+    'average', 'filing', 'special_group', 'first_km', 'num', 'local_province_name',
+    'local_type_name', 'local_batch_id', 'local_batch_name', 'zslx_name', 'xclevel_name',
+    'zslx_rank', 'sg_fxk', 'sg_sxk', 'sg_type', 'sg_name', 'sg_info', 'proscore', 'year', 'diff',
+]
+
+
+class Codec:
+    """JSON 编解码器；输出与 json.dumps(ensure_ascii=False) 等价"""
+
+    name = 'json'
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any, indent: Optional[int] = None) -> str:
+        if indent is None:
+            return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+        return json.dumps(obj, ensure_ascii=False, indent=indent)
+
+    def dumps_bytes(self, obj: Any, indent: Optional[int] = None) -> bytes:
+        return self.dumps(obj, indent).encode('utf-8')
+
+
+class OrjsonCodec(Codec):
+    name = 'orjson'
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any, indent: Optional[int] = None) -> str:
+        return self.dumps_bytes(obj, indent).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any, indent: Optional[int] = None) -> bytes:
+        if indent is None:
+            return orjson.dumps(obj)
+        if indent == 2:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return super().dumps_bytes(obj, indent)
+
+
+class MsgspecCodec(Codec):
+    name = 'msgspec'
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(self, obj: Any, indent: Optional[int] = None) -> str:
+        return self.dumps_bytes(obj, indent).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any, indent: Optional[int] = None) -> bytes:
+        body = self._encoder.encode(obj)
+        if indent is None:
+            return body
+        return msgspec.json.format(body, indent=indent)
+
+
+def available_codecs() -> Dict[str, Codec]:
+    """当前环境可用的编解码器，按优先级排列"""
+    codecs = {}
+    if orjson is not None:
+        codecs['orjson'] = OrjsonCodec()
+    if msgspec is not None:
+        codecs['msgspec'] = MsgspecCodec()
+    codecs['json'] = Codec()
+    return codecs
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """按名称取编解码器，未指定时选择最快的可用实现"""
+    codecs = available_codecs()
+    if name:
+        if name not in codecs:
+            raise ValueError(f"编解码器 {name} 不可用，可用: {list(codecs)}")
+        return codecs[name]
+    return next(iter(codecs.values()))
+
+
+codec = get_codec(os.environ.get(CODEC_ENV))
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """解析 JSON 字符串或字节"""
+    return codec.loads(data)
+
+
+def dumps(obj: Any, indent: Optional[int] = None) -> str:
+    """序列化为字符串（不转义中文）；indent 为 None 时输出紧凑格式"""
+    return codec.dumps(obj, indent)
+
+
+def dumps_bytes(obj: Any, indent: Optional[int] = None) -> bytes:
+    """序列化为 UTF-8 字节"""
+    return codec.dumps_bytes(obj, indent)
+
+
+def load(f) -> Any:
+    """从已打开的文件读取 JSON"""
+    return codec.loads(f.read())
+
+
+def dump(obj: Any, f, indent: Optional[int] = None):
+    """写入已打开的文本文件"""
+    f.write(codec.dumps(obj, indent))
+
+
+def load_path(path) -> Any:
+    """按路径读取 JSON 文件"""
+    with open(path, 'rb') as f:
+        return codec.loads(f.read())
+
+
+if msgspec is not None:
+    class ScoreItem(msgspec.Struct):
+        """一条分数线记录（直接由 msgspec 解码）"""
+        school_id: str
+        province_id: str
+        type: str
+        batch: str
+        zslx: str
+        xclevel: str
+        max: str
+        min_section: str
+        min: str
+        average: str
+        filing: str
+        special_group: str
+        first_km: str
+        num: str
+        local_province_name: str
+        local_type_name: str
+        local_batch_id: str
+        local_batch_name: str
+        zslx_name: str
+        xclevel_name: str
+        zslx_rank: int
+        sg_fxk: str
+        sg_sxk: str
+        sg_type: str
+        sg_name: str
+        sg_info: str
+        proscore: str
+        year: str
+        diff: Union[int, str]
+
+    class _ScoreGroup(msgspec.Struct):
+        item: List[ScoreItem] = []
+
+    class _ScoreResponse(msgspec.Struct):
+        data: Union[Dict[str, _ScoreGroup], List[ScoreItem]] = {}
+
+    _score_decoder = msgspec.json.Decoder(_ScoreResponse)
+else:
+    ScoreItem = NamedTuple('ScoreItem', [
+        (field, int if field == 'zslx_rank' else Union[int, str] if field == 'diff' else str)
+        for field in SCORE_ITEM_FIELDS
+    ])
+    _score_decoder = None
+
+
+def decode_score_items(body: Union[str, bytes]) -> List[ScoreItem]:
+    """把 schoolprovincescore 响应直接解码为 ScoreItem 列表（不经过中间字典）"""
+    if _score_decoder is not None:
+        data = _score_decoder.decode(body).data
+        if isinstance(data, list):
+            return data
+        return [item for group in data.values() for item in group.item]
+
+    data = loads(body).get('data', {})
+    if isinstance(data, dict):
+        records = [record for group in data.values() if isinstance(group, dict)
+                   for record in group.get('item', [])]
+    else:
+        records = data
+    return [ScoreItem(**{field: record.get(field) for field in SCORE_ITEM_FIELDS}) for record in records]
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+import json_codec
+from convert_json_to_xlsx import group_json_files, load_json_file
+from rank_index import DEFAULT_PROVINCE, DEFAULT_ZSLX, RankIndex
+from score_store import DEFAULT_STORE_PATH, ScoreStore
+from score_table import ScoreTable
+
+DEFAULT_HOST = '127.0.0.1'
+# 与 replay_server 的默认端口错开，压测时两者可同时以默认参数运行
+DEFAULT_PORT = 8766
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_LIMIT = 100
+MAX_REQUEST_HEADER = 16 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    """请求参数错误，返回 400"""
+
+
+class LRUCache:
+    """有界 LRU 缓存，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def load_catalogs(directory: Path) -> Dict[str, List[Dict]]:
+    """读取分类列表 JSON（211-*.json、985-*.json 等），按系列名合并并按 school_id 去重"""
+    catalogs = {}
+    for series_name, files in sorted(group_json_files(str(directory)).items()):
+        items, seen = [], set()
+        for file in files:
+            try:
+                page = load_json_file(Path(directory) / file)
+            except (KeyError, TypeError):
+                continue
+            for item in page:
+                school_id = item.get('school_id')
+                if school_id in seen:
+                    continue
+                seen.add(school_id)
+                items.append(item)
+        if items:
+            catalogs[series_name] = items
+    return catalogs
+
+
+def text_param(params: Dict[str, str], name: str, default: Optional[str] = None,
+               required: bool = False) -> Optional[str]:
+    value = params.get(name, '').strip()
+    if not value:
+        if required:
+            raise QueryError(f"缺少参数: {name}")
+        return default
+    return value
+
+
+def int_param(params: Dict[str, str], name: str, default: Optional[int] = None,
+              required: bool = False) -> Optional[int]:
+    value = text_param(params, name, required=required)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"参数 {name} 应为整数: {value}")
+
+
+class QueryService:
+    """内存中的分数线和分类列表查询；相同(路由, 规范化参数)的结果从 LRU 缓存直接返回"""
+
+    def __init__(self, records: Union[ScoreTable, List[Dict]], catalogs: Dict[str, List[Dict]],
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        # 记录按列存放，每所学校只保存行号，查询时再还原为字典
+        self.table = records if isinstance(records, ScoreTable) else ScoreTable.from_records(records)
+        self.index = RankIndex.build(self.table)
+        rows: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for row, key in enumerate(zip(self.table.values('province_id'), self.table.values('school_name'))):
+            rows[(str(key[0]), key[1])].append(row)
+        self.schools: Dict[Tuple[str, str], np.ndarray] = {
+            key: np.asarray(indices, dtype=np.int64) for key, indices in rows.items()
+        }
+        self.catalogs = catalogs
+        self.cache = LRUCache(cache_size)
+        self.routes: Dict[str, Tuple[Callable, Callable]] = {
+            '/school': (self.parse_school, self.query_school),
+            '/rank': (self.parse_rank, self.query_rank),
+            '/score': (self.parse_score, self.query_score),
+            '/categories': (lambda params: {}, self.query_categories),
+            '/category': (self.parse_category, self.query_category),
+        }
+
+    @classmethod
+    def load(cls, store_path: Path = DEFAULT_STORE_PATH, catalog_dir: Path = Path('.'),
+             cache_size: int = DEFAULT_CACHE_SIZE) -> 'QueryService':
+        store = ScoreStore(store_path)
+        try:
+            records = store.load_table()
+        finally:
+            store.close()
+        return cls(records, load_catalogs(catalog_dir), cache_size)
+
+    def handle(self, target: str) -> Tuple[int, bytes]:
+        """处理一个 GET 请求目标（路径 + 查询串），返回(状态码, JSON 正文)"""
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, json_codec.dumps_bytes({
+                'records': len(self.index), 'schools': len(self.schools),
+                'catalogs': len(self.catalogs), 'cache': self.cache.stats(),
+            })
+        route = self.routes.get(url.path)
+        if route is None:
+            return 404, json_codec.dumps_bytes({'error': f"未知路径: {url.path}"})
+
+        parse, query = route
+        try:
+            params = parse(dict(parse_qsl(url.query)))
+        except QueryError as e:
+            return 400, json_codec.dumps_bytes({'error': str(e)})
+        key = (url.path, tuple(sorted(params.items())))
+        body = self.cache.get(key)
+        if body is None:
+            body = json_codec.dumps_bytes(query(**params))
+            self.cache.put(key, body)
+        return 200, body
+
+    def parse_school(self, params: Dict[str, str]) -> Dict:
+        return {
+            'name': text_param(params, 'name', required=True),
+            'province': text_param(params, 'province', DEFAULT_PROVINCE),
+            'year': int_param(params, 'year'),
+            'type': text_param(params, 'type'),
+        }
+
+    def query_school(self, name: str, province: str, year: Optional[int], type: Optional[str]) -> Dict:
+        rows = self.schools.get((province, name))
+        records = [
+            record for record in (self.table.to_records(rows) if rows is not None else ())
+            if (year is None or record['year'] == year) and (type is None or record['local_type_name'] == type)
+        ]
+        return {'school_name': name, 'province_id': province, 'count': len(records), 'items': records}
+
+    def parse_window(self, params: Dict[str, str]) -> Dict:
+        return {
+            'type_name': text_param(params, 'type', required=True),
+            'province_id': text_param(params, 'province', DEFAULT_PROVINCE),
+            'year': int_param(params, 'year'),
+            'batch_name': text_param(params, 'batch'),
+            'zslx_name': text_param(params, 'zslx', DEFAULT_ZSLX),
+            'limit': int_param(params, 'limit', DEFAULT_LIMIT),
+        }
+
+    def parse_rank(self, params: Dict[str, str]) -> Dict:
+        parsed = self.parse_window(params)
+        parsed.update({
+            'rank': int_param(params, 'rank', required=True),
+            'above': int_param(params, 'above', 3000),
+            'below': int_param(params, 'below', 5000),
+        })
+        return parsed
+
+    def query_rank(self, rank: int, above: int, below: int, limit: int, **conditions) -> Dict:
+        entries = self.index.query_rank(rank=rank, above=above, below=below, **conditions)
+        return {'count': len(entries), 'items': [entry._asdict() for entry in entries[:limit]]}
+
+    def parse_score(self, params: Dict[str, str]) -> Dict:
+        parsed = self.parse_window(params)
+        parsed.update({
+            'score': int_param(params, 'score', required=True),
+            'window': int_param(params, 'window', 10),
+        })
+        return parsed
+
+    def query_score(self, score: int, window: int, limit: int, **conditions) -> Dict:
+        entries = self.index.query_score(low=score - window, high=score + window, **conditions)
+        return {'count': len(entries), 'items': [entry._asdict() for entry in entries[:limit]]}
+
+    def query_categories(self) -> Dict:
+        return {'items': [{'name': name, 'count': len(items)} for name, items in self.catalogs.items()]}
+
+    def parse_category(self, params: Dict[str, str]) -> Dict:
+        return {
+            'name': text_param(params, 'name', required=True),
+            'q': text_param(params, 'q'),
+            'province': text_param(params, 'province'),
+            'limit': int_param(params, 'limit', DEFAULT_LIMIT),
+            'offset': int_param(params, 'offset', 0),
+        }
+
+    def query_category(self, name: str, q: Optional[str], province: Optional[str], limit: int, offset: int) -> Dict:
+        items = [
+            item for item in self.catalogs.get(name, ())
+            if (q is None or q in item.get('name', '')) and (province is None or province == item.get('province_name'))
+        ]
+        return {'name': name, 'count': len(items), 'items': items[offset:offset + limit]}
+
+
+def build_response(status: int, body: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('ascii') + body
+
+
+async def serve_connection(service: QueryService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """处理一个连接上的全部请求（支持 keep-alive）"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            lines = head.decode('utf-8', 'replace').split('\r\n')
+            parts = lines[0].split(' ')
+            if len(parts) != 3:
+                writer.write(build_response(400, json_codec.dumps_bytes({'error': '请求行格式错误'}), False))
+                break
+            method, target, version = parts
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            length = headers.get('content-length') or '0'
+            if not (length.isascii() and length.isdigit()):
+                writer.write(build_response(400, json_codec.dumps_bytes({'error': 'Content-Length 格式错误'}), False))
+                break
+            length = int(length)
+            if length:
+                await reader.readexactly(length)
+
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+            if method != 'GET':
+                status, body = 405, json_codec.dumps_bytes({'error': '只支持 GET'})
+            else:
+                try:
+                    status, body = service.handle(target)
+                except Exception as e:
+                    status, body = 500, json_codec.dumps_bytes({'error': str(e)})
+            writer.write(build_response(status, body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(service: QueryService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_connection(service, reader, writer), host, port, limit=MAX_REQUEST_HEADER
+    )
+    print(f"查询服务已启动: http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地分数线查询服务（asyncio HTTP，返回 JSON）')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'集中存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    parser.add_argument('--catalog-dir', type=Path, default=Path('.'), help='分类列表 JSON 所在目录，默认: 当前目录')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址，默认: {DEFAULT_HOST}')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口，默认: {DEFAULT_PORT}')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f'查询结果缓存条数，默认: {DEFAULT_CACHE_SIZE}')
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    service = QueryService.load(args.store, args.catalog_dir, args.cache_size)
+    print(f"已加载 {len(service.index)} 条分数线记录、{len(service.catalogs)} 个分类列表，"
+          f"耗时 {time.perf_counter() - start:.2f} 秒")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n查询服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from score_schema import coerce_int
+from score_store import DEFAULT_STORE_PATH, ScoreStore
+from score_table import ScoreTable
+
+DEFAULT_PROVINCE = '43'
+DEFAULT_ZSLX = '普通类'
+
+# 索引键: (省份, 年份, 科类, 批次, 招生类型)
+IndexKey = Tuple[str, int, str, str, str]
+
+
+class RankEntry(NamedTuple):
+    school_name: str
+    school_id: str
+    year: int
+    local_type_name: str
+    local_batch_name: str
+    zslx_name: str
+    special_group: str
+    sg_name: str
+    sg_info: str
+    min: Optional[int]
+    min_section: Optional[int]
+    proscore: Optional[int]
+
+
+class SortedColumn:
+    """按某一数值列排好序的数组，区间查询为两次二分"""
+
+    def __init__(self, values: np.ndarray, positions: np.ndarray):
+        # 稳定排序：取值相同时保持记录原有顺序
+        order = np.argsort(values, kind='stable')
+        self.values = array('q', values[order].astype(np.int64).tobytes())
+        self.positions = array('q', positions[order].astype(np.int64).tobytes())
+
+    def range(self, low: int, high: int) -> array:
+        """返回取值在 [low, high] 内的记录位置"""
+        start = bisect_left(self.values, low)
+        end = bisect_right(self.values, high)
+        return self.positions[start:end]
+
+
+class RankIndex:
+    """按(省份, 年份, 科类, 批次, 招生类型)分组，对最低位次和最低分排序的内存索引"""
+
+    def __init__(self):
+        self.entries: Dict[IndexKey, List[RankEntry]] = {}
+        self.by_section: Dict[IndexKey, SortedColumn] = {}
+        self.by_score: Dict[IndexKey, SortedColumn] = {}
+        # (省份, 科类) -> 索引键，查询时只需检查同一科类下的少数分组
+        self.tracks: Dict[Tuple[str, str], List[IndexKey]] = defaultdict(list)
+
+    @classmethod
+    def build(cls, records: Union[ScoreTable, Iterable[Dict]]) -> 'RankIndex':
+        """由合并后的分数线记录（字典列表或 ScoreTable）构建索引；按列取值，'-' 或空值不进入排序列"""
+        index = cls()
+        if isinstance(records, ScoreTable):
+            def column(field: str, default=None) -> List:
+                return records.values(field) if field in records.columns else [default] * len(records)
+        else:
+            records = list(records)
+
+            def column(field: str, default=None) -> List:
+                return [record.get(field, default) for record in records]
+
+        numbers = {field: coerce_int(column(field)) for field in ('min', 'min_section', 'proscore')}
+        values = {field: [value if ok else None for value, ok in zip(data.tolist(), valid.tolist())]
+                  for field, (data, valid) in numbers.items()}
+        rows = zip(
+            column('school_name', ''), column('school_id', ''), column('year'), column('local_type_name', ''),
+            column('local_batch_name', ''), column('zslx_name', ''), column('special_group', ''),
+            column('sg_name', ''), column('sg_info', ''), values['min'], values['min_section'], values['proscore'],
+            column('province_id', DEFAULT_PROVINCE),
+        )
+
+        entries = []
+        groups = defaultdict(list)
+        for i, (school_name, school_id, year, local_type_name, local_batch_name, zslx_name, special_group,
+                sg_name, sg_info, min_score, min_section, proscore, province_id) in enumerate(rows):
+            entry = RankEntry(
+                school_name=school_name,
+                school_id=str(school_id),
+                year=int(year),
+                local_type_name=local_type_name,
+                local_batch_name=local_batch_name,
+                zslx_name=zslx_name,
+                special_group=str(special_group),
+                sg_name=sg_name,
+                sg_info=sg_info,
+                min=min_score,
+                min_section=min_section,
+                proscore=proscore,
+            )
+            key = (str(province_id), entry.year, entry.local_type_name, entry.local_batch_name, entry.zslx_name)
+            entries.append(entry)
+            groups[key].append(i)
+
+        for key, members in groups.items():
+            members = np.asarray(members, dtype=np.int64)
+            index.entries[key] = [entries[i] for i in members.tolist()]
+            index.tracks[(key[0], key[2])].append(key)
+            for field, column in (('min_section', index.by_section), ('min', index.by_score)):
+                data, valid = numbers[field]
+                present = valid[members]
+                column[key] = SortedColumn(data[members][present], np.flatnonzero(present))
+        return index
+
+    @classmethod
+    def from_store(cls, store: ScoreStore, province_id: Optional[str] = None) -> 'RankIndex':
+        """从集中存储加载记录（列式）并构建索引"""
+        return cls.build(store.load_table(province_id=province_id))
+
+    def keys(self, type_name: str, province_id: str = DEFAULT_PROVINCE, year: Optional[int] = None,
+             batch_name: Optional[str] = None, zslx_name: Optional[str] = DEFAULT_ZSLX) -> List[IndexKey]:
+        """列出匹配条件的索引键，年份/批次/招生类型为 None 表示不限"""
+        return [key for key in self.tracks.get((province_id, type_name), ())
+                if (year is None or key[1] == year)
+                and (batch_name is None or key[3] == batch_name)
+                and (zslx_name is None or key[4] == zslx_name)]
+
+    def query_rank(self, type_name: str, rank: int, below: int, above: int, **conditions) -> List[RankEntry]:
+        """位次窗口查询：最低位次落在 [rank - above, rank + below] 内的专业组
+
+        位次越小越好；above 为比考生位次更靠前（更难）的范围，below 为更靠后（更稳）的范围。
+        """
+        results = []
+        for key in self.keys(type_name, **conditions):
+            entries = self.entries[key]
+            positions = self.by_section[key].range(rank - above, rank + below)
+            results.extend(entries[position] for position in positions)
+        results.sort(key=lambda entry: (entry.min_section, entry.year))
+        return results
+
+    def query_score(self, type_name: str, low: int, high: int, **conditions) -> List[RankEntry]:
+        """分数区间查询：最低分落在 [low, high] 内的专业组"""
+        results = []
+        for key in self.keys(type_name, **conditions):
+            entries = self.entries[key]
+            results.extend(entries[position] for position in self.by_score[key].range(low, high))
+        results.sort(key=lambda entry: (-entry.min, entry.year))
+        return results
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.entries.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按位次/分数查询历年可达的学校和专业组')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'集中存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    parser.add_argument('--province', default=DEFAULT_PROVINCE, help=f'省份代码，默认: {DEFAULT_PROVINCE}')
+    parser.add_argument('--year', type=int, help='年份，不指定则查询所有年份')
+    parser.add_argument('--type', dest='type_name', required=True, help='科类，如 物理类 / 历史类 / 理科 / 文科')
+    parser.add_argument('--batch', dest='batch_name', help='批次，如 本科批，不指定则查询所有批次')
+    parser.add_argument('--zslx', dest='zslx_name', default=DEFAULT_ZSLX, help=f'招生类型，默认: {DEFAULT_ZSLX}')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--rank', type=int, help='考生位次')
+    group.add_argument('--score', type=int, help='考生分数')
+    parser.add_argument('--above', type=int, default=3000, help='比考生位次更靠前的窗口（冲），默认: 3000')
+    parser.add_argument('--below', type=int, default=5000, help='比考生位次更靠后的窗口（保），默认: 5000')
+    parser.add_argument('--score-window', type=int, default=10, help='分数查询的上下浮动，默认: 10')
+    parser.add_argument('--limit', type=int, default=50, help='最多显示的结果数，默认: 50')
+
+    args = parser.parse_args()
+    store = ScoreStore(args.store)
+    try:
+        start = time.perf_counter()
+        index = RankIndex.from_store(store, province_id=args.province)
+        print(f"索引构建完成: {len(index)} 条记录，{len(index.entries)} 个分组，"
+              f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        store.close()
+
+    conditions = dict(province_id=args.province, year=args.year, batch_name=args.batch_name,
+                      zslx_name=args.zslx_name)
+    start = time.perf_counter()
+    if args.rank is not None:
+        results = index.query_rank(args.type_name, args.rank, below=args.below, above=args.above, **conditions)
+    else:
+        results = index.query_score(args.type_name, args.score - args.score_window,
+                                    args.score + args.score_window, **conditions)
+    elapsed_us = (time.perf_counter() - start) * 1_000_000
+
+    print(f"命中 {len(results)} 个专业组，查询耗时 {elapsed_us:.0f} µs\n")
+    for entry in results[:args.limit]:
+        # 缺失的分类字段为 None，不能直接按宽度格式化
+        print(f"{entry.year}  {entry.school_name or '':<16}{entry.sg_name or '':<8}{entry.local_batch_name or '':<8}"
+              f"最低分 {entry.min}  最低位次 {entry.min_section}  {entry.sg_info or ''}")
+    if len(results) > args.limit:
+        print(f"... 另有 {len(results) - args.limit} 条未显示")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器，按每秒请求数(rps)控制全局请求速率"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        # rate <= 0 表示不限速
+        self.rate = rate
+        self._fixed_capacity = capacity is not None
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌"""
+        self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._last) * self.rate)
+        self._last = max(self._last, now)
+
+    def set_rate(self, rate: float):
+        """调整速率（自适应限速使用）；未指定容量时容量随速率变化"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            if not self._fixed_capacity:
+                self.capacity = max(1.0, rate)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def pause(self, seconds: float):
+        """seconds 秒内不发放令牌（响应服务器的 Retry-After），暂停期间也不积累令牌"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self._tokens = 0.0
+                self._last = until
+
+    def acquire(self, tokens: float = 1.0):
+        """阻塞直到取得指定数量的令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self._refill(now)
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
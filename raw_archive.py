@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import json_codec
+
+DEFAULT_TEMP_DIR = Path("temp")
+DEFAULT_ARCHIVE_PATH = Path("archive") / "raw_responses.sqlite3"
+# 与 crawl_scheduler.DEFAULT_PROVINCE 一致：湖南的临时文件直接放在 temp/ 根目录
+ROOT_PROVINCE = '43'
+
+
+class FileArchive:
+    """原始响应按文件存放：temp/{学校}_{年份}.json，其他省份在 temp/{省份代码}/ 下"""
+
+    def __init__(self, temp_dir: Path = DEFAULT_TEMP_DIR):
+        self.temp_dir = Path(temp_dir)
+        self.temp_dir.mkdir(exist_ok=True)
+        self._created = {ROOT_PROVINCE}
+
+    def province_dir(self, province_id: str) -> Path:
+        if province_id == ROOT_PROVINCE:
+            return self.temp_dir
+        directory = self.temp_dir / province_id
+        if province_id not in self._created:
+            directory.mkdir(exist_ok=True)
+            self._created.add(province_id)
+        return directory
+
+    def path(self, province_id: str, school_name: str, year: int) -> Path:
+        return self.province_dir(province_id) / f"{school_name}_{year}.json"
+
+    def exists(self, province_id: str, school_name: str, year: int) -> bool:
+        return self.path(province_id, school_name, year).exists()
+
+    def put(self, province_id: str, school_name: str, year: int, data: Dict) -> str:
+        """保存一份响应，返回保存位置描述"""
+        filepath = self.path(province_id, school_name, year)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json_codec.dump(data, f, indent=2)
+        return str(filepath)
+
+    def get(self, province_id: str, school_name: str, year: int) -> Optional[Dict]:
+        filepath = self.path(province_id, school_name, year)
+        if not filepath.exists():
+            return None
+        return json_codec.load_path(filepath)
+
+    def iter_all(self, province_id: str) -> Iterator[Tuple[str, int, Dict]]:
+        """遍历某省份的全部响应，产出(学校名, 年份, 数据)"""
+        for filepath in sorted(self.province_dir(province_id).glob('*_*.json')):
+            school_name, _, year = filepath.stem.rpartition('_')
+            if not year.isdigit():
+                continue
+            yield school_name, int(year), json_codec.load_path(filepath)
+
+    def close(self):
+        pass
+
+
+class SqliteArchive:
+    """原始响应的压缩归档：按(省份, 学校, 年份)索引，相同内容只存一份"""
+
+    def __init__(self, path: Path = DEFAULT_ARCHIVE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                body BLOB NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                province_id TEXT NOT NULL,
+                school_name TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                content_hash TEXT NOT NULL REFERENCES blobs (content_hash),
+                PRIMARY KEY (province_id, school_name, year)
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def encode(data: Dict) -> Tuple[str, bytes]:
+        """紧凑序列化并压缩，返回(内容哈希, 压缩正文)"""
+        raw = json_codec.dumps_bytes(data)
+        return hashlib.sha1(raw).hexdigest(), zlib.compress(raw)
+
+    @staticmethod
+    def decode(body: bytes) -> Dict:
+        return json_codec.loads(zlib.decompress(body))
+
+    def exists(self, province_id: str, school_name: str, year: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM responses WHERE province_id = ? AND school_name = ? AND year = ?",
+                (province_id, school_name, year),
+            ).fetchone()
+        return row is not None
+
+    def put(self, province_id: str, school_name: str, year: int, data: Dict) -> str:
+        """保存一份响应，内容已存在时只更新索引"""
+        content_hash, body = self.encode(data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (content_hash, body) VALUES (?, ?)", (content_hash, body)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (province_id, school_name, year, content_hash) "
+                "VALUES (?, ?, ?, ?)",
+                (province_id, school_name, year, content_hash),
+            )
+            self._conn.commit()
+        return f"{self.path}#{province_id}/{school_name}/{year}"
+
+    def get(self, province_id: str, school_name: str, year: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.body FROM responses r JOIN blobs b ON b.content_hash = r.content_hash "
+                "WHERE r.province_id = ? AND r.school_name = ? AND r.year = ?",
+                (province_id, school_name, year),
+            ).fetchone()
+        return self.decode(row[0]) if row else None
+
+    def iter_all(self, province_id: str) -> Iterator[Tuple[str, int, Dict]]:
+        """一次顺序读出某省份的全部响应，产出(学校名, 年份, 数据)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.school_name, r.year, b.body FROM responses r "
+                "JOIN blobs b ON b.content_hash = r.content_hash "
+                "WHERE r.province_id = ? ORDER BY r.school_name, r.year",
+                (province_id,),
+            ).fetchall()
+        for school_name, year, body in rows:
+            yield school_name, year, self.decode(body)
+
+    def stats(self) -> Dict[str, int]:
+        """条目数、去重后的内容数和压缩后字节数"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            blobs, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM blobs").fetchone()
+        return {'entries': entries, 'blobs': blobs, 'compressed_bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_archive(backend: str, temp_dir: Path = DEFAULT_TEMP_DIR, archive_path: Path = DEFAULT_ARCHIVE_PATH):
+    """按名称创建原始响应存储后端：files 或 sqlite"""
+    if backend == 'files':
+        return FileArchive(temp_dir)
+    if backend == 'sqlite':
+        return SqliteArchive(archive_path)
+    raise ValueError(f"未知的归档后端: {backend}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='原始响应归档工具')
+    parser.add_argument('--archive', type=Path, default=DEFAULT_ARCHIVE_PATH,
+                        help=f'归档文件路径，默认: {DEFAULT_ARCHIVE_PATH}')
+    parser.add_argument('--temp-dir', type=Path, default=DEFAULT_TEMP_DIR,
+                        help=f'临时文件目录，默认: {DEFAULT_TEMP_DIR}')
+    parser.add_argument('--provinces', nargs='+', default=[ROOT_PROVINCE],
+                        help=f'要处理的省份代码，默认: {ROOT_PROVINCE}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('import-temp', help='把临时文件导入归档')
+    subparsers.add_parser('export-temp', help='从归档还原临时文件')
+    subparsers.add_parser('stats', help='显示归档统计')
+
+    args = parser.parse_args()
+    archive = SqliteArchive(args.archive)
+    try:
+        if args.command == 'stats':
+            stats = archive.stats()
+            print(f"条目数: {stats['entries']}，去重后内容数: {stats['blobs']}，"
+                  f"压缩后大小: {stats['compressed_bytes'] / 1024 / 1024:.2f} MB")
+            return
+
+        files = FileArchive(args.temp_dir)
+        source, target = (files, archive) if args.command == 'import-temp' else (archive, files)
+        count = 0
+        for province_id in args.provinces:
+            for school_name, year, data in source.iter_all(province_id):
+                target.put(province_id, school_name, year, data)
+                count += 1
+        print(f"已处理 {count} 份响应")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
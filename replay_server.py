@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import json_codec
+from raw_archive import ROOT_PROVINCE
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 分数线接口（static-data.gaokao.cn）和学校列表接口（api.zjzw.cn）的路径
+SCORE_PATH = re.compile(r'/schoolprovincescore/(\w+)/(\d+)/(\d+)\.json$')
+LIST_PATH = '/web/api/'
+# 列表请求用此参数指定回放哪个分类（如 985、211），缺省时使用服务器的默认分类
+LIST_CATEGORY_PARAM = 'category'
+
+
+class ReplayServer:
+    """本地回放服务：用已抓取的 temp/*.json 和分类列表 JSON 代替线上接口
+
+    可注入固定延迟、随机抖动、5xx 错误和 429 限流，用于离线压测。其他省份没有临时文件时
+    回放湖南的同名文件（数据是合成的，只用于测量性能）。
+    """
+
+    def __init__(self, temp_dir: Path = Path('temp'), category_dir: Path = Path('.'),
+                 mapping_path: Path = Path('school_mapping.json'), host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: int = 1,
+                 default_category: str = '985', seed: Optional[int] = None):
+        self.temp_dir = Path(temp_dir)
+        self.category_dir = Path(category_dir)
+        with open(mapping_path, 'r', encoding='utf-8') as f:
+            self.code_to_name = {str(code): name for name, code in json_codec.load(f).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.default_category = default_category
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bodies: Dict[Path, Tuple[bytes, str]] = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'ReplayServer':
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def inject(self) -> Tuple[float, Optional[int]]:
+        """抽取本次请求的延迟和注入的故障状态码（无故障为 None）"""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return delay, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, 503
+        return delay, None
+
+    def load_body(self, path: Path) -> Optional[Tuple[bytes, str]]:
+        """读取并缓存回放文件的内容和 ETag"""
+        cached = self._bodies.get(path)
+        if cached is None:
+            if not path.exists():
+                return None
+            body = path.read_bytes()
+            cached = (body, '"%s"' % hashlib.md5(body).hexdigest())
+            with self._lock:
+                self._bodies[path] = cached
+        return cached
+
+    def score_file(self, school_code: str, year: str, province_id: str) -> Optional[Path]:
+        name = self.code_to_name.get(school_code)
+        if name is None:
+            return None
+        if province_id != ROOT_PROVINCE:
+            path = self.temp_dir / province_id / f"{name}_{year}.json"
+            if path.exists():
+                return path
+        return self.temp_dir / f"{name}_{year}.json"
+
+    def list_body(self, query: Dict[str, list]) -> Optional[Tuple[bytes, str]]:
+        """回放分类列表的某一页；超出已保存页数时返回带 numFound 的空页"""
+        category = query.get(LIST_CATEGORY_PARAM, [self.default_category])[0]
+        page = query.get('page', ['1'])[0]
+        found = self.load_body(self.category_dir / f"{category}-{page}.json")
+        if found is not None:
+            return found
+        first = self.load_body(self.category_dir / f"{category}-1.json")
+        if first is None:
+            return None
+        data = json_codec.loads(first[0])
+        data['data']['item'] = []
+        body = json_codec.dumps_bytes(data)
+        return body, '"%s"' % hashlib.md5(body).hexdigest()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == '/stats':
+                    with server._lock:
+                        body = json_codec.dumps_bytes(dict(server.stats))
+                    return self.reply(200, body)
+
+                delay, fault = server.inject()
+                if delay:
+                    time.sleep(delay)
+                if fault == 429:
+                    server.count('429')
+                    return self.reply(429, b'', {'Retry-After': str(server.retry_after)})
+                if fault is not None:
+                    server.count(str(fault))
+                    return self.reply(fault, b'')
+
+                match = SCORE_PATH.search(url.path)
+                if match:
+                    path = server.score_file(*match.groups())
+                    found = server.load_body(path) if path else None
+                elif url.path == LIST_PATH:
+                    found = server.list_body(parse_qs(url.query))
+                else:
+                    found = None
+                if found is None:
+                    server.count('404')
+                    return self.reply(404, b'')
+
+                body, etag = found
+                if self.headers.get('If-None-Match') == etag:
+                    server.count('304')
+                    return self.reply(304, b'', {'ETag': etag})
+                server.count('200')
+                self.reply(200, body, {'ETag': etag, 'Content-Type': 'application/json'})
+
+            def reply(self, status: int, body: bytes, headers: Dict[str, str] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地回放服务：离线代替 static-data.gaokao.cn 和 api.zjzw.cn')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址，默认: {DEFAULT_HOST}')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口，默认: {DEFAULT_PORT}')
+    parser.add_argument('--temp-dir', type=Path, default=Path('temp'), help='分数线响应目录，默认: temp')
+    parser.add_argument('--category-dir', type=Path, default=Path('.'), help='分类列表 JSON 所在目录，默认: 当前目录')
+    parser.add_argument('--mapping', type=Path, default=Path('school_mapping.json'),
+                        help='学校映射文件，默认: school_mapping.json')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒），默认: 0')
+    parser.add_argument('--jitter', type=float, default=0.0, help='额外的随机延迟上限（秒），默认: 0')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的比例，默认: 0')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='返回 429 的比例，默认: 0')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 响应的 Retry-After 秒数，默认: 1')
+    parser.add_argument('--seed', type=int, help='随机种子，指定后故障注入可复现')
+
+    args = parser.parse_args()
+    server = ReplayServer(args.temp_dir, args.category_dir, args.mapping, args.host, args.port,
+                          latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed)
+    print(f"回放服务已启动: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n回放服务已停止，请求统计: {dict(server.stats)}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
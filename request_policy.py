@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+
+from crawl_metrics import Metrics
+from rate_limiter import TokenBucket
+
+# 可重试的状态码：限流和服务端临时错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 1.0  # 第 n 次重试的退避上限为 base * 2^n 秒
+DEFAULT_BACKOFF_MAX = 60.0
+DEFAULT_RETRY_AFTER_MAX = 300.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After：秒数或 HTTP 日期，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AIMDController:
+    """加性增、乘性减的自适应限速
+
+    请求成功且延迟低于目标时每秒约增加 increase 次/秒；遇到 429/5xx/超时立即乘以 decrease。
+    并发请求同时失败只算一次拥塞：两次降速之间至少间隔 cooldown 秒。
+    起始速率为限速器当前速率（限制在 [min_rate, max_rate] 内）；限速器不限速（rate <= 0）时从 max_rate 开始。
+    """
+
+    def __init__(self, limiter: TokenBucket, min_rate: float = 0.5, max_rate: float = 20.0,
+                 increase: float = 0.5, decrease: float = 0.5, latency_target: float = 1.0,
+                 cooldown: float = 2.0, metrics: Metrics = None):
+        self.limiter = limiter
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.metrics = metrics
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._apply(min(max(limiter.rate, min_rate), max_rate) if limiter.rate > 0 else max_rate)
+
+    def _apply(self, rate: float):
+        self.limiter.set_rate(rate)
+        if self.metrics:
+            self.metrics.set_gauge('request_rate', rate)
+
+    def on_success(self, latency: float):
+        with self._lock:
+            if latency > self.latency_target:
+                return
+            rate = self.limiter.rate
+            # 每个成功请求增加 increase / rate，以当前速率运行一秒约增加 increase
+            self._apply(min(self.max_rate, rate + self.increase / max(rate, 1.0)))
+
+    def on_congestion(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._apply(max(self.min_rate, self.limiter.rate * self.decrease))
+            if self.metrics:
+                self.metrics.inc('rate_decreases_total')
+
+
+class RequestPolicy:
+    """两个爬虫共用的请求策略：全局限速、指数退避加抖动重试、遵守 Retry-After，可选 AIMD 自适应限速"""
+
+    def __init__(self, limiter: TokenBucket, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE, backoff_max: float = DEFAULT_BACKOFF_MAX,
+                 controller: AIMDController = None, metrics: Metrics = None):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.controller = controller
+        self.metrics = metrics or Metrics()
+        self._random = random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, client, url: str, **kwargs) -> requests.Response:
+        """用 client（Session 或 requests 模块）发 GET 请求，对可重试的错误自动重试
+
+        重试用尽后：有响应时返回最后一次响应（由调用方 raise_for_status），否则抛出最后一次的异常。
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            start = time.perf_counter()
+            response, error = None, None
+            try:
+                response = client.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            latency = time.perf_counter() - start
+            self.metrics.observe('request_seconds', latency)
+
+            if response is not None:
+                self.metrics.inc('responses_total', status=response.status_code)
+                if response.status_code not in RETRYABLE_STATUS:
+                    if self.controller:
+                        self.controller.on_success(latency)
+                    return response
+                reason = f"http_{response.status_code}"
+            else:
+                reason = 'timeout' if isinstance(error, requests.exceptions.Timeout) else 'connection'
+
+            # 连接被拒绝不代表服务端过载，不降速
+            if self.controller and reason != 'connection':
+                self.controller.on_congestion()
+            if attempt >= self.max_retries:
+                self.metrics.inc('retries_exhausted_total', reason=reason)
+                if response is not None:
+                    return response
+                raise error
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+            if retry_after is not None:
+                delay = min(retry_after, DEFAULT_RETRY_AFTER_MAX)
+                # 服务器要求等待时，所有线程一起暂停
+                self.limiter.pause(delay)
+            else:
+                delay = self.backoff(attempt)
+            self.metrics.inc('retries_total', reason=reason)
+            attempt += 1
+            time.sleep(delay)
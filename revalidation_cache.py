@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional
+
+DEFAULT_CACHE_PATH = Path("cache") / "http_cache.sqlite3"
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    fetched_at: float
+
+
+class RevalidationCache:
+    """基于 ETag/Last-Modified 的持久化 HTTP 重新验证缓存（SQLite 存储）"""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, closed_years: Iterable[int] = ()):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 已封榜年份：有缓存时直接复用，不再发请求
+        self.closed_years = set(closed_years)
+        self._lock = threading.Lock()
+        # 其他进程持有写锁时最多等待 30 秒
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """读取缓存条目，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, body, fetched_at FROM http_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def is_closed(self, year: int) -> bool:
+        """该年份是否按策略永不重新获取"""
+        return year in self.closed_years
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['if-none-match'] = entry.etag
+        if entry.last_modified:
+            headers['if-modified-since'] = entry.last_modified
+        return headers
+
+    def store(self, url: str, body: bytes, etag: Optional[str] = None,
+              last_modified: Optional[str] = None):
+        """保存 200 响应的正文和验证器"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """304 命中时刷新验证时间"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE http_cache SET fetched_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+
+    def delete(self, url: str):
+        """删除条目（缓存的正文无法解析时），下次完整下载"""
+        with self._lock:
+            self._conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,183 @@
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from convert_json_to_xlsx import SINKS
+from query_service import load_catalogs
+
+# 集合运算符：& 交集，| 并集，- 差集（也可写作 ∩ ∪ −），从左到右依次计算
+OPERATORS = {'&': '&', '∩': '&', '|': '|', '∪': '|', '-': '-', '−': '-'}
+TOKEN_PATTERN = re.compile(r'\s*([&∩|∪\-−])\s*')
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+MASK_FIELD = 'category_mask'
+CATEGORY_FIELD = 'categories'
+
+
+class SchoolCatalog:
+    """所有分类列表合并后的学校目录：每个 school_id 一条记录，分类归属存为位图
+
+    bits 的形状为 (学校数, 字数)，第 i 个分类对应第 i // 64 个字的第 i % 64 位。
+    分类集合运算在整列位图上向量化计算，不需要再扫描各分类的 JSON。
+    """
+
+    def __init__(self, categories: List[str], records: List[Dict], bits: np.ndarray):
+        self.categories = categories
+        self.records = records
+        self.bits = bits
+        self.category_bits = {name: bit for bit, name in enumerate(categories)}
+        self.school_ids = np.asarray([int(record['school_id']) for record in records], dtype=np.int64)
+        # 省份按编码存储，过滤时只比较整数
+        provinces, codes = np.unique([record.get('province_name') or '' for record in records],
+                                     return_inverse=True)
+        self.provinces = {name: code for code, name in enumerate(provinces.tolist())}
+        self.province_codes = codes.astype(np.int32)
+
+    @classmethod
+    def build(cls, catalogs: Dict[str, List[Dict]]) -> 'SchoolCatalog':
+        """合并 {分类名: 学校列表}；同一学校以排在前面的分类中的字段为准，其他分类只补充缺失的字段"""
+        categories = sorted(catalogs)
+        positions: Dict[str, int] = {}
+        records: List[Dict] = []
+        masks: List[int] = []
+        for bit, name in enumerate(categories):
+            for item in catalogs[name]:
+                school_id = str(item.get('school_id') or '')
+                if not school_id.isdigit():
+                    continue
+                i = positions.get(school_id)
+                if i is None:
+                    i = positions[school_id] = len(records)
+                    records.append(dict(item))
+                    masks.append(0)
+                else:
+                    for key, value in item.items():
+                        records[i].setdefault(key, value)
+                masks[i] |= 1 << bit
+
+        words = max(1, -(-len(categories) // WORD_BITS))
+        bits = np.zeros((len(records), words), dtype=np.uint64)
+        for word in range(words):
+            bits[:, word] = [(mask >> (word * WORD_BITS)) & WORD_MASK for mask in masks]
+        return cls(categories, records, bits)
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> 'SchoolCatalog':
+        """读取目录下所有分类列表 JSON（211-*.json、985-*.json 等）"""
+        return cls.build(load_catalogs(directory))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def member(self, category: str) -> np.ndarray:
+        """属于该分类的学校（布尔数组）"""
+        bit = self.category_bits.get(category)
+        if bit is None:
+            raise ValueError(f"未知分类: {category}，可选: {', '.join(self.categories)}")
+        word, offset = divmod(bit, WORD_BITS)
+        return (self.bits[:, word] & np.uint64(1 << offset)) != 0
+
+    def evaluate(self, expression: str) -> np.ndarray:
+        """计算分类集合表达式，如 '强基计划 & 985 - 中央部委'；空表达式表示全部学校"""
+        tokens = TOKEN_PATTERN.split(expression.strip())
+        if tokens == ['']:
+            return np.ones(len(self.records), dtype=bool)
+        if any(not token.strip() for token in tokens[::2]):
+            raise ValueError(f"表达式不完整: {expression}")
+        result = self.member(tokens[0].strip())
+        for operator, category in zip(tokens[1::2], tokens[2::2]):
+            operand = self.member(category.strip())
+            operator = OPERATORS[operator]
+            if operator == '&':
+                result = result & operand
+            elif operator == '|':
+                result = result | operand
+            else:
+                result = result & ~operand
+        return result
+
+    def select(self, expression: str = '', province_name: Optional[str] = None) -> np.ndarray:
+        """满足分类表达式（和学校所在省份）的学校下标"""
+        mask = self.evaluate(expression)
+        if province_name is not None:
+            code = self.provinces.get(province_name)
+            mask = mask & (self.province_codes == code) if code is not None else np.zeros_like(mask)
+        return np.flatnonzero(mask)
+
+    def mask_of(self, i: int) -> int:
+        """第 i 所学校的分类位图（整数）"""
+        return sum(int(value) << (word * WORD_BITS) for word, value in enumerate(self.bits[i]))
+
+    def categories_of(self, i: int) -> List[str]:
+        mask = self.mask_of(i)
+        return [name for bit, name in enumerate(self.categories) if mask >> bit & 1]
+
+    def export(self, path: Path) -> int:
+        """导出为 .xlsx/.csv/.parquet：合并后的学校字段 + 分类位图 + 分类名列表，返回学校数"""
+        fmt = Path(path).suffix.lstrip('.')
+        if fmt not in SINKS:
+            raise ValueError(f"不支持的输出格式: {Path(path).suffix}，可选: {', '.join(SINKS)}")
+        headers = sorted({key for record in self.records for key in record}) + [MASK_FIELD, CATEGORY_FIELD]
+        sink = SINKS[fmt](str(path), headers)
+        try:
+            for i, record in enumerate(self.records):
+                values = [record.get(header, '') for header in headers[:-2]]
+                sink.write(values + [self.mask_of(i), '|'.join(self.categories_of(i))])
+        finally:
+            sink.close()
+        return len(self.records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并所有分类列表为去重的学校目录，并按分类集合查询')
+    parser.add_argument('--catalog-dir', type=Path, default=Path('.'),
+                        help='分类列表 JSON 所在目录，默认: 当前目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    query_parser = subparsers.add_parser('query', help='按分类集合表达式查询学校')
+    query_parser.add_argument('expression', nargs='?', default='',
+                              help="分类集合表达式，& 交集、| 并集、- 差集，如 '强基计划 & 985 - 中央部委'")
+    query_parser.add_argument('--province', help='只保留所在省份为指定名称的学校，如 湖南')
+    query_parser.add_argument('--limit', type=int, default=50, help='最多显示的结果数，默认: 50')
+
+    export_parser = subparsers.add_parser('export', help='导出去重后的学校目录')
+    export_parser.add_argument('--output', type=Path, default=Path('output') / 'school_catalog.xlsx',
+                               help='输出文件（.xlsx/.csv/.parquet），默认: output/school_catalog.xlsx')
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    catalog = SchoolCatalog.from_directory(args.catalog_dir)
+    print(f"学校目录: {len(catalog)} 所学校，{len(catalog.categories)} 个分类，"
+          f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    if args.command == 'export':
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            count = catalog.export(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"已保存 {count} 所学校到: {args.output}")
+        return
+
+    start = time.perf_counter()
+    try:
+        indices = catalog.select(args.expression, province_name=args.province)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed_us = (time.perf_counter() - start) * 1_000_000
+
+    print(f"命中 {len(indices)} 所学校，查询耗时 {elapsed_us:.0f} µs\n")
+    for i in indices[:args.limit]:
+        record = catalog.records[i]
+        print(f"{record.get('school_id'):>6}  {record.get('name', ''):<16}{record.get('province_name', ''):<6}"
+              f"{'|'.join(catalog.categories_of(i))}")
+    if len(indices) > args.limit:
+        print(f"... 另有 {len(indices) - args.limit} 所学校未显示")
+
+
+if __name__ == "__main__":
+    main()
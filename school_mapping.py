@@ -0,0 +1,89 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
+
+import json_codec
+
+DEFAULT_SOURCE_PATH = Path("source") / "school_mapping.xlsx"
+DEFAULT_MAPPING_PATH = Path("school_mapping.json")
+# 记录生成 school_mapping.json 时源 Excel 的 mtime、大小和 sha256
+DEFAULT_STAMP_PATH = Path("cache") / "school_mapping.stamp.json"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_source(source_path: Path = DEFAULT_SOURCE_PATH) -> Dict[str, str]:
+    """读取 Excel（第一行为表头，第一列学校名称，第二列学校代码），返回 {学校名称: 学校代码}"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source_path, read_only=True, data_only=True)
+    try:
+        mapping = {}
+        for row in workbook.active.iter_rows(min_row=2, values_only=True):
+            if len(row) < 2 or row[0] is None or row[1] is None:
+                continue
+            school_code = row[1]
+            # 单元格为数字时去掉 .0
+            if isinstance(school_code, float) and school_code.is_integer():
+                school_code = int(school_code)
+            school_name, school_code = str(row[0]).strip(), str(school_code).strip()
+            if school_name and school_code:
+                mapping[school_name] = school_code
+        return mapping
+    finally:
+        workbook.close()
+
+
+def compile_mapping(source_path: Path = DEFAULT_SOURCE_PATH, mapping_path: Path = DEFAULT_MAPPING_PATH,
+                    stamp_path: Path = DEFAULT_STAMP_PATH, sha256: Optional[str] = None) -> Dict[str, str]:
+    """从 Excel 生成 school_mapping.json 并记录源文件指纹"""
+    stat = source_path.stat()
+    mapping = read_source(source_path)
+    temp_path = mapping_path.with_name(mapping_path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json_codec.dump(mapping, f, indent=2)
+    temp_path.replace(mapping_path)
+    write_stamp(stamp_path, source_path, stat, sha256 or file_sha256(source_path))
+    return mapping
+
+
+def write_stamp(stamp_path: Path, source_path: Path, stat, sha256: str):
+    stamp_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        json_codec.dump({'source': str(source_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                         'sha256': sha256}, f, indent=2)
+
+
+def load_school_mapping(source_path: Path = DEFAULT_SOURCE_PATH, mapping_path: Path = DEFAULT_MAPPING_PATH,
+                        stamp_path: Path = DEFAULT_STAMP_PATH) -> Dict[str, str]:
+    """加载学校映射；源 Excel 变化时才重新生成 school_mapping.json
+
+    mtime 和大小与上次一致时直接读 JSON；不一致时再比较 sha256，内容没变只更新指纹。
+    没有源 Excel 时（如只分发了 school_mapping.json）直接读 JSON。
+    """
+    source_path, mapping_path, stamp_path = Path(source_path), Path(mapping_path), Path(stamp_path)
+    if source_path.exists():
+        stat = source_path.stat()
+        try:
+            stamp = json_codec.load_path(stamp_path)
+        except (OSError, *json_codec.DECODE_ERRORS):
+            stamp = {}
+        fresh = (mapping_path.exists() and stamp.get('source') == str(source_path)
+                 and stamp.get('mtime_ns') == stat.st_mtime_ns and stamp.get('size') == stat.st_size)
+        if not fresh:
+            sha256 = file_sha256(source_path)
+            if mapping_path.exists() and stamp.get('sha256') == sha256:
+                write_stamp(stamp_path, source_path, stat, sha256)
+            else:
+                print(f"{source_path} 已变化，重新生成 {mapping_path}")
+                return compile_mapping(source_path, mapping_path, stamp_path, sha256)
+
+    if not mapping_path.exists():
+        raise FileNotFoundError(f"{mapping_path} 文件不存在，请先运行 read_school_mapping_excel.py")
+    return json_codec.load_path(mapping_path)
@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import json_codec
+from convert_json_to_xlsx import SINKS
+from school_catalog import SchoolCatalog
+from change_feed import touched_keys
+from score_store import DEFAULT_STORE_PATH, KEY_FIELDS, SCORE_FIELDS, ScoreStore, quote
+
+# 从分类列表带到分数线记录上的学校属性
+CATALOG_FIELDS = [
+    'province_name', 'city_name', 'level_name', 'nature_name', 'type_name', 'belong',
+    'f985', 'f211', 'dual_class_name', 'rank',
+]
+# 学校所属的全部分类（系列名），存为 |211|985|双一流| 便于 LIKE '%|985|%' 查询
+CATEGORY_FIELD = 'categories'
+# 记录标识（change_feed.IDENTITY_FIELDS 拼成），按变更流逐条更新视图时用来定位行
+RECORD_KEY_FIELD = 'record_key'
+VIEW_FIELDS = KEY_FIELDS + SCORE_FIELDS + CATALOG_FIELDS + [CATEGORY_FIELD, RECORD_KEY_FIELD]
+
+SchoolKey = Tuple[str, str]
+
+
+def build_catalog(catalog: SchoolCatalog) -> Dict[str, Dict]:
+    """哈希连接的构建侧：school_id → 学校属性、所属分类和属性摘要（用于判断是否变化）"""
+    entries: Dict[str, Dict] = {}
+    for i, record in enumerate(catalog.records):
+        entry = {field: record.get(field) for field in CATALOG_FIELDS}
+        entry[CATEGORY_FIELD] = '|' + '|'.join(catalog.categories_of(i)) + '|'
+        entry['digest'] = hashlib.md5(json_codec.dumps([entry[field] for field in CATALOG_FIELDS + [CATEGORY_FIELD]])
+                                      .encode('utf-8')).hexdigest()
+        entries[str(record['school_id'])] = entry
+    return entries
+
+
+class SchoolView:
+    """保存在分数线存储中的物化视图：每条分数线记录带上所属学校的分类属性
+
+    school_view_state 记录每所学校上次计算时的分数线写入时间和分类属性摘要，刷新时只处理有变化的学校；
+    school_view_meta 记录已应用到的变更流位置，分数线有变化的学校只按变更流更新变化的行。
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        existing = [row[1] for row in self._conn.execute("PRAGMA table_info(school_view)")]
+        if existing and RECORD_KEY_FIELD not in existing:
+            # 旧版视图没有记录标识，无法逐条更新；视图是派生数据，删掉后由下次刷新整体重建
+            self._conn.execute("DROP TABLE school_view")
+            self._conn.execute("DROP TABLE IF EXISTS school_view_state")
+        columns = ', '.join(quote(field) for field in VIEW_FIELDS)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS school_view ({columns})")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_school_view_school ON school_view (province_id, school_code)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_school_view_year ON school_view (year, province_id)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS school_view_state (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                school_id TEXT NOT NULL,
+                catalog_digest TEXT NOT NULL,
+                PRIMARY KEY (province_id, school_code)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS school_view_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def state(self) -> Dict[SchoolKey, Tuple[float, str, str]]:
+        """各学校上次计算时的(分数线写入时间, school_id, 分类属性摘要)"""
+        return {
+            (province_id, school_code): (updated_at, school_id, digest)
+            for province_id, school_code, updated_at, school_id, digest
+            in self._conn.execute("SELECT * FROM school_view_state")
+        }
+
+    def cursor(self) -> Optional[int]:
+        """已应用到的变更流 seq；从未刷新过时为 None"""
+        row = self._conn.execute("SELECT value FROM school_view_meta WHERE name = 'change_seq'").fetchone()
+        return row[0] if row else None
+
+    def row_seqs(self, key: SchoolKey) -> Dict[str, int]:
+        """视图中某学校各记录标识所在的顺序号"""
+        return dict(self._conn.execute(
+            "SELECT record_key, seq FROM school_view WHERE province_id = ? AND school_code = ?", key
+        ))
+
+    def replace_schools(self, removed: List[SchoolKey],
+                        schools: List[Tuple[SchoolKey, float, str, str, List[List]]], full: bool = False,
+                        patches: List[Tuple[SchoolKey, float, List[str], List[List], Dict[str, int]]] = (),
+                        cursor: Optional[int] = None):
+        """删除 removed 的行，整体替换 schools 中每所学校的行和状态，并应用 patches 中的逐行更新（一个事务）
+
+        patches 每项为(学校, 分数线写入时间, 要删除的记录标识, 要写入的行, 需要改顺序号的 {记录标识: seq})。
+        """
+        placeholders = ', '.join('?' for _ in VIEW_FIELDS)
+        with self._conn:
+            if full:
+                self._conn.execute("DELETE FROM school_view")
+                self._conn.execute("DELETE FROM school_view_state")
+            for key, updated_at, deleted, rows, seqs in patches:
+                self._conn.executemany(
+                    "DELETE FROM school_view WHERE province_id = ? AND school_code = ? AND record_key = ?",
+                    [(*key, record_key) for record_key in deleted + [row[-1] for row in rows]],
+                )
+                self._conn.executemany(f"INSERT INTO school_view VALUES ({placeholders})", rows)
+                self._conn.executemany(
+                    "UPDATE school_view SET seq = ? WHERE province_id = ? AND school_code = ? AND record_key = ?",
+                    [(seq, *key, record_key) for record_key, seq in seqs.items()],
+                )
+                self._conn.execute(
+                    "UPDATE school_view_state SET updated_at = ? WHERE province_id = ? AND school_code = ?",
+                    (updated_at, *key),
+                )
+            for key in removed + [school[0] for school in schools]:
+                self._conn.execute("DELETE FROM school_view WHERE province_id = ? AND school_code = ?", key)
+                self._conn.execute("DELETE FROM school_view_state WHERE province_id = ? AND school_code = ?", key)
+            for key, updated_at, school_id, digest, rows in schools:
+                self._conn.executemany(f"INSERT INTO school_view VALUES ({placeholders})", rows)
+                self._conn.execute("INSERT INTO school_view_state VALUES (?, ?, ?, ?, ?)",
+                                   (*key, updated_at, school_id, digest))
+            if cursor is not None:
+                self._conn.execute("INSERT OR REPLACE INTO school_view_meta VALUES ('change_seq', ?)", (cursor,))
+
+    def load(self, category: Optional[str] = None, year: Optional[int] = None,
+             province_id: Optional[str] = None, school_name: Optional[str] = None) -> List[Dict]:
+        """按条件读出视图中的记录；category 为分类名（如 985、双一流）"""
+        conditions = []
+        params = []
+        for field, value in (('province_id', province_id), ('year', year), ('school_name', school_name)):
+            if value is not None:
+                conditions.append(f"{quote(field)} = ?")
+                params.append(str(value) if field == 'province_id' else value)
+        if category is not None:
+            conditions.append(f"{quote(CATEGORY_FIELD)} LIKE ?")
+            params.append(f"%|{category}|%")
+        sql = f"SELECT {', '.join(quote(field) for field in VIEW_FIELDS)} FROM school_view"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY province_id, school_name, seq"
+        return [dict(zip(VIEW_FIELDS, row)) for row in self._conn.execute(sql, params)]
+
+    def close(self):
+        self._conn.close()
+
+
+def join_row(seq: int, record_key: str, record: Dict, school_code: str, entry: Dict) -> List:
+    row = [record['school_name'], school_code, seq]
+    row.extend(record.get(field) for field in SCORE_FIELDS)
+    row.extend(entry.get(field) for field in CATALOG_FIELDS + [CATEGORY_FIELD])
+    row.append(record_key)
+    return row
+
+
+def join_school(records: List[Tuple[str, Dict]], school_code: str,
+                catalog: Dict[str, Dict]) -> Tuple[str, str, List[List]]:
+    """哈希连接的探测侧：按 school_id 给一所学校的(记录标识, 记录)带上分类属性（没有分类信息的学校保留，属性为空）
+
+    返回(school_id, 分类属性摘要, 视图行)
+    """
+    school_id = str(records[0][1].get('school_id') or school_code) if records else school_code
+    entry = catalog.get(school_id, {})
+    rows = [join_row(seq, record_key, record, school_code, entry) for seq, (record_key, record) in enumerate(records)]
+    return school_id, entry.get('digest', ''), rows
+
+
+def patch_school(view: SchoolView, key: SchoolKey, records: List[Tuple[str, Dict]], touched: set,
+                 entry: Dict) -> Tuple[List[str], List[List], Dict[str, int]]:
+    """按变更流只更新一所学校中变化的行：touched 中仍存在的记录重写，已不存在的删除，其余行只在顺序变化时改 seq
+
+    返回(要删除的记录标识, 要写入的行, 需要改顺序号的 {记录标识: seq})
+    """
+    previous = view.row_seqs(key)
+    rows = []
+    seqs = {}
+    for seq, (record_key, record) in enumerate(records):
+        if record_key in touched:
+            rows.append(join_row(seq, record_key, record, key[1], entry))
+        elif previous.get(record_key) != seq:
+            seqs[record_key] = seq
+    current = {record_key for record_key, _ in records}
+    return sorted(touched - current), rows, seqs
+
+
+def refresh(store: ScoreStore, view: SchoolView, catalog_dir: Path, full: bool = False) -> Tuple[int, int, int]:
+    """增量刷新视图：删除已不在存储中的学校；新出现或分类属性有变化的学校整体重算；
+    分数线重新写入过的学校按变更流只更新变化的行（没有变更流可用时整体重算）
+
+    返回(整体重算的学校数, 逐行更新的行数, 学校总数)。
+    """
+    catalog = build_catalog(SchoolCatalog.from_directory(catalog_dir))
+    state = {} if full else view.state()
+    cursor = None if full else view.cursor()
+    # 先记下变更流的位置再读数据：读取期间新写入的变更留给下次刷新，重复应用是幂等的
+    latest = store.last_change_seq()
+    touched = touched_keys(store.changes(since=cursor)) if cursor is not None else {}
+    current = store.school_versions()
+    removed = sorted(set(state) - {(province_id, school_code) for province_id, school_code, _, _ in current})
+
+    schools = []
+    patches = []
+    for province_id, school_code, school_name, updated_at in current:
+        key = (province_id, school_code)
+        previous = state.get(key)
+        if previous is not None:
+            previous_updated_at, school_id, digest = previous
+            entry = catalog.get(school_id, {})
+            if entry.get('digest', '') == digest:
+                if previous_updated_at == updated_at:
+                    continue
+                if key in touched:
+                    records = store.school_records(province_id, school_code)
+                    patches.append((key, updated_at, *patch_school(view, key, records, touched[key], entry)))
+                    continue
+        records = store.school_records(province_id, school_code)
+        school_id, digest, rows = join_school(records, school_code, catalog)
+        schools.append((key, updated_at, school_id, digest, rows))
+
+    if schools or removed or patches or full or cursor != latest:
+        view.replace_schools(removed, schools, full=full, patches=patches, cursor=latest)
+    return len(schools), sum(len(patch[3]) + len(patch[2]) for patch in patches), len(current)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分类属性 × 分数线的物化视图（如 985 学校的 2024 年分数线）')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'集中存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    parser.add_argument('--catalog-dir', type=Path, default=Path('.'),
+                        help='分类列表 JSON 所在目录，默认: 当前目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    refresh_parser = subparsers.add_parser('refresh', help='增量刷新视图（只重算有变化的学校）')
+    refresh_parser.add_argument('--full', action='store_true', help='忽略已有状态从头重算')
+
+    export_parser = subparsers.add_parser('export', help='按分类、年份等条件导出视图')
+    export_parser.add_argument('--category', help='只导出指定分类，如 985、211、双一流')
+    export_parser.add_argument('--year', type=int, help='只导出指定年份')
+    export_parser.add_argument('--province', help='只导出指定省份代码')
+    export_parser.add_argument('--school', help='只导出指定学校')
+    export_parser.add_argument('--output', type=Path, help='保存为 .xlsx/.csv/.parquet 文件，不指定则打印')
+
+    args = parser.parse_args()
+    store = ScoreStore(args.store)
+    view = SchoolView(args.store)
+    try:
+        start = time.perf_counter()
+        refreshed, patched, total = refresh(store, view, args.catalog_dir, full=getattr(args, 'full', False))
+        print(f"视图: 重算 {refreshed}/{total} 所学校，按变更流更新 {patched} 行，"
+              f"耗时 {time.perf_counter() - start:.3f} 秒")
+        if args.command == 'refresh':
+            return
+
+        rows = view.load(category=args.category, year=args.year, province_id=args.province,
+                         school_name=args.school)
+        if args.output:
+            fmt = args.output.suffix.lstrip('.')
+            if fmt not in SINKS:
+                parser.error(f"不支持的输出格式: {args.output.suffix}，可选: {', '.join(SINKS)}")
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            sink = SINKS[fmt](str(args.output), VIEW_FIELDS)
+            try:
+                for row in rows:
+                    sink.write([row[field] for field in VIEW_FIELDS])
+            finally:
+                sink.close()
+            print(f"已保存 {len(rows)} 条记录到: {args.output}")
+        else:
+            for row in rows:
+                print(f"{row['school_name']} {row['year']} {row['local_type_name']} {row['local_batch_name']} "
+                      f"{row['sg_name'] or ''}: 最低分 {row['min']}，最低位次 {row['min_section']}"
+                      f"（{row[CATEGORY_FIELD] or '无分类'}）")
+            print(f"共 {len(rows)} 条记录")
+    finally:
+        view.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# 字段类型：int 为可空整数，float 为可空小数，category 为重复较多的字符串（字典编码），text 为原样保留
+INT = 'int'
+FLOAT = 'float'
+CATEGORY = 'category'
+TEXT = 'text'
+
+# 合并后分数线记录的字段类型；接口中数值多为字符串，'-' 或空串表示没有数据
+# 艺术、体育类的最低分/最高分为综合分，可能带小数
+SCORE_SCHEMA: Dict[str, str] = {
+    'school_id': CATEGORY,
+    'province_id': CATEGORY,
+    'type': CATEGORY,
+    'batch': CATEGORY,
+    'zslx': CATEGORY,
+    'xclevel': CATEGORY,
+    'max': FLOAT,
+    'min_section': INT,
+    'min': FLOAT,
+    'average': FLOAT,
+    'filing': TEXT,
+    'special_group': TEXT,
+    'first_km': CATEGORY,
+    'num': INT,
+    'local_province_name': CATEGORY,
+    'local_type_name': CATEGORY,
+    'local_batch_id': CATEGORY,
+    'local_batch_name': CATEGORY,
+    'zslx_name': CATEGORY,
+    'xclevel_name': CATEGORY,
+    'zslx_rank': INT,
+    'sg_fxk': CATEGORY,
+    'sg_sxk': CATEGORY,
+    'sg_type': CATEGORY,
+    'sg_name': CATEGORY,
+    'sg_info': CATEGORY,
+    'proscore': INT,
+    'year': INT,
+    'diff': INT,
+    'type_key': CATEGORY,
+}
+
+# 分类列表（211-*.json 等）中学校记录的字段类型，未列出的字段原样保留
+CATALOG_SCHEMA: Dict[str, str] = {
+    'school_id': INT,
+    'rank': INT,
+    'f985': INT,
+    'f211': INT,
+    'is_top': INT,
+    'inner_rate': INT,
+    'outer_rate': INT,
+    'rate': INT,
+    'recommend_master_level': INT,
+    'upgrading_level': INT,
+    'view_month': INT,
+    'view_week': INT,
+    'view_total_number': INT,
+    'province_id': CATEGORY,
+    'province_name': CATEGORY,
+    'city_name': CATEGORY,
+    'county_name': CATEGORY,
+    'town_name': CATEGORY,
+    'level_name': CATEGORY,
+    'nature_name': CATEGORY,
+    'type_name': CATEGORY,
+    'belong': CATEGORY,
+    'dual_class_name': CATEGORY,
+    'tag_name': CATEGORY,
+}
+
+
+def _text(values: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """整列转成去掉首尾空白的字符串数组（StringDType），同时返回 None 的位置"""
+    column = np.asarray(values, dtype=object)
+    return np.strings.strip(column.astype(np.dtypes.StringDType())), np.equal(column, None)
+
+
+def coerce_float(values: Sequence) -> np.ndarray:
+    """整列转成 float64，'-'、空串、None 及其他非数字为 NaN"""
+    try:
+        # 已经是数值（存储中读出的整列）时直接转换，None 转成 NaN
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    text, null = _text(values)
+    digits = np.strings.replace(np.strings.lstrip(text, '-'), '.', '', 1)
+    valid = (np.strings.isdigit(digits) & (np.strings.str_len(text) - np.strings.str_len(digits) <= 2)
+             & ~np.strings.startswith(text, '--') & ~null)
+    return np.where(valid, text, 'nan').astype(np.float64)
+
+
+def coerce_int(values: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """整列转成 int64，返回(数值, 是否有值)；'-'、空串、None 及带小数部分的值为空值"""
+    numbers = coerce_float(values)
+    valid = np.isfinite(numbers) & (numbers == np.trunc(numbers))
+    return np.where(valid, numbers, 0).astype(np.int64), valid
+
+
+def encode_category(values: Sequence) -> Tuple[np.ndarray, List[str]]:
+    """字典编码：返回(每条记录的编码, 按首次出现顺序排列的取值表)，None 的编码为 -1"""
+    table = dict.fromkeys(values)
+    table.pop(None, None)
+    # 只需检查不同取值的类型；混有数字时整列转成字符串，避免 1 和 '1' 成为两个取值
+    if not all(isinstance(value, str) for value in table):
+        values = [None if value is None else str(value) for value in values]
+        table = dict.fromkeys(values)
+        table.pop(None, None)
+    index = {value: code for code, value in enumerate(table)}
+    index[None] = -1
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+    return codes, [sys.intern(value) for value in table]
+
+
+def normalize_records(records: List[Dict], schema: Dict[str, str] = SCORE_SCHEMA) -> List[Dict]:
+    """按列一次性转换记录中的字段（原地修改并返回 records）
+
+    整数字段转成 int，空值为 None；小数字段转成数值（没有小数部分的仍为 int，如 688 和 346.3）；
+    分类字段的相同取值共用一个字符串对象。
+    """
+    if not records:
+        return records
+    for field, kind in schema.items():
+        if kind == TEXT:
+            continue
+        holders = [record for record in records if field in record]
+        if not holders:
+            continue
+        column = [record[field] for record in holders]
+        if kind == INT:
+            data, valid = coerce_int(column)
+            converted = [value if ok else None for value, ok in zip(data.tolist(), valid.tolist())]
+        elif kind == FLOAT:
+            data = coerce_float(column)
+            converted = [None if value != value else int(value) if value.is_integer() else value
+                         for value in data.tolist()]
+        else:
+            codes, categories = encode_category(column)
+            # 编码 -1 取到末尾的 None
+            converted = np.array(categories + [None], dtype=object)[codes].tolist()
+        for record, value in zip(holders, converted):
+            record[field] = value
+    return records
+
+
+def to_dataframe(records: List[Dict], schema: Dict[str, str] = SCORE_SCHEMA):
+    """按字段类型构造 DataFrame：整数为可空 Int64，小数为 float64，分类字段为 category，其余保持原样"""
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(records)
+    for field in df.columns:
+        kind = schema.get(field, TEXT)
+        if kind == TEXT:
+            continue
+        # 缺少该字段的记录在 DataFrame 中为 NaN，先还原为 None
+        column = df[field].astype(object).where(df[field].notna(), None).tolist()
+        if kind == INT:
+            values, valid = coerce_int(column)
+            df[field] = pd.arrays.IntegerArray(values, ~valid)
+        elif kind == FLOAT:
+            df[field] = coerce_float(column)
+        else:
+            codes, categories = encode_category(column)
+            df[field] = pd.Categorical.from_codes(codes, categories=categories)
+    return df
@@ -0,0 +1,396 @@
+import argparse
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import json_codec
+from change_feed import OP_DELETE, Change, KeyedHash, diff, keyed_hashes, row_keys, summarize
+from score_schema import normalize_records, to_dataframe
+from score_table import OBJECT, ScoreTable, build_column
+
+DEFAULT_STORE_PATH = Path("store") / "scores.sqlite3"
+# load_table 每次从 SQLite 取出并转换的行数
+DEFAULT_CHUNK_SIZE = 50000
+
+# 合并后分数线记录的字段顺序（与原先每校 Excel 的列顺序一致）
+SCORE_FIELDS = [
+    'school_id', 'province_id', 'type', 'batch', 'zslx', 'xclevel', 'max', 'min_section', 'min',
+    'average', 'filing', 'special_group', 'first_km', 'num', 'local_province_name',
+    'local_type_name', 'local_batch_id', 'local_batch_name', 'zslx_name', 'xclevel_name',
+    'zslx_rank', 'sg_fxk', 'sg_sxk', 'sg_type', 'sg_name', 'sg_info', 'proscore', 'year', 'diff',
+    'type_key',
+]
+# 存储附加的定位字段
+KEY_FIELDS = ['school_name', 'school_code', 'seq']
+# 参与记录标识和内容哈希计算的存储列
+STORED_FIELDS = SCORE_FIELDS + ['extra']
+
+
+def quote(name: str) -> str:
+    """SQLite 标识符加引号（字段中有 min/max 等关键字）"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ScoreStore:
+    """所有学校合并分数线记录的集中存储（SQLite 单表 + 索引）"""
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 爬虫的汇总线程写入、主线程和查询服务读取，共用一个连接，所有读写都由锁串行化
+        self._lock = threading.Lock()
+        # 任务队列模式下多个进程写同一个存储，其他进程持有写锁时最多等待 30 秒
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = ', '.join(quote(field) for field in KEY_FIELDS + SCORE_FIELDS)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS scores ({columns}, extra TEXT)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scores_school ON scores (province_id, school_code)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_year ON scores (province_id, year)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scores_track "
+            "ON scores (year, local_type_name, local_batch_name, zslx_name)"
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS schools (
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                school_name TEXT NOT NULL,
+                record_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (province_id, school_code)
+            )"""
+        )
+        # 记录级变更流：每次写入时逐条比较记录标识和内容哈希，只记下新增/更新/删除的记录
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT,
+                province_id TEXT NOT NULL,
+                school_code TEXT NOT NULL,
+                school_name TEXT NOT NULL,
+                record_key TEXT NOT NULL,
+                op TEXT NOT NULL,
+                record_hash TEXT,
+                changed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_run ON changes (run_id)")
+        self._conn.commit()
+
+    def _rows(self, province_id: str, school_code: str, school_name: str, records: List[Dict]) -> List[List]:
+        """记录转成存储行：定位字段 + 分数线字段 + 额外字段（JSON）"""
+        known = set(SCORE_FIELDS)
+        rows = []
+        for seq, record in enumerate(records):
+            extra = {key: value for key, value in record.items() if key not in known}
+            row = [school_name, school_code, seq]
+            row.extend(record.get(field) for field in SCORE_FIELDS)
+            # 分区键统一为抓取时的省份代码
+            row[len(KEY_FIELDS) + SCORE_FIELDS.index('province_id')] = province_id
+            row.append(json_codec.dumps(extra) if extra else None)
+            rows.append(row)
+        return rows
+
+    def _stored_hashes(self, province_id: str, school_code: str) -> List[KeyedHash]:
+        """存储中该学校各记录的(标识, 内容哈希)，按原顺序（调用方持有 _lock）"""
+        sql = (f"SELECT {', '.join(quote(field) for field in SCORE_FIELDS)}, extra FROM scores "
+               "WHERE province_id = ? AND school_code = ? ORDER BY seq")
+        return keyed_hashes(self._conn.execute(sql, (province_id, school_code)).fetchall(), STORED_FIELDS)
+
+    def unchanged(self, province_id: str, school_code: str, records: List[Dict]) -> bool:
+        """records 与存储中该学校的记录是否完全相同（标识、内容和顺序）"""
+        province_id, school_code = str(province_id), str(school_code)
+        rows = [row[len(KEY_FIELDS):] for row in self._rows(province_id, school_code, '', records)]
+        with self._lock:
+            stored = self._stored_hashes(province_id, school_code)
+        return bool(stored) and stored == keyed_hashes(rows, STORED_FIELDS)
+
+    def write_schools(self, batches: Iterable[Tuple[str, str, str, List[Dict]]], run_id: Optional[str] = None) -> int:
+        """批量写入多所学校的记录，每项为(省份, 学校代码, 学校名, 记录列表)，整批一个事务
+
+        与存储中完全相同的学校不重写（写入时间不变，下游视图无需重算）；其余学校逐条比较记录标识和内容哈希，
+        把新增/更新/删除的记录以 run_id 记入变更流。返回这批学校的记录总数。
+        """
+        placeholders = ', '.join('?' for _ in KEY_FIELDS + SCORE_FIELDS + ['extra'])
+        insert_sql = f"INSERT INTO scores VALUES ({placeholders})"
+        total = 0
+        now = time.time()
+
+        with self._lock, self._conn:
+            for province_id, school_code, school_name, records in batches:
+                province_id, school_code = str(province_id), str(school_code)
+                rows = self._rows(province_id, school_code, school_name, records)
+                total += len(rows)
+                previous = self._stored_hashes(province_id, school_code)
+                current = keyed_hashes([row[len(KEY_FIELDS):] for row in rows], STORED_FIELDS)
+                if previous and previous == current:
+                    continue
+                self._conn.executemany(
+                    "INSERT INTO changes (run_id, province_id, school_code, school_name, record_key, op, "
+                    "record_hash, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, province_id, school_code, school_name, key, op, digest, now)
+                     for op, key, digest in diff(previous, current)],
+                )
+                self._conn.execute(
+                    "DELETE FROM scores WHERE province_id = ? AND school_code = ?",
+                    (province_id, school_code),
+                )
+                self._conn.executemany(insert_sql, rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO schools VALUES (?, ?, ?, ?, ?)",
+                    (province_id, school_code, school_name, len(rows), now),
+                )
+        return total
+
+    def changes(self, since: int = 0, run_id: Optional[str] = None) -> List[Change]:
+        """变更流中 seq 大于 since 的变更（可只取某次运行的），按 seq 排序"""
+        sql = "SELECT * FROM changes WHERE seq > ?"
+        params: List = [since]
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            params.append(run_id)
+        with self._lock:
+            return [Change(*row) for row in self._conn.execute(sql + " ORDER BY seq", params)]
+
+    def last_change_seq(self) -> int:
+        """变更流的最新 seq，下游消费者记下它作为下次读取的起点"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def runs(self) -> List[Tuple[Optional[str], str, int, float]]:
+        """各次运行各操作的变更条数(run_id, 操作, 条数, 最后变更时间)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT run_id, op, COUNT(*), MAX(changed_at) FROM changes GROUP BY run_id, op ORDER BY MAX(seq)"
+            ).fetchall()
+
+    def school_records(self, province_id: str, school_code: str) -> List[Tuple[str, Dict]]:
+        """某学校当前的(记录标识, 记录)，按存储顺序（用于按变更流只处理变化的记录）"""
+        sql = (f"SELECT {', '.join(quote(field) for field in KEY_FIELDS + SCORE_FIELDS)}, extra FROM scores "
+               "WHERE province_id = ? AND school_code = ? ORDER BY seq")
+        with self._lock:
+            rows = self._conn.execute(sql, (str(province_id), str(school_code))).fetchall()
+        offset = len(KEY_FIELDS)
+        records = []
+        for row in rows:
+            record = {'school_name': row[0]}
+            record.update(zip(SCORE_FIELDS, row[offset:offset + len(SCORE_FIELDS)]))
+            if row[-1]:
+                record.update(json_codec.loads(row[-1]))
+            records.append(record)
+        return list(zip(row_keys([row[offset:] for row in rows], STORED_FIELDS), records))
+
+    def delta(self, changes: List[Change]) -> List[Dict]:
+        """变更流转成可交给下游应用的增量：新增/更新带上记录当前的内容，删除只有标识"""
+        current = {
+            school: dict(self.school_records(*school))
+            for school in dict.fromkeys((change.province_id, change.school_code) for change in changes)
+        }
+        return [
+            {
+                'seq': change.seq, 'run_id': change.run_id, 'op': change.op, 'province_id': change.province_id,
+                'school_code': change.school_code, 'school_name': change.school_name,
+                'record_key': change.record_key,
+                'record': None if change.op == OP_DELETE
+                else current[(change.province_id, change.school_code)].get(change.record_key),
+            }
+            for change in changes
+        ]
+
+    def has_school(self, province_id: str, school_code: str) -> bool:
+        """存储中是否已有该学校"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM schools WHERE province_id = ? AND school_code = ?",
+                (str(province_id), str(school_code)),
+            ).fetchone()
+        return row is not None
+
+    def schools(self, province_id: Optional[str] = None) -> List[Tuple[str, str, str, int]]:
+        """列出存储中的学校(省份, 学校代码, 学校名, 记录数)"""
+        sql = "SELECT province_id, school_code, school_name, record_count FROM schools"
+        params = ()
+        if province_id is not None:
+            sql += " WHERE province_id = ?"
+            params = (str(province_id),)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY province_id, school_name", params).fetchall()
+
+    def school_versions(self) -> List[Tuple[str, str, str, float]]:
+        """列出存储中的学校(省份, 学校代码, 学校名, 最后写入时间)，用于判断下游视图是否需要重算"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT province_id, school_code, school_name, updated_at FROM schools "
+                "ORDER BY province_id, school_code"
+            ).fetchall()
+
+    def year_counts(self) -> List[Tuple[str, str, int, int]]:
+        """各学校每年的记录数(省份, 学校代码, 年份, 记录数)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT province_id, school_code, year, COUNT(*) FROM scores GROUP BY province_id, school_code, year"
+            ).fetchall()
+
+    def years(self) -> List[Tuple[str, int]]:
+        """存储中已有的(省份, 年份)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT DISTINCT province_id, year FROM scores ORDER BY province_id, year"
+            ).fetchall()
+
+    def _select(self, province_id: Optional[str], year: Optional[int],
+                school_name: Optional[str]) -> Tuple[str, List]:
+        conditions = []
+        params = []
+        for field, value in (('province_id', province_id), ('year', year), ('school_name', school_name)):
+            if value is not None:
+                conditions.append(f"{quote(field)} = ?")
+                params.append(str(value) if field == 'province_id' else value)
+        sql = f"SELECT {', '.join(quote(field) for field in KEY_FIELDS + SCORE_FIELDS)}, extra FROM scores"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql + " ORDER BY province_id, school_name, seq", params
+
+    def load(self, province_id: Optional[str] = None, year: Optional[int] = None,
+             school_name: Optional[str] = None) -> List[Dict]:
+        """按条件读出记录，返回与 merge_school_data 相同结构的字典列表"""
+        records = []
+        offset = len(KEY_FIELDS)
+        with self._lock:
+            rows = self._conn.execute(*self._select(province_id, year, school_name)).fetchall()
+        for row in rows:
+            record = {'school_name': row[0]}
+            record.update(zip(SCORE_FIELDS, row[offset:offset + len(SCORE_FIELDS)]))
+            if row[-1]:
+                record.update(json_codec.loads(row[-1]))
+            records.append(record)
+        return records
+
+    def load_table(self, province_id: Optional[str] = None, year: Optional[int] = None,
+                   school_name: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> ScoreTable:
+        """按条件读出记录到列式容器（ScoreTable），按块转换，不为每条记录构造字典"""
+        offset = len(KEY_FIELDS)
+        fields = ['school_name'] + SCORE_FIELDS
+        tables = []
+        # 游标在整个读取过程中独占连接，期间的写入等它读完
+        with self._lock:
+            cursor = self._conn.execute(*self._select(province_id, year, school_name))
+            for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+                columns = list(zip(*rows))
+                table = ScoreTable.from_columns(fields, [columns[0]] + columns[offset:offset + len(SCORE_FIELDS)])
+                # extra 中是接口新增的字段，很少出现，按对象列保存
+                extras = [json_codec.loads(extra) if extra else {} for extra in columns[-1]]
+                for key in dict.fromkeys(key for extra in extras for key in extra):
+                    table.columns[key] = build_column(OBJECT, [extra.get(key) for extra in extras])
+                tables.append(table)
+        return ScoreTable.concat(tables)
+
+    def load_dataframe(self, province_id: Optional[str] = None, year: Optional[int] = None):
+        """以 DataFrame 形式读出记录（用于分析），数值列为可空整数，分类列为 category"""
+        return to_dataframe(self.load(province_id=province_id, year=year))
+
+    def export_excel(self, output_dir: Path, province_id: Optional[str] = None,
+                     school_name: Optional[str] = None) -> int:
+        """按需从存储导出每校一个 Excel 文件，返回导出的文件数"""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        count = 0
+        for school_province, school_code, name, _ in self.schools(province_id):
+            if school_name is not None and name != school_name:
+                continue
+            records = self.load(province_id=school_province, school_name=name)
+            for record in records:
+                del record['school_name']
+            if not records:
+                continue
+            filepath = output_dir / f"{name}.xlsx"
+            to_dataframe(records).to_excel(filepath, index=False, engine='openpyxl')
+            print(f"已导出: {filepath} ({len(records)} 条记录)")
+            count += 1
+        return count
+
+    def normalize(self, province_id: Optional[str] = None) -> int:
+        """把旧版本写入的字符串数值（'-' 表示空值）按字段类型重写，返回重写的记录数"""
+        total = 0
+        for school_province, school_code, school_name, _ in self.schools(province_id):
+            records = self.load(province_id=school_province, school_name=school_name)
+            for record in records:
+                del record['school_name']
+            total += self.write_schools([(school_province, school_code, school_name, normalize_records(records))],
+                                        run_id='normalize')
+        return total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分数线集中存储工具')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summary_parser = subparsers.add_parser('summary', help='按省份和年份统计记录数')
+    summary_parser.add_argument('--province', help='只统计指定省份代码')
+
+    export_parser = subparsers.add_parser('export-excel', help='从存储导出每校 Excel')
+    export_parser.add_argument('--province', help='只导出指定省份代码')
+    export_parser.add_argument('--school', help='只导出指定学校')
+    export_parser.add_argument('--output', type=Path, default=Path('score'), help='输出目录，默认: score')
+
+    normalize_parser = subparsers.add_parser('normalize', help='按字段类型重写旧数据（数值字符串转成整数）')
+    normalize_parser.add_argument('--province', help='只处理指定省份代码')
+
+    changes_parser = subparsers.add_parser('changes', help='查看记录级变更流，或导出某次运行的增量')
+    changes_parser.add_argument('--run', help='只看指定运行（爬虫启动时打印的运行编号）的变更')
+    changes_parser.add_argument('--since', type=int, default=0, help='只看 seq 大于该值的变更，默认: 0')
+    changes_parser.add_argument('--output', type=Path, help='把增量（含新增/更新记录的内容）保存为 JSON 文件')
+
+    args = parser.parse_args()
+    store = ScoreStore(args.store)
+    try:
+        if args.command == 'summary':
+            start = time.perf_counter()
+            records = store.load(province_id=args.province)
+            elapsed = time.perf_counter() - start
+            counts = {}
+            for record in records:
+                key = (record['province_id'], record['year'])
+                counts[key] = counts.get(key, 0) + 1
+            for (province_id, year), count in sorted(counts.items()):
+                print(f"省份 {province_id} {year} 年: {count} 条")
+            print(f"共 {len(store.schools(args.province))} 所学校，{len(records)} 条记录，加载耗时 {elapsed:.3f} 秒")
+        elif args.command == 'export-excel':
+            count = store.export_excel(args.output, province_id=args.province, school_name=args.school)
+            print(f"\n共导出 {count} 个 Excel 文件")
+        elif args.command == 'normalize':
+            start = time.perf_counter()
+            count = store.normalize(province_id=args.province)
+            print(f"已重写 {count} 条记录，耗时 {time.perf_counter() - start:.3f} 秒")
+        elif args.command == 'changes':
+            if args.run is None and args.since == 0 and args.output is None:
+                for run_id, op, count, changed_at in store.runs():
+                    print(f"{run_id or '-':<20}{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(changed_at))}  "
+                          f"{op:<8}{count} 条")
+                return
+            changes = store.changes(since=args.since, run_id=args.run)
+            counts = summarize(changes)
+            print(f"共 {len(changes)} 条变更: 新增 {counts['insert']}，更新 {counts['update']}，删除 {counts['delete']}，"
+                  f"涉及 {len({(change.province_id, change.school_code) for change in changes})} 所学校")
+            if args.output:
+                args.output.parent.mkdir(parents=True, exist_ok=True)
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json_codec.dump({'last_seq': changes[-1].seq if changes else args.since,
+                                     'changes': store.delta(changes)}, f, indent=2)
+                print(f"已保存增量到: {args.output}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import time
+import tracemalloc
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from score_schema import CATEGORY, FLOAT, INT, SCORE_SCHEMA, TEXT, coerce_float, coerce_int, encode_category
+
+# 不在字段类型表中的字段（接口新增的字段等）按 Python 对象原样保存
+OBJECT = 'object'
+# ScoreStore.load 读出的记录带学校名，同一学校的记录重复，按分类字段存储
+TABLE_SCHEMA = {'school_name': CATEGORY, **SCORE_SCHEMA}
+# 短字符串（不超过 15 字节）直接存在数组元素中，不单独分配对象
+TEXT_DTYPE = np.dtypes.StringDType(na_object=None)
+
+
+class Column(NamedTuple):
+    """一列数据：data 为定长数组；整数列另有 valid 标记空值，分类列的 data 为编码，categories 为取值表"""
+    kind: str
+    data: np.ndarray
+    valid: Optional[np.ndarray] = None
+    categories: Optional[List[str]] = None
+
+
+def smallest_int(data: np.ndarray, signed_dtypes=(np.int8, np.int16, np.int32, np.int64)) -> np.ndarray:
+    """换成能容纳全部取值的最小整数类型"""
+    if not len(data):
+        return data.astype(signed_dtypes[0])
+    low, high = int(data.min()), int(data.max())
+    for dtype in signed_dtypes:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return data.astype(dtype, copy=False)
+    return data
+
+
+def build_column(kind: str, values: Sequence) -> Column:
+    """按字段类型把一列 Python 值转成紧凑的数组"""
+    if kind == INT:
+        data, valid = coerce_int(values)
+        return Column(kind, smallest_int(data), valid)
+    if kind == FLOAT:
+        return Column(kind, coerce_float(values))
+    if kind == CATEGORY:
+        codes, categories = encode_category(values)
+        return Column(kind, smallest_int(codes), categories=categories)
+    if kind == TEXT:
+        return Column(kind, np.array(values, dtype=TEXT_DTYPE))
+    data = np.empty(len(values), dtype=object)
+    data[:] = values
+    return Column(OBJECT, data)
+
+
+def decode_column(column: Column, indices: Optional[np.ndarray] = None) -> List:
+    """把一列（或其中 indices 指定的行）还原为 Python 值，与 normalize_records 的结果一致"""
+    data = column.data if indices is None else column.data[indices]
+    if column.kind == INT:
+        valid = column.valid if indices is None else column.valid[indices]
+        return [value if ok else None for value, ok in zip(data.tolist(), valid.tolist())]
+    if column.kind == FLOAT:
+        return [None if value != value else int(value) if value.is_integer() else value for value in data.tolist()]
+    if column.kind == CATEGORY:
+        # 编码 -1 取到末尾的 None
+        return np.array(column.categories + [None], dtype=object)[data].tolist()
+    return data.tolist()
+
+
+def decode_value(column: Column, index: int):
+    """还原一列中的单个值"""
+    value = column.data[index]
+    if column.kind == INT:
+        return int(value) if column.valid[index] else None
+    if column.kind == FLOAT:
+        value = float(value)
+        return None if value != value else int(value) if value.is_integer() else value
+    if column.kind == CATEGORY:
+        return column.categories[value] if value >= 0 else None
+    return value
+
+
+def concat_columns(kind: str, columns: List[Column]) -> Column:
+    """拼接同一字段的多段数据；分类列合并取值表并重新编码"""
+    if kind == CATEGORY:
+        table: Dict[str, int] = {}
+        parts = []
+        for column in columns:
+            remap = np.array([table.setdefault(value, len(table)) for value in column.categories] + [-1],
+                             dtype=np.int64)
+            parts.append(remap[column.data])
+        return Column(kind, smallest_int(np.concatenate(parts)), categories=list(table))
+    data = np.concatenate([column.data for column in columns])
+    if kind == INT:
+        return Column(kind, smallest_int(data), np.concatenate([column.valid for column in columns]))
+    return Column(kind, data)
+
+
+class RecordView(Mapping):
+    """表中一行的只读字典视图，用于兼容按 record['min'] / record.get(...) 访问的代码"""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: 'ScoreTable', index: int):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, field: str):
+        return decode_value(self.table.columns[field], self.index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.table.columns)
+
+    def __len__(self) -> int:
+        return len(self.table.columns)
+
+    def __repr__(self) -> str:
+        return f"RecordView({dict(self)!r})"
+
+
+class ScoreTable:
+    """分数线记录的列式容器：每个字段一个定长数组，重复的分类字符串只存编码
+
+    与字典列表相比，一条记录只占几十到一百多字节（字典列表约为数 KB），全国多年的数据可以放在一个进程中。
+    按行访问时返回 RecordView；批量输出用 to_records 整列还原。
+    """
+
+    def __init__(self, columns: Dict[str, Column], length: int):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], schema: Dict[str, str] = TABLE_SCHEMA) -> 'ScoreTable':
+        """由 merge_school_data / ScoreStore.load 产出的字典列表构建；记录中缺少的字段取 None"""
+        fields = list(dict.fromkeys(key for record in records for key in record))
+        return cls.from_columns(fields, [[record.get(field) for record in records] for field in fields], schema)
+
+    @classmethod
+    def from_columns(cls, fields: List[str], columns: List[Sequence],
+                     schema: Dict[str, str] = TABLE_SCHEMA) -> 'ScoreTable':
+        length = len(columns[0]) if columns else 0
+        return cls({field: build_column(schema.get(field, OBJECT), values) for field, values in zip(fields, columns)},
+                   length)
+
+    @classmethod
+    def concat(cls, tables: List['ScoreTable']) -> 'ScoreTable':
+        """按行拼接多张表（如逐所学校合并的结果）；某张表中没有的字段补 None"""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls({}, 0)
+        fields = list(dict.fromkeys(field for table in tables for field in table.columns))
+        columns = {}
+        for field in fields:
+            kinds = {table.columns[field].kind for table in tables if field in table.columns}
+            parts = []
+            for table in tables:
+                column = table.columns.get(field)
+                if column is None or len(kinds) > 1:
+                    values = decode_column(column) if column is not None else [None] * len(table)
+                    column = build_column(OBJECT if len(kinds) > 1 else kinds.copy().pop(), values)
+                parts.append(column)
+            columns[field] = concat_columns(parts[0].kind, parts)
+        return cls(columns, sum(len(table) for table in tables))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> RecordView:
+        if not -self.length <= index < self.length:
+            raise IndexError(index)
+        return RecordView(self, index + self.length if index < 0 else index)
+
+    def __iter__(self) -> Iterator[RecordView]:
+        return (RecordView(self, index) for index in range(self.length))
+
+    def values(self, field: str, indices: Optional[np.ndarray] = None) -> List:
+        """一列的 Python 值（缺少该字段时为 None）"""
+        column = self.columns.get(field)
+        if column is None:
+            return [None] * (self.length if indices is None else len(indices))
+        return decode_column(column, indices)
+
+    def numbers(self, field: str) -> np.ndarray:
+        """数值列的 float64 数组（空值为 NaN），用于向量化的过滤和排序"""
+        column = self.columns[field]
+        if column.kind == INT:
+            return np.where(column.valid, column.data, np.nan)
+        if column.kind == FLOAT:
+            return column.data
+        raise ValueError(f"{field} 不是数值字段")
+
+    def equals(self, field: str, value: str) -> np.ndarray:
+        """分类列等于 value 的行（布尔数组）；只比较整数编码"""
+        column = self.columns[field]
+        if column.kind != CATEGORY:
+            raise ValueError(f"{field} 不是分类字段")
+        try:
+            code = column.categories.index(value)
+        except ValueError:
+            return np.zeros(self.length, dtype=bool)
+        return column.data == code
+
+    def take(self, indices: Iterable[int]) -> 'ScoreTable':
+        """按行号取出子表"""
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = {}
+        for field, column in self.columns.items():
+            columns[field] = column._replace(
+                data=column.data[indices],
+                valid=column.valid[indices] if column.valid is not None else None,
+            )
+        return ScoreTable(columns, len(indices))
+
+    def to_records(self, indices: Optional[np.ndarray] = None) -> List[Dict]:
+        """还原为字典列表（整列解码后再组装，比逐行访问 RecordView 快得多）"""
+        fields = list(self.columns)
+        columns = [decode_column(self.columns[field], indices) for field in fields]
+        return [dict(zip(fields, row)) for row in zip(*columns)]
+
+    def nbytes(self) -> int:
+        """各列数组和取值表占用的字节数（不含 StringDType 中超过 15 字节的长字符串）"""
+        total = 0
+        for column in self.columns.values():
+            total += column.data.nbytes + (column.valid.nbytes if column.valid is not None else 0)
+            total += sum(len(value.encode('utf-8')) + 49 for value in column.categories or ())
+        return total
+
+
+def measure_memory(build) -> int:
+    """build() 产生的对象占用的内存（tracemalloc 统计，numpy 数组的分配也计算在内）"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return used
+
+
+def main():
+    # score_store 依赖本模块，只在命令行入口中导入
+    from score_store import DEFAULT_STORE_PATH, ScoreStore
+
+    parser = argparse.ArgumentParser(description='比较字典列表与列式容器加载分数线记录的内存和耗时')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'集中存储文件路径，默认: {DEFAULT_STORE_PATH}')
+    parser.add_argument('--province', help='只加载指定省份代码')
+
+    args = parser.parse_args()
+    store = ScoreStore(args.store)
+    try:
+        for name, load in (('字典列表', store.load), ('ScoreTable', store.load_table)):
+            start = time.perf_counter()
+            count = len(load(province_id=args.province))
+            elapsed = time.perf_counter() - start
+            used = measure_memory(lambda: load(province_id=args.province))
+            print(f"{name:<12}{count} 条记录，加载 {elapsed:.3f} 秒，内存 {used / 1024 / 1024:.1f} MB"
+                  f"（每条 {used / max(count, 1):.0f} 字节）")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 import requests
 import json
 import os
-import pandas as pd
 from pathlib import Path
 import time
 from typing import Dict, List
@@ -14,7 +13,6 @@ headers = {
     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
     "accept-language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
     "cache-control": "max-age=0",
-    "if-modified-since": "Wed, 11 Jun 2025 10:40:09 GMT",
     "priority": "u=0, i",
     "sec-ch-ua": "\"Microsoft Edge\";v=\"137\", \"Chromium\";v=\"137\", \"Not/A)Brand\";v=\"24\"",
     "sec-ch-ua-mobile": "?0",
@@ -92,6 +90,8 @@ def save_excel_data(school_name: str, data: List[Dict]):
         print(f"警告: {school_name} 没有数据可保存")
         return
     
+    import pandas as pd
+    
     df = pd.DataFrame(data)
     filename = f"{school_name}.xlsx"
     filepath = score_dir / filename
@@ -1,10 +1,23 @@
 import requests
-import json
-import time
-import re
+import sys
+import math
+import argparse
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, NamedTuple, Optional
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
-url ='https://api.zjzw.cn/web/api/?is_military_school=1&keyword=&page=2&province_id=&ranktype=&request_type=1&size=20&top_school_id=[589,3703,3117,2013,2466]&type=&uri=apidata/api/gkv3/school/lists&signsafe=ff2ebb56025572bf7a5e87a6533b7f8f'
+# 复用仓库根目录下的公共模块
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import json_codec
+from rate_limiter import TokenBucket
+from request_policy import AIMDController, RequestPolicy
+
+# 分类定义文件：[{"name": 分类名, "url": 浏览器中复制的第一页列表接口地址}, ...]
+DEFAULT_CONFIG = Path(__file__).resolve().parent / 'categories.json'
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_CONCURRENCY = 4
 header_info = '''Accept-Encoding: gzip, deflate, br, zstd
 Accept-Language: zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6
 Connection: keep-alive
@@ -19,8 +32,12 @@ User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML,
 sec-ch-ua: "Microsoft Edge";v="137", "Chromium";v="137", "Not/A)Brand";v="24"
 sec-ch-ua-mobile: ?0
 sec-ch-ua-platform: "Windows"'''
-MAX_PAGE = 1
-json_name = '军校'
+RPS = 1.0  # 起始每秒请求数，服务器健康时自适应提速
+MAX_RPS = 5.0  # 自适应限速上限
+
+class Category(NamedTuple):
+    name: str
+    url: str
 
 def parse_headers(header_string):
     """解析header字符串为字典格式"""
@@ -34,54 +51,143 @@ def parse_headers(header_string):
 def update_url_page(url, page):
     """更新URL中的page参数"""
     parsed = urlparse(url)
-    query_params = parse_qs(parsed.query)
+    query_params = parse_qs(parsed.query, keep_blank_values=True)
     query_params['page'] = [str(page)]
     new_query = urlencode(query_params, doseq=True)
     return urlunparse(parsed._replace(query=new_query))
 
-def crawl_data():
-    """爬取数据的主函数"""
-    headers = parse_headers(header_info)
+def page_size(url) -> int:
+    """URL 中的每页条数（size 参数）"""
+    size = parse_qs(urlparse(url).query).get('size', [''])[0]
+    return int(size) if size.isdigit() and int(size) > 0 else DEFAULT_PAGE_SIZE
+
+def load_categories(config_path, names=None) -> List[Category]:
+    """读取分类定义；names 不为空时只保留指定分类"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        categories = [Category(item['name'], item['url']) for item in json_codec.load(f)]
+    if names:
+        known = {category.name for category in categories}
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ValueError(f"配置中没有这些分类: {unknown}")
+        categories = [category for category in categories if category.name in names]
+    return categories
+
+class ListCrawler:
+    """按分类定义抓取学校列表：先取第一页得到 numFound，再在共享限速下并发抓取其余页，每个分类合并为一个文件"""
+    
+    def __init__(self, output_dir='.', concurrency=DEFAULT_CONCURRENCY, rps=RPS, max_rps=MAX_RPS,
+                 adaptive=True, headers: Optional[Dict[str, str]] = None):
+        self.output_dir = Path(output_dir)
+        self.concurrency = max(1, concurrency)
+        self.headers = headers or parse_headers(header_info)
+        # 与分数线爬虫共用的请求策略：限速、退避重试、Retry-After 和 AIMD 自适应限速
+        limiter = TokenBucket(rps)
+        controller = AIMDController(limiter, max_rate=max_rps) if adaptive else None
+        self.policy = RequestPolicy(limiter, controller=controller)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
-    print(f"开始爬取数据，共{MAX_PAGE}页")
+    def fetch_page(self, category: Category, page: int) -> Dict:
+        """抓取分类的某一页，返回解析后的响应"""
+        response = self.policy.get(self.session, update_url_page(category.url, page),
+                                   headers=self.headers, timeout=30)
+        response.raise_for_status()
+        data = json_codec.loads(response.content)
+        if not isinstance(data.get('data'), dict) or 'item' not in data['data']:
+            raise ValueError(f"响应中没有列表数据: {str(data)[:200]}")
+        return data
     
-    for page in range(1, MAX_PAGE + 1):
-        try:
-            # 更新URL中的page参数
-            current_url = update_url_page(url, page)
-            
-            print(f"正在爬取第{page}页...")
-            
-            # 发送请求
-            response = requests.get(current_url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            # 获取响应数据
-            data = response.json()
-            
-            # 保存为JSON文件
-            filename = f"{json_name}-{page}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            print(f"第{page}页数据已保存到 {filename}")
-            
-            # 限制请求频率：每秒一次
-            if page < MAX_PAGE:  # 最后一页不需要等待
-                time.sleep(1)
-                
-        except requests.exceptions.RequestException as e:
-            print(f"请求第{page}页时发生错误: {e}")
-            continue
-        except json.JSONDecodeError as e:
-            print(f"解析第{page}页JSON数据时发生错误: {e}")
-            continue
-        except Exception as e:
-            print(f"处理第{page}页时发生未知错误: {e}")
-            continue
+    def crawl(self, categories: List[Category]) -> Dict[str, int]:
+        """抓取所有分类，返回 {分类名: 学校数}；有页面失败的分类不写文件"""
+        first_pages: Dict[str, Dict] = {}
+        pages: Dict[str, Dict[int, List[Dict]]] = {category.name: {} for category in categories}
+        expected: Dict[str, int] = {}
+        failed = set()
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.fetch_page, category, 1): (category, 1) for category in categories}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    category, page = futures.pop(future)
+                    try:
+                        data = future.result()
+                    except (requests.exceptions.RequestException, ValueError) as e:
+                        # json_codec.DECODE_ERRORS 也都是 ValueError 的子类
+                        print(f"[{category.name}] 第{page}页抓取失败: {e}")
+                        failed.add(category.name)
+                        continue
+                    
+                    pages[category.name][page] = data['data']['item']
+                    if page == 1:
+                        first_pages[category.name] = data
+                        num_found = int(data['data'].get('numFound') or 0)
+                        expected[category.name] = math.ceil(num_found / page_size(category.url))
+                        print(f"[{category.name}] 共 {num_found} 所学校，{expected[category.name]} 页")
+                        for next_page in range(2, expected[category.name] + 1):
+                            futures[executor.submit(self.fetch_page, category, next_page)] = (category, next_page)
+                    else:
+                        print(f"[{category.name}] 已抓取第{page}/{expected[category.name]}页")
+        
+        counts = {}
+        for category in categories:
+            if category.name in failed or category.name not in first_pages:
+                print(f"[{category.name}] 有页面抓取失败，未写入文件")
+                continue
+            counts[category.name] = self.save_category(category, first_pages[category.name], pages[category.name])
+        return counts
     
-    print("爬取完成！")
+    def save_category(self, category: Category, first_page: Dict, pages: Dict[int, List[Dict]]) -> int:
+        """按页码顺序合并（按 school_id 去重，防止翻页期间排序变化造成重复）并写入 {分类名}.json
 
-if __name__ == "__main__":
-    crawl_data()
+        旧版按页保存的 {分类名}-N.json 保持不动，convert_json_to_xlsx 读取同一系列时按 school_id 去重。
+        """
+        items, seen = [], set()
+        for page in sorted(pages):
+            for item in pages[page]:
+                key = item.get('school_id', id(item))
+                if key in seen:
+                    continue
+                seen.add(key)
+                items.append(item)
+        
+        num_found = int(first_page['data'].get('numFound') or 0)
+        if len(items) != num_found:
+            print(f"[{category.name}] 警告: 合并后 {len(items)} 所学校，与 numFound={num_found} 不一致")
+        
+        data = {**first_page, 'data': {**first_page['data'], 'item': items}}
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        filename = self.output_dir / f"{category.name}.json"
+        with open(filename, 'w', encoding='utf-8') as f:
+            json_codec.dump(data, f, indent=2)
+        print(f"[{category.name}] 已保存 {len(items)} 所学校到 {filename}")
+        return len(items)
 
+def main():
+    parser = argparse.ArgumentParser(description='按配置批量抓取学校分类列表（自动翻页、并发、每个分类一个文件）')
+    parser.add_argument('--config', type=Path, default=DEFAULT_CONFIG,
+                        help=f'分类定义文件，默认: {DEFAULT_CONFIG}')
+    parser.add_argument('--categories', nargs='+', help='只抓取指定分类，默认: 配置中的全部分类')
+    parser.add_argument('--output-dir', type=Path, default=Path('.'), help='输出目录，默认: 当前目录')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'同时在途的请求数，默认: {DEFAULT_CONCURRENCY}')
+    parser.add_argument('--rps', type=float, default=RPS, help=f'起始每秒请求数，默认: {RPS}')
+    parser.add_argument('--max-rps', type=float, default=MAX_RPS, help=f'自适应限速上限，默认: {MAX_RPS}')
+    parser.add_argument('--fixed-rate', action='store_true', help='关闭自适应限速，固定按 --rps 请求')
+    
+    args = parser.parse_args()
+    try:
+        categories = load_categories(args.config, args.categories)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    print(f"开始爬取 {len(categories)} 个分类: {[category.name for category in categories]}")
+    crawler = ListCrawler(args.output_dir, args.concurrency, args.rps, args.max_rps, adaptive=not args.fixed_rate)
+    counts = crawler.crawl(categories)
+    print(f"爬取完成！成功 {len(counts)}/{len(categories)} 个分类，共 {sum(counts.values())} 所学校")
+
+if __name__ == "__main__":
+    main()
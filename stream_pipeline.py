@@ -0,0 +1,91 @@
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from crawl_metrics import Metrics
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_BATCH_SIZE = 32
+_STOP = object()
+
+
+def bounded_map(executor: Executor, func: Callable[[T], R], items: Iterable[T],
+                max_in_flight: int) -> Iterator[Tuple[T, Future]]:
+    """按顺序提交 items，最多 max_in_flight 个在途，按完成顺序产出(item, future)
+
+    只有调用方取走一个结果后才提交下一个任务：下游处理慢时抓取随之放慢（反压），
+    已完成但未处理的结果不会在内存中无限堆积。
+    """
+    items = iter(items)
+    pending = {executor.submit(func, item): item for item in islice(items, max(1, max_in_flight))}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
+            for item in islice(items, 1):
+                pending[executor.submit(func, item)] = item
+
+
+class SinkWorker:
+    """后台汇总线程：从有界队列中取出数据交给 handler
+
+    队列满时 put 阻塞，上游随之放慢（反压）。队列中已积压的数据一次最多取 batch_size 项交给 handler，
+    便于在一个事务中批量写入。handler 抛出的异常会在下一次 put 或 close 时在调用方线程重新抛出。
+    """
+
+    def __init__(self, handler: Callable[[List], None], maxsize: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, metrics: Metrics = None, name: str = 'sink'):
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.metrics = metrics
+        self.name = name
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._error: Optional[BaseException] = None
+        self._raised = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        self._raise()
+        self._queue.put(item)
+        if self.metrics:
+            self.metrics.set_gauge('queue_depth', self._queue.qsize(), queue=self.name)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            # 出错后继续取空队列，避免上游阻塞在 put 上
+            if self._error is None:
+                try:
+                    self.handler(batch)
+                except BaseException as e:
+                    self._error = e
+
+    def _raise(self):
+        if self._error is not None and not self._raised:
+            self._raised = True
+            raise self._error
+
+    def close(self):
+        """等待队列中的数据全部处理完"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise()
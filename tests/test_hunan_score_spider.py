@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from change_feed import OP_DELETE, summarize
+from hunan_score_spider import HunanScoreSpider
+from score_store import ScoreStore
+
+SCHOOLS = {'甲大学': '101', '乙大学': '102'}
+YEARS = [2024, 2023]
+
+
+def response(school_code: str, year: int) -> dict:
+    """两条记录的新格式响应"""
+    items = [{'school_id': school_code, 'province_id': '43', 'local_batch_name': '本科批', 'sg_name': name,
+              'min': '600', 'min_section': '1000'} for name in ('甲组', '乙组')]
+    return {'data': {'1_7_0': {'item': items}}}
+
+
+class FailedFetchTest(unittest.TestCase):
+    """不保存原始响应时，抓取失败的年份不能让集中存储删除该学校已有的记录"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.store = ScoreStore(Path(self.tmp.name) / 'scores.sqlite3')
+
+    def tearDown(self):
+        self.store.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def crawl(self, failing=frozenset()) -> HunanScoreSpider:
+        spider = HunanScoreSpider(years=YEARS, rps=0, store=self.store, keep_raw=False)
+        spider.load_school_mapping = lambda: dict(SCHOOLS)
+
+        def fetch(school_code, year, province_id='43'):
+            # 失败时与 fetch_score_data 一样返回空字典
+            return {} if (school_code, year) in failing else response(school_code, year)
+
+        spider.fetch_score_data = fetch
+        spider.crawl_all_schools()
+        return spider
+
+    def test_failed_year_keeps_stored_records(self):
+        self.crawl()
+        self.assertEqual(len(self.store.load()), 8)
+
+        spider = self.crawl(failing={('101', 2023)})
+        counts = summarize(self.store.changes(run_id=spider.run_id))
+        self.assertEqual(counts[OP_DELETE], 0)
+        self.assertEqual(len(self.store.load()), 8)
+        self.assertEqual(sorted({record['year'] for record in self.store.load() if record['school_id'] == '101'}),
+                         YEARS[::-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+import argparse
+import csv
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import json_codec
+from convert_json_to_xlsx import group_json_files
+from crawl_manifest import DEFAULT_MANIFEST_PATH, CrawlManifest
+from crawl_scheduler import DEFAULT_PROVINCE
+from raw_archive import DEFAULT_ARCHIVE_PATH, DEFAULT_TEMP_DIR, ROOT_PROVINCE, open_archive
+from school_mapping import load_school_mapping
+from score_store import DEFAULT_STORE_PATH, ScoreStore
+
+# 分类系列导出文件的格式，同一天两种都有时以 xlsx 为准
+EXPORT_SUFFIXES = ('.csv', '.xlsx')
+
+SchoolKey = Tuple[str, str]
+
+
+class SeriesReport(NamedTuple):
+    series_name: str
+    num_found: Optional[int]
+    items: int
+    unique: int
+    export_path: Optional[str]
+    export_rows: Optional[int]
+
+
+def count_rows(path: str) -> int:
+    """导出文件的数据行数（不含表头）；xlsx 用 openpyxl 只读模式流式打开，不在内存中构建整个工作簿"""
+    if path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        worksheet = workbook.active
+        # pandas/openpyxl 和 xlsxwriter 写入的工作表都带 <dimension>，只读模式下直接给出行数；没有时再逐行数
+        rows = worksheet.max_row
+        if rows is None:
+            rows = sum(1 for row in worksheet.iter_rows(values_only=True) if any(value is not None for value in row))
+    finally:
+        workbook.close()
+    return max(0, rows - 1)
+
+
+def count_records(data: Dict) -> int:
+    """一份分数线响应中的记录数（与爬虫的统计方式一致）"""
+    payload = data.get('data') if isinstance(data, dict) else None
+    if isinstance(payload, dict):
+        return sum(len(value['item']) for value in payload.values() if isinstance(value, dict) and 'item' in value)
+    if isinstance(payload, list):
+        return len(payload)
+    return 0
+
+
+def latest_export(output_dir: Path, series_name: str) -> Optional[Path]:
+    """系列最新的导出文件（{系列名}_{日期}.xlsx/.csv）"""
+    candidates = [
+        path for suffix in EXPORT_SUFFIXES for path in output_dir.glob(f"{series_name}_*{suffix}")
+        if path.stem[len(series_name) + 1:].isdigit()
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda path: (path.stem, EXPORT_SUFFIXES.index(path.suffix)))
+
+
+def check_series_job(job: Tuple[str, str, List[str], Optional[str]]) -> SeriesReport:
+    """进程池任务：统计一个系列各页的 numFound、记录数和去重后的学校数，以及导出文件的行数"""
+    series_name, directory, files, export_path = job
+    num_found, items, school_ids = None, 0, set()
+    for file in files:
+        data = json_codec.load_path(os.path.join(directory, file))
+        page = data.get('data') if isinstance(data, dict) else None
+        if not isinstance(page, dict) or 'item' not in page:
+            continue
+        if page.get('numFound') is not None:
+            num_found = max(num_found or 0, int(page['numFound']))
+        items += len(page['item'])
+        school_ids.update(item.get('school_id') for item in page['item'])
+    export_rows = count_rows(export_path) if export_path else None
+    return SeriesReport(series_name, num_found, items, len(school_ids), export_path, export_rows)
+
+
+def archive_counts_job(job: Tuple[str, str, str, str]) -> Dict[Tuple[str, int], int]:
+    """进程池任务：解析一个省份的全部原始响应，返回 {(学校名, 年份): 记录数}"""
+    backend, temp_dir, archive_path, province_id = job
+    if backend == 'files' and not Path(temp_dir).exists():
+        return {}
+    archive = open_archive(backend, Path(temp_dir), Path(archive_path))
+    try:
+        return {(school_name, year): count_records(data) for school_name, year, data in archive.iter_all(province_id)}
+    finally:
+        archive.close()
+
+
+def series_problems(report: SeriesReport) -> List[str]:
+    problems = []
+    if report.num_found is not None and report.unique != report.num_found:
+        problems.append(f"numFound {report.num_found}，实际 {report.unique} 所学校")
+    if report.items != report.unique:
+        problems.append(f"有 {report.items - report.unique} 条重复记录")
+    # 导出时按 school_id 去重，每所学校一行
+    if report.export_rows is not None and report.export_rows != report.unique:
+        problems.append(f"导出 {report.export_rows} 行，应为 {report.unique} 行")
+    return problems
+
+
+def school_problems(crawled: Dict[int, int], stored: Optional[Dict[int, int]], stored_total: Optional[int],
+                    excel_rows: Optional[int]) -> List[str]:
+    """比较一所学校的抓取记录、存储和 Excel 导出；stored 为 None 表示没有集中存储"""
+    problems = []
+    if stored is not None:
+        for year in sorted(set(crawled) | set(stored)):
+            if crawled.get(year, 0) != stored.get(year, 0):
+                problems.append(f"{year} 年抓取 {crawled.get(year, 0)} 条，存储 {stored.get(year, 0)} 条")
+        if stored_total is not None and stored_total != sum(stored.values()):
+            problems.append(f"存储元数据记为 {stored_total} 条，实际 {sum(stored.values())} 条")
+    if excel_rows is not None:
+        expected = sum(stored.values()) if stored is not None else sum(crawled.values())
+        if excel_rows != expected:
+            problems.append(f"Excel {excel_rows} 行，应为 {expected} 行")
+    return problems
+
+
+def score_excel_dir(score_dir: Path, province_id: str) -> Path:
+    """与爬虫一致：湖南的 Excel 在 score/ 根目录，其他省份在 score/{省份代码}/"""
+    return score_dir if province_id == ROOT_PROVINCE else score_dir / province_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='校验分类列表和每校分数线导出是否完整（替代 check_records.py / check_excel.py）')
+    parser.add_argument('--directory', type=Path, default=Path('.'), help='分类列表 JSON 所在目录，默认: 当前目录')
+    parser.add_argument('--output-dir', type=Path, help='分类系列导出目录，默认: <directory>/output')
+    parser.add_argument('--score-dir', type=Path, default=Path('score'), help='每校 Excel 目录，默认: score')
+    parser.add_argument('--provinces', nargs='+', default=[DEFAULT_PROVINCE],
+                        help=f'要校验的省份代码，默认: {DEFAULT_PROVINCE}')
+    parser.add_argument('--years', nargs='+', type=int, help='只比较这些年份的抓取记录，默认: 全部')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help=f'集中存储文件路径，不存在时跳过存储校验，默认: {DEFAULT_STORE_PATH}')
+    parser.add_argument('--manifest', type=Path, default=DEFAULT_MANIFEST_PATH,
+                        help=f'断点清单路径，存在时直接用其中的记录数，否则解析原始响应，默认: {DEFAULT_MANIFEST_PATH}')
+    parser.add_argument('--archive', choices=['files', 'sqlite'], default='files',
+                        help='原始响应存储方式，默认: files')
+    parser.add_argument('--temp-dir', type=Path, default=DEFAULT_TEMP_DIR, help=f'临时文件目录，默认: {DEFAULT_TEMP_DIR}')
+    parser.add_argument('--archive-path', type=Path, default=DEFAULT_ARCHIVE_PATH,
+                        help=f'压缩归档路径，默认: {DEFAULT_ARCHIVE_PATH}')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行进程数，默认: CPU 核数')
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    output_dir = args.output_dir or args.directory / 'output'
+    years = set(args.years) if args.years else None
+
+    series_jobs = []
+    for series_name, files in sorted(group_json_files(str(args.directory)).items()):
+        export_path = latest_export(output_dir, series_name) if output_dir.exists() else None
+        series_jobs.append((series_name, str(args.directory), files, str(export_path) if export_path else None))
+
+    # 抓取记录：优先用断点清单中的记录数，没有清单时解析原始响应
+    crawled: Dict[SchoolKey, Dict[int, int]] = defaultdict(dict)
+    if args.manifest.exists():
+        crawl_source = str(args.manifest)
+        code_to_name = {code: name for name, code in load_school_mapping().items()}
+        manifest = CrawlManifest(args.manifest)
+        try:
+            for (province_id, school_code, year), count in manifest.record_counts().items():
+                if province_id in args.provinces and school_code in code_to_name:
+                    crawled[(province_id, code_to_name[school_code])][year] = count
+        finally:
+            manifest.close()
+        archive_jobs = []
+    else:
+        crawl_source = str(args.temp_dir if args.archive == 'files' else args.archive_path)
+        archive_jobs = [(args.archive, str(args.temp_dir), str(args.archive_path), province_id)
+                        for province_id in args.provinces]
+
+    stored: Optional[Dict[SchoolKey, Dict[int, int]]] = None
+    stored_totals: Dict[SchoolKey, int] = {}
+    if args.store.exists():
+        store = ScoreStore(args.store)
+        try:
+            names = {}
+            for province_id, school_code, school_name, record_count in store.schools():
+                if province_id in args.provinces:
+                    names[(province_id, school_code)] = school_name
+                    stored_totals[(province_id, school_name)] = record_count
+            stored = defaultdict(dict)
+            for province_id, school_code, year, count in store.year_counts():
+                if (province_id, school_code) in names:
+                    stored[(province_id, names[(province_id, school_code)])][year] = count
+        finally:
+            store.close()
+
+    excel_paths: Dict[SchoolKey, Path] = {}
+    for province_id in args.provinces:
+        directory = score_excel_dir(args.score_dir, province_id)
+        if directory.exists():
+            for path in directory.glob('*.xlsx'):
+                excel_paths[(province_id, path.stem)] = path
+
+    # 系列统计、原始响应解析和 Excel 行数统计都是互不相关的任务，一起放进进程池
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        series_futures = [executor.submit(check_series_job, job) for job in series_jobs]
+        archive_futures = [(job[3], executor.submit(archive_counts_job, job)) for job in archive_jobs]
+        excel_futures = {key: executor.submit(count_rows, str(path)) for key, path in sorted(excel_paths.items())}
+
+        series_reports = [future.result() for future in series_futures]
+        for province_id, future in archive_futures:
+            for (school_name, year), count in future.result().items():
+                crawled[(province_id, school_name)][year] = count
+        excel_rows = {key: future.result() for key, future in excel_futures.items()}
+
+    mismatches = 0
+    series_reports = [report for report in series_reports if report.num_found is not None or report.items]
+    print(f"分类系列: {len(series_reports)} 个")
+    for report in series_reports:
+        problems = series_problems(report)
+        mismatches += bool(problems)
+        exported = (f"导出 {Path(report.export_path).name} {report.export_rows} 行" if report.export_path
+                    else "未导出")
+        status = '；'.join(problems) if problems else 'OK'
+        print(f"  {report.series_name}: numFound {report.num_found}，{report.items} 条，{exported} -> {status}")
+
+    if years is not None:
+        crawled = {key: {year: count for year, count in counts.items() if year in years}
+                   for key, counts in crawled.items()}
+        if stored is not None:
+            stored = {key: {year: count for year, count in counts.items() if year in years}
+                      for key, counts in stored.items()}
+            # 只比较部分年份时，存储元数据中的总数不可比
+            stored_totals = {}
+
+    schools = sorted(set(crawled) | set(stored or {}) | set(excel_rows))
+    school_mismatches = []
+    for key in schools:
+        problems = school_problems(crawled.get(key, {}), stored.get(key, {}) if stored is not None else None,
+                                   stored_totals.get(key), excel_rows.get(key) if years is None else None)
+        if key not in crawled:
+            problems.insert(0, '没有抓取记录')
+        if problems:
+            school_mismatches.append((key, problems))
+
+    print(f"\n学校分数线: {len(schools)} 所（抓取记录: {crawl_source}，"
+          f"存储: {args.store if stored is not None else '无'}，Excel: {len(excel_rows)} 个）")
+    for (province_id, school_name), problems in school_mismatches:
+        print(f"  [{province_id}] {school_name}: {'；'.join(problems)}")
+    mismatches += len(school_mismatches)
+
+    print(f"\n校验完成: {mismatches} 项不一致，耗时 {time.perf_counter() - start:.2f} 秒")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()